@@ -8,6 +8,7 @@ import sys
 import os
 import time
 import queue 
+import numpy as np
 import pandas as pd
 import openpyxl 
 from PyQt5.QtCore import QTimer, QDateTime, QTime, Qt, QObject, pyqtSlot, pyqtSignal
@@ -35,6 +36,7 @@ class CtcBackEnd(QObject):
 
         
         self.line_index = 0 # 0 for green, 1 for red
+        self.update_every_line = False # update every line on each tick instead of alternating, used when the lines run in their own processes
 
         self.train_queue = []
         self.timed_train_queue = []
@@ -45,6 +47,9 @@ class CtcBackEnd(QObject):
         signals.communication_track.track_tickets.connect(self.update_tickets)  #int
         signals.communication_track.wayside_block_occupancies.connect(self.update_occupancy) #List
         signals.communication_track.wayside_plc_outputs.connect(self.update_from_plc)
+        signals.communication_track.wayside_delta.connect(self.update_from_delta)
+        self.delta_sequences = {} # (line name, wayside index): sequence number of the last delta applied
+        self.resyncs_requested = set() # (line name, wayside index) that were asked for a resync that has not arrived yet
         
         self.suggested_speed = {} #key is block data is sent to
         self.suggested_authority = {} #Key is block data is being sent to
@@ -56,7 +61,8 @@ class CtcBackEnd(QObject):
 
         self.timer = QTimer(self)
         self.timer.timeout.connect(self.backend_update)
-        self.timer.start(self.wall_clock.ctc_dt)  # 10 Hz update
+        if not self.wall_clock.kernel_driven:
+            self.timer.start(self.wall_clock.ctc_dt)  # 10 Hz update
 
     
 
@@ -65,6 +71,12 @@ class CtcBackEnd(QObject):
             self.elapsed_mins += 1
             self.last_minute = self.wall_clock.minute
         self.timed_train_queue_handler()
+        if self.update_every_line:
+            for line_name in self.lines:
+                self.updating_line = line_name
+                self.dispatch_queue_handler()
+                self.active_train_handler()
+            return
         self.dispatch_queue_handler()  
         self.active_train_handler()
         
@@ -121,7 +133,8 @@ class CtcBackEnd(QObject):
     def update_tickets(self, num_tickets, line_name):
         #Takes tickets sold from track model and updates throughput
         self.lines[line_name].total_tickets += num_tickets
-        self.lines[line_name].throughput = self.lines[line_name].total_tickets / (self.elapsed_mins/60) #Tickets per hour
+        if self.elapsed_mins > 0: # tickets can be sold before the first minute has passed
+            self.lines[line_name].throughput = self.lines[line_name].total_tickets / (self.elapsed_mins/60) #Tickets per hour
 
     @pyqtSlot(dict, str) 
     def update_occupancy(self, occupancies, line_name):
@@ -137,75 +150,85 @@ class CtcBackEnd(QObject):
             
 
     @pyqtSlot(list,list,list,list, str) 
-    def update_from_plc(self, sorted_blocks, switches, lights, crossings, line_name):
-        switch_index = 0
-        light_index = 0
-        crossing_index = 0
+    def update_from_plc(self, device_block_indices, switches, lights, crossings, line_name):
+        #Applies a wayside's plc outputs | device_block_indices is the [switch, light, crossing] block indices of its territory
+        blocks = self.lines[line_name].blocks
+        switch_indices, light_indices, crossing_indices = device_block_indices
+        for index, state in zip(switch_indices, switches):
+            blocks[index].switch_state = state
+        for index, state in zip(light_indices, lights):
+            blocks[index].light_state = state
+        for index, state in zip(crossing_indices, crossings):
+            blocks[index].crossing_state = state
+
+
+    @pyqtSlot(int, int, bool, dict, dict, dict, dict, str)
+    def update_from_delta(self, wayside_index, sequence, full, occupancies, switches, lights, crossings, line_name):
+        #Applies the changes sent by a wayside | only the blocks that changed are touched
+        key = (line_name, wayside_index)
+        if not full:
+            last_sequence = self.delta_sequences.get(key)
+            if last_sequence is None or sequence != last_sequence + 1:
+                # A delta went missing so our copy can't be trusted, ignore deltas until the wayside sends everything again
+                self.delta_sequences.pop(key, None)
+                if key not in self.resyncs_requested:
+                    self.resyncs_requested.add(key)
+                    signals.communication_ctc[line_name].ctc_resync.emit(wayside_index)
+                return
+        self.delta_sequences[key] = sequence
+        self.resyncs_requested.discard(key)
+
+        line = self.lines[line_name]
+        changedOccupancy = False
+        for index, occupancy in occupancies.items():
+            if line.blocks[index].occupancy != occupancy:
+                changedOccupancy = True
+                line.blocks[index].occupancy = occupancy
+        if changedOccupancy:
+            line.occupancy_change = True
 
-        for block_index, block in enumerate(sorted_blocks): # each WAYSIDE sends its portion of the track sorted by territory
+        for index, state in switches.items():
+            line.blocks[index].switch_state = state
+        for index, state in lights.items():
+            line.blocks[index].light_state = state
+        for index, state in crossings.items():
+            line.blocks[index].crossing_state = state
 
-            if block.switch: # if the block has a switch
-                self.lines[line_name].blocks[block_index].switch_state = switches[switch_index] # plc outputs have there own index since the first switch isnt at the first block etc.
-                switch_index += 1
+    def get_expected_next_block(self, train): #may need to be updated to include switch states
+            line = self.lines[self.updating_line]
+            index = line.track_data.block_indices[train.current_block]
+            #ensure current train location
+            if line.blocks[index].occupancy:
 
-            if block.light:
-                self.lines[line_name].blocks[block_index].light_state = lights[light_index]
-                light_index += 1
-            
-            if block.crossing:
-                self.lines[line_name].blocks[block_index].crossing_state = crossings[crossing_index]
-                crossing_index += 1
+                if train.current_block == line.EXIT_BLOCK.id:
+                    return -1 #Train reached ending block
 
+                #update train direction if not bidirectional
+                section_dir = line.sections[train.current_block[0]].increasing
+                if section_dir != 2:
+                    train.direction = section_dir
 
-    def get_expected_next_block(self, train): #may need to be updated to include switch states
-            #Check each block in line
-            for block in self.lines[self.updating_line].blocks:
-                #ensure current train location
-                if block.occupancy and block.id == train.current_block:
-                    
-                    if train.current_block == self.lines[self.updating_line].EXIT_BLOCK.id:
-                        return -1 #Train reached ending block
-
-                    #Get direction of train
-                    section_key = block.id[0]  # Get section letter
-                    section_dir = self.lines[self.updating_line].sections[section_key].increasing
-
-                    #update train direction if not bidirectional
-                    if section_dir != 2:  
-                        train.direction = section_dir
-
-                    jump_key = (int(block.id[1:]), train.direction)
-
-                    #Checks if going to yard
-                    if train.line == "Green":
-                        if jump_key == (57, 1):
-                            #If not going to yard, disregard jump block
-                            if train.get_next_stop() != 152:
-                                return self.lines[self.updating_line].blocks[int(block.id[1:])].id
-
-                    if train.line == "Red":
-                        if jump_key == (52, 1):
-                            return self.lines[self.updating_line].blocks[int(block.id[1:])].id
-                        if jump_key == (9,1):
-                            if train.get_next_stop() != 77:
-                                return self.lines[self.updating_line].blocks[9].id
-
-
-
-                    #Check if train is at jump block
-                    if jump_key in self.lines[self.updating_line].JUMP_BLOCKS:
-                        # print("====JUMPING FROM ", jump_key)
-                        next_block, new_dir = self.lines[self.updating_line].JUMP_BLOCKS[jump_key]
-                        train.direction = new_dir
-                        # print("====JUMPING TO ", next_block, "Direction: ", train.direction)
-                        return self.lines[self.updating_line].blocks[next_block - 1].id
-                    
-                    #if moving in decreasing direction
-                    if train.direction == 0:
-                        return self.lines[self.updating_line].blocks[int(block.id[1:]) - 2].id
-                    #if moving in increasing direction
-                    elif train.direction == 1:
-                        return self.lines[self.updating_line].blocks[int(block.id[1:])].id
+                next_stop = train.get_next_stop()
+                next_index, train.direction = self.route_next_block(self.updating_line, index, train.direction, next_stop - 1 if next_stop else None)
+                return line.blocks[next_index].id
+
+    def route_next_block(self, line_name, index, direction, destination_index):
+        """
+        Finds the block the CTC expects a train to move into next using the track's topology tables.
+        Where the train leaves through a switch exit the switch has to be set for it, where it reaches a fork
+        the branch is picked by Track.route_switch_state.
+
+        :param line_name: The line the train is on
+
+        :param index: The index of the block the train is in
+
+        :param direction: The direction the train is moving in, 0 decreasing and 1 increasing
+
+        :param destination_index: The index of the block the train is heading to, None if it has no stops left
+
+        :return: (next block index, direction in the next block)
+        """
+        return self.lines[line_name].route_next_block(index, direction, destination_index)
 
 
 
@@ -403,7 +426,7 @@ class CtcBackEnd(QObject):
         if destination:
             new_speed = speed
             suggested_speed = {train.current_block : new_speed}
-            auth, no_obstacles = self.calculate_authority(int(train.current_block[1:]), destination, line_name=train.line, direction=train.direction, start_halfway=start_halfway)
+            auth, no_obstacles = self.calculate_authority(self.lines[train.line].track_data.block_indices[train.current_block] + 1, destination, line_name=train.line, direction=train.direction, start_halfway=start_halfway)
             if auth == None:
                 suggested_authority = {}
             else:
@@ -465,113 +488,46 @@ class CtcBackEnd(QObject):
             Authority needed to reach end from start, or safe authority to next occupancy
             True if we made it all the way to the end, false otherwise
         '''
-
-        #print(start_id)
-        #print(end_id)
+        line = self.lines[line_name]
         start_id -= 1 #Convert to 0-indexed
         end_id -= 1 #Convert to 0-indexed
-        current_id = start_id
-        
-        # if start_id == end_id:
-        #     return None, False
-        if not (0 <= start_id < len(self.lines[line_name].blocks)) or not (0 <= end_id < len(self.lines[line_name].blocks)):
+
+        if not (0 <= start_id < len(line.blocks)) or not (0 <= end_id < len(line.blocks)):
             print("-----ERROR! Invalid block ID-----")
             return -1
-        
-        authority = 0
 
+        # The blocks the train goes through and their summed lengths only depend on where it starts and where it is going
+        path, distances, destination_position, last_checked, route_error = line.route_path(start_id, direction, end_id)
+
+        authority = 0
         # If we are already halfway through the start block
         # we must subtract half its length to account for that
         if start_halfway:
-            authority -= self.lines[line_name].blocks[start_id].length/2
-        # if self.lines[line_name].blocks[start_id].id != self.lines[line_name].track_data.SPAWN_BLOCK.id:
-        #     authority -= self.lines[line_name].blocks[start_id].length/2
-
-        # Add up the authority it would take to go from start of start_id to end of end_id
-        # But stop short with a 3 block gap between any other occupancies
-        last_four_blocks = [None, None, None, None] # this will act as a shift register, push to index N, pop from index 0
-        reached_destination = False
-        reached_yard = False
-        post_destination_checks = 0
-        while post_destination_checks < 3 and not reached_yard:
-            #print("Current Block: ", current_id)
-            #Added bounds check
-            if not (0 <= current_id < len(self.lines[line_name].blocks)):
-                print("-----ERROR! Current ID out of range:", current_id, "-----")
-                return -1
-            
-            current_block = self.lines[line_name].blocks[current_id]
-            section_key = current_block.id[0]  #Gets section letter
-            section_dir = self.lines[line_name].sections[section_key].increasing
-
-            # This assumes all trains had at least a two block gap to begin with
-            if (current_block.occupancy or current_block.maintenance) and current_id != start_id:
-                # OH NO! There is an occupancy blocking our path
-                # print("BACKTRACKING", current_id, start_id, end_id)
-                # Backtrack 3 blocks
-                for i in reversed(range(1, len(last_four_blocks))):
-                    if last_four_blocks[i]:
-                        authority -= last_four_blocks[i].length
-                    
-                
-                # Then backtrack a half length to stop halfway through that block
-                if last_four_blocks[0]:
-                    authority -= last_four_blocks[0].length / 2
-                return authority, False # And we are done
-
-            if section_dir != 2:
-                direction = section_dir
-
-            jump_key = (current_id+1, direction)
-            #print(jump_key)
-            #print("Current Block: ", current_block.id, "Next Block: ", self.lines[line_name].blocks[current_id+1].id, "Direction: ", direction, "Total Authority: ", authority)
-
-            if ((line_name == "Green" and jump_key == (57,1) and end_id != 151) or (line_name == "Red" and jump_key == (52, 1) and self.lines[line_name].switch_states == [0,0,0,0,0,0])):
-                    #print("===HIT! Jumping to", current_id + 1, line_name, jump_key)
-                    next_id = current_id + 1
-            elif jump_key in self.lines[line_name].JUMP_BLOCKS:
-                #print("TRYING TO JUMP")
-                next_id, new_dir = self.lines[line_name].JUMP_BLOCKS[jump_key]
-                next_id -= 1 #Convert to 0-indexed
-                direction = new_dir
-                #print("Jumping to block: ", next_id, "Direction: ", direction)
-            else:
-                if direction == 0:
-                    next_id = current_id - 1
-                elif direction == 1:
-                    next_id = current_id + 1
-
-            if not (0 <= next_id < len(self.lines[line_name].blocks)):
-                print("-----ERROR! Next ID out of range:", next_id, "-----")
-                return -1
-
-            if not reached_destination: # Don't add past destination
-                authority += current_block.length #accumulate authority
-            else:
-                post_destination_checks += 1 # One closer to making it all the way there with no backtracking
-            #print("---AUTH--- Current Block: ", self.lines[line_name].blocks[current_id].id, "Next Block: ", self.lines[line_name].blocks[next_id].id, "Direction: ", direction, "Total Authority: ", authority)
-
-            # Save block info for backtracking
-            last_four_blocks.pop(0)
-            last_four_blocks.append(current_block)
-
-            current_id = next_id #Update current block
-
-            # Check if we are the destination, if so remaining blocks won't do anything
-            # other than cause back tracking potentially
-            if current_id == end_id:
-                reached_destination = True
-            # Check if we are at yard, if so set flag to get out early, no need to check past there
-            if current_id == int(self.lines[line_name].EXIT_BLOCK.id[1:])-1:
-                reached_yard = True
-            
+            authority -= line.blocks[start_id].length/2
+
+        # Find the first occupancy or maintenance along the path, the start block itself is never an obstacle
+        checked = path[1:last_checked+1]
+        blocked = (line.occupancies[checked] | line.maintenances[checked]) & (checked != start_id)
+        if blocked.any():
+            # OH NO! There is an occupancy blocking our path
+            obstacle = int(np.argmax(blocked)) + 1
+            # Distance up to the obstacle (nothing is added past the destination)
+            authority += distances[min(obstacle, destination_position)]
+            # Backtrack 3 blocks
+            authority -= distances[obstacle] - distances[max(obstacle-3, 0)]
+            # Then backtrack a half length to stop halfway through that block
+            if obstacle >= 4:
+                authority -= (distances[obstacle-3] - distances[obstacle-4]) / 2
+            return float(authority), False # And we are done
+
+        if route_error:
+            print("-----ERROR! Next ID out of range after block", line.blocks[path[last_checked]].id, "-----")
+            return -1
 
+        authority += distances[destination_position]
         # Add half the length of last block, to stop halfway through it
-        authority += self.lines[line_name].blocks[end_id].length / 2
-
-        #print("-----END REACHED-----")
-        # print("Current Block: ", current_block.id, "Total Authority: ", authority)
-        return authority, True
+        authority += line.blocks[end_id].length / 2
+        return float(authority), True
 
 
 class DummyTrain:
@@ -583,12 +539,12 @@ class DummyTrain:
         self.route_index = 0
         self.mode = mode
         self.current_block = start_block 
-        if self.current_block == "y151":
-            self.next_block = "K63" 
-            self.direction = 1 
-        elif self.current_block == "y77":
-            self.next_block = "C9" 
-            self.direction = 0 
+        track_data = global_track_data.lines[line]
+        if self.current_block == track_data.SPAWN_BLOCK.id:
+            index = track_data.block_indices[self.current_block]
+            self.direction = track_data.SPAWN_DIRECTION
+            next_index = track_data.next_block(index, self.direction, track_data.end_switch_states[index, self.direction])[0]
+            self.next_block = track_data.blocks[next_index].id
         else:
             print("CTC ERROR! Cannot find starting block")
             self.next_block = None
@@ -627,7 +583,9 @@ class DummyTrain:
 
     
 class TrackBlocks:
-    def __init__(self, block):
+    def __init__(self, block, track, index):
+        self.track = track # the occupancy and maintenance flags are stored in the track's arrays
+        self.index = index
         self.id = block.id
         self.length = block.length 
         self.speed_limit = block.speed_limit
@@ -640,8 +598,6 @@ class TrackBlocks:
         self.has_beacon = block.beacon
         self.switch_exit = block.switch_exit
 
-        self.occupancy = False
-        self.maintenance = False
         self.switch_state = 0 #0 for first option, 1 for second option
         self.light_state = 0 #0 for red, 1 for green
         self.crossing_state = 0
@@ -649,9 +605,27 @@ class TrackBlocks:
         self.suggested_authority = 0
         self.updated = True
 
+    @property
+    def occupancy(self):
+        return bool(self.track.occupancies[self.index])
+
+    @occupancy.setter
+    def occupancy(self, value):
+        self.track.occupancies[self.index] = value
+
+    @property
+    def maintenance(self):
+        return bool(self.track.maintenances[self.index])
+
+    @maintenance.setter
+    def maintenance(self, value):
+        self.track.maintenances[self.index] = value
+
 class Track: 
     def __init__(self, name):
-        self.JUMP_BLOCKS = {}  
+        self.ROUTE_SWITCHES = {} # switch block id: state the CTC expects a fork to be in when the track does not decide it
+        self.LIVE_SWITCHES = [] # switch block ids where the CTC expects a train to go the way the wayside set the switch
+        self.MAX_ROUTE_LENGTH = 1000 # blocks, a route that is still going after this many never ends
 
         self.track_data = global_track_data.lines[name]
         self.name = name
@@ -666,6 +640,11 @@ class Track:
         self.lights = [0,0,0,0,0,0] #CHANGE FOR RED
         self.crossings = [0,0] #CHANGE FOR RED
         self.routes = {}
+        self.route_paths = {} # (start index, direction, destination index, LIVE_SWITCHES states): path compiled by route_path
+
+        # Bitsets of the blocks the CTC sees as occupied or under maintenance, indexed by block index
+        self.occupancies = np.zeros(len(self.track_data.blocks), dtype=bool)
+        self.maintenances = np.zeros(len(self.track_data.blocks), dtype=bool)
 
         self.occupancy_change = True # Used to refresh trains
 
@@ -674,14 +653,6 @@ class Track:
 
         if name == "Green":
             self.ENTRANCE_CHECK = [63, 64, 65] #Entrance blocks for green line
-            self.JUMP_BLOCKS = { 
-            (100, 1): (85, 0),   # Q100 -> N85, decrease
-            (77, 0): (101, 1),   # N77 -> R101, increase
-            (150, 1): (28, 0),   # Z150 -> F28, decrease
-            (1, 0): (13, 1),    #A1 -> D13, increase
-            (151, 1): (63, 1), #Yard -> K63, increase
-            (57, 1): (152, 1)} #I57 -> Yard, increase}     
-
             self.STATIONS_BLOCKS = {
                 "Pioneer": 2,
                 "Edgebrook": 9,
@@ -705,18 +676,10 @@ class Track:
             }
         elif name == "Red":
             self.ENTRANCE_CHECK = [77, 9, 8] #Entrance blocks for red line
-            self.JUMP_BLOCKS = { 
-            (77, 0): (9, 0),   # y77 -> C9, decrease    
-            (9, 1): (77, 1),   # C9 -> y77, increase
-            (16, 0): (1, 1),   # F16 -> A1, increase
-            (1, 0): (16, 1),    # A1 -> F16, increase
-            (52, 1): (66, 0),  # J52 -> N66, decrease
-            (66, 1): (52, 0),  # N66 -> J52, decrease
-            (44, 0): (67, 1),  # H44 -> O67, increase
-            (33, 0): (72, 1),  # H33 -> O72, increase
-            (71, 1): (38, 0),  # Q71 -> H38, decrease
-            (76, 1): (27, 0)  # T76 -> H27, decrease
-            }    
+            # Trains run out on the main track and come back through the bypasses
+            self.ROUTE_SWITCHES = {"H33": 1, "H44": 1}
+            # Leaving J52 a train goes on to J53 or over to N66, whichever way the wayside has the switch
+            self.LIVE_SWITCHES = ["J52"]
 
             self.STATIONS_BLOCKS = {
                 "Shadyside": 7,
@@ -734,12 +697,115 @@ class Track:
 
         self.initialize_blocks()
         # Setup spawn and despawn blocks for reference
-        self.ENTRANCE_BLOCK = self.blocks[int(self.track_data.SPAWN_BLOCK.id[1:])-1]
-        self.EXIT_BLOCK = self.blocks[int(self.track_data.DESPAWN_BLOCK.id[1:])-1]
+        self.ENTRANCE_BLOCK = self.blocks[self.track_data.block_indices[self.track_data.SPAWN_BLOCK.id]]
+        self.EXIT_BLOCK = self.blocks[self.track_data.block_indices[self.track_data.DESPAWN_BLOCK.id]]
         #print("Active Line: ", self.name, "Spawn Block: ", self.ENTRANCE_BLOCK.id, "Exit Block: ", self.EXIT_BLOCK.id)
 
+    def route_switch_state(self, switch_index, direction, destination_index):
+        """
+        Picks the branch the CTC expects a train to take at a fork. A train only goes into the yard when that is
+        where it is heading and never into a one way section against its direction, otherwise the live state of a switch in
+        LIVE_SWITCHES or ROUTE_SWITCHES decides.
+
+        :param switch_index: The index of the switch block
+
+        :param direction: The direction the train leaves the switch block in
+
+        :param destination_index: The index of the block the train is heading to, None if it has no stops left
+
+        :return: The expected switch state, 0 or 1
+        """
+        exit_index = self.track_data.block_indices[self.EXIT_BLOCK.id]
+        branches = [self.track_data.next_block(switch_index, direction, state) for state in (0, 1)]
+        for state, (target, _) in enumerate(branches):
+            if target == exit_index:
+                return state if destination_index == exit_index else 1 - state
+        for state, (target, target_direction) in enumerate(branches):
+            section_dir = self.sections[self.blocks[target].id[0]].increasing
+            if section_dir != 2 and section_dir != target_direction:
+                return 1 - state
+        if self.blocks[switch_index].id in self.LIVE_SWITCHES:
+            return int(self.blocks[switch_index].switch_state)
+        return self.ROUTE_SWITCHES.get(self.blocks[switch_index].id, 0)
+
+    def route_next_block(self, index, direction, destination_index):
+        """
+        Finds the block a train is expected to move into next, see CtcBackEnd.route_next_block
+
+        :param index: The index of the block the train is in
+
+        :param direction: The direction the train is moving in, 0 decreasing and 1 increasing
+
+        :param destination_index: The index of the block the train is heading to, None if it has no stops left
+
+        :return: (next block index, direction in the next block)
+        """
+        switch_index = self.track_data.end_switches[index, direction]
+        switch_state = self.track_data.end_switch_states[index, direction]
+        if switch_index >= 0 and switch_state < 0:
+            switch_state = self.route_switch_state(switch_index, direction, destination_index)
+        return self.track_data.next_block(index, direction, max(switch_state, 0))
+
+    def route_path(self, start_index, direction, destination_index):
+        """
+        Compiles the blocks a train goes through from a start block to its destination and the running distance along them.
+        The path continues 3 blocks past the destination so that the gap behind the next train can be checked, and stops
+        early at the yard. The result is cached since it does not depend on where the other trains are, only on the states
+        of the LIVE_SWITCHES.
+
+        :param start_index: The index of the block the train starts in
+
+        :param direction: The direction the train starts moving in, 0 decreasing and 1 increasing
+
+        :param destination_index: The index of the block the train is heading to
+
+        :return: (block indices along the path, distances where entry k is the summed length of the first k blocks,
+                  position of the destination in the path, last position that is checked for obstacles,
+                  True if the path runs off the track before it finishes)
+        """
+        key = (start_index, direction, destination_index,
+               tuple(self.blocks[self.track_data.block_indices[switch_id]].switch_state for switch_id in self.LIVE_SWITCHES))
+        if key in self.route_paths:
+            return self.route_paths[key]
+
+        exit_index = self.track_data.block_indices[self.EXIT_BLOCK.id]
+        path = [start_index]
+        destination_position = None
+        post_destination_checks = 0
+        route_error = False
+        while True:
+            current_index = path[-1]
+            section_dir = self.sections[self.blocks[current_index].id[0]].increasing
+            if section_dir != 2:
+                direction = section_dir
+
+            next_index, direction = self.route_next_block(current_index, direction, destination_index)
+            if not (0 <= next_index < len(self.blocks)) or len(path) > self.MAX_ROUTE_LENGTH:
+                route_error = True
+                last_checked = len(path) - 1
+                break
+
+            if destination_position is not None:
+                post_destination_checks += 1
+            path.append(next_index)
+            if next_index == destination_index and destination_position is None:
+                destination_position = len(path) - 1
+
+            # The block just moved into is not checked once the route is finished
+            if post_destination_checks == 3 or next_index == exit_index:
+                last_checked = len(path) - 2
+                break
+
+        lengths = np.array([self.blocks[index].length for index in path], dtype=float)
+        distances = np.concatenate(([0.0], np.cumsum(lengths)))
+        if destination_position is None:
+            destination_position = len(path) - 1 # the yard was reached first
+        compiled = (np.array(path), distances, destination_position, last_checked, route_error)
+        self.route_paths[key] = compiled
+        return compiled
+
     def initialize_blocks(self):
-        self.blocks = [TrackBlocks(block) for block in self.track_data.blocks]
+        self.blocks = [TrackBlocks(block, self, index) for index, block in enumerate(self.track_data.blocks)]
 
     def add_train_data(self, train_id, train_route, train_mode, start_block):
         #Adds train to active trains list
@@ -6,7 +6,7 @@ Description:
 
 import sys
 import os
-import random
+import numpy as np
 import pandas as pd
 from Track.TrackModel.track_model_enums import Occupancy, Failures
 
@@ -23,6 +23,7 @@ from Track.WaysideController.wayside_controller_collection import WaysideControl
 import globals.global_clock  as global_clock
 import globals.signals as signals
 import globals.track_data_class as global_track_data
+import globals.rng as rng
 
 
 
@@ -74,12 +75,58 @@ os.environ['QT_AUTO_SCREEN_SCALE_FACTOR'] = '1'
 #         self.traffic_signal = "None"
 #         self.beacon_data = None
 class DynamicTrack:
-    def __init__(self):
-        self.occupancies = {}
-        self.switch_states = {}
-        self.light_states = {}
-        self.crossing_states = {}
-        self.failures = {}
+    """
+    The changing state of every block, stored in arrays indexed by block index (the same order as track_data.blocks).
+    Block ids only need to be looked up at the edges, through the get/set functions below.
+    """
+    def __init__(self, track_data):
+        self.track_data = track_data
+        block_count = len(track_data.blocks)
+        self.occupancies = np.full(block_count, Occupancy.UNOCCUPIED.value, dtype=np.uint8) # Occupancy values
+        self.failures = np.full(block_count, Failures.NONE.value, dtype=np.uint8) # Failures values
+        # Device states are kept for every block but only mean something where the block has that device
+        self.switch_states = np.zeros(block_count, dtype=bool)
+        self.light_states = np.zeros(block_count, dtype=bool)
+        self.crossing_states = np.zeros(block_count, dtype=bool)
+        self.changed_blocks = set() # indices of blocks whose failure or trains changed since occupancies were last worked out
+
+    def get_occupancy(self, block_id):
+        return Occupancy(self.occupancies[self.track_data.block_indices[block_id]])
+
+    def set_occupancy(self, block_id, occupancy):
+        self.occupancies[self.track_data.block_indices[block_id]] = occupancy.value
+
+    def get_failure(self, block_id):
+        return Failures(self.failures[self.track_data.block_indices[block_id]])
+
+    def set_failure(self, block_id, failure):
+        index = self.track_data.block_indices[block_id]
+        self.failures[index] = failure.value
+        self.changed_blocks.add(index)
+
+    def clear_failures(self):
+        self.changed_blocks.update(np.flatnonzero(self.failures).tolist())
+        self.failures[:] = Failures.NONE.value
+
+    def get_failed_blocks(self):
+        """
+        :return: A list of (block id, Failures) for every block that currently has a failure
+        """
+        return [(self.track_data.blocks[index].id, Failures(self.failures[index])) for index in np.flatnonzero(self.failures)]
+
+    def get_switch_state(self, block_id):
+        """
+        :return: The switch state as a bool, None if the block has no switch
+        """
+        if block_id not in self.track_data.switches:
+            return None
+        return bool(self.switch_states[self.track_data.block_indices[block_id]])
+
+    def get_light_state(self, block_id):
+        return bool(self.light_states[self.track_data.block_indices[block_id]])
+
+    def get_crossing_state(self, block_id):
+        return bool(self.crossing_states[self.track_data.block_indices[block_id]])
 
 ###############################################################################
 # Dummy Train Class
@@ -92,15 +139,17 @@ class Train:
         self.dynamic_track = track_model.dynamic_track
         self.train_id = train_id
         self.current_block = initial_block
+        self.current_index = self.track_data.block_indices[initial_block.id]
         self.previous_block = None
-        self.current_section = initial_block.id[0] # just a string
-        self.previous_switch_entrance = False
-        self.previous_switch_exit = True
+        self.previous_index = None
         self.distance_traveled = 0.0
         self.passenger_count = 0
-        # FIX THIS FOR RED LINE
-        self.travel_direction = self.track_data.sections[self.current_section].increasing # This gets updated when switching sections
+        self.travel_direction = self.track_data.SPAWN_DIRECTION # 0 decreasing, 1 increasing, updated from the topology tables
         self.train_model = None
+        # This train's random numbers, keyed by how many trains the line has spawned because train ids get reused
+        self.serial = track_model.trains_spawned
+        track_model.trains_spawned += 1
+        self.rng = rng.streams.stream(track_model.name, "train", self.serial)
 
         self.pending_command = None  # holds saved speed/authority
         self.pending_failure = False  # flag if the train was blocked due to a track circuit failure
@@ -112,64 +161,58 @@ class Train:
 
         # Unoccupy the previous block only if the entire train has entered the current block
         if self.previous_block and distance_within_block >= train_length:
-            self.dynamic_track.occupancies[self.previous_block.id] = Occupancy.UNOCCUPIED
+            self.dynamic_track.changed_blocks.add(self.previous_index)
 
         if distance_within_block > self.current_block.length:
             self.previous_block = self.current_block
+            self.previous_index = self.current_index
             self.distance_traveled += self.current_block.length
             self.entered_new_section = False
 
             # Move to new block
-            if self.current_block.switch and not self.previous_switch_exit:
-                self.previous_switch_entrance = True
-                self.previous_switch_exit = False
-                switch = self.track_data.switches[self.current_block.id]
-                switchState = self.dynamic_track.switch_states[self.current_block.id]
-                nextBlock = switch.positions[1 if switchState else 0].split("-")[1]
-                self.current_block = self.track_data.blocks[int(nextBlock) - 1]
-            elif self.current_block.switch_exit and not self.previous_switch_entrance:
-                
-                self.previous_switch_exit = True
-                self.previous_switch_entrance = False
-                switch = self.track_data.switches[self.track_data.switch_exits[self.current_block.id].switch_entrance]
-                switchState = self.dynamic_track.switch_states[self.track_data.switch_exits[self.current_block.id].switch_entrance]
-                switchBlocks = switch.positions[1 if switchState else 0].split("-")
-                if switchBlocks[1] == self.current_block.id[1:]:
-                    self.current_block = self.track_data.blocks[int(switchBlocks[0]) - 1]
-                else:
-                    print("TRAIN CRASH FROM SWITCH POSITION")
-                    print("TRAIN CRASH FROM SWITCH POSITION")
-                    print("TRAIN CRASH FROM SWITCH POSITION")
-                    print("TRAIN CRASH FROM SWITCH POSITION")
-                    print("TRAIN CRASH FROM SWITCH POSITION")
-                    print("TRAIN CRASH FROM SWITCH POSITION")
-                    print("TRAIN CRASH FROM SWITCH POSITION")
-                    print("TRAIN CRASH FROM SWITCH POSITION")
-                    print("TRAIN CRASH FROM SWITCH POSITION")
-                    print("TRAIN CRASH FROM SWITCH POSITION")
-                    print("TRAIN CRASH FROM SWITCH POSITION")
-                    print("TRAIN CRASH FROM SWITCH POSITION")
-                    print("TRAIN CRASH FROM SWITCH POSITION")
-                    print("TRAIN CRASH FROM SWITCH POSITION")
+            switch_index = self.track_data.end_switches[self.current_index, self.travel_direction]
+            switch_state = 0
+            if switch_index >= 0:
+                switch_state = int(self.dynamic_track.switch_states[switch_index])
+            next_index, next_direction = self.track_data.next_block(self.current_index, self.travel_direction, switch_state)
+
+            if next_index == self.track_data.DESPAWN:
+                self.track_model.remove_train(self.train_id)
+                self.dynamic_track.occupancies[self.current_index] = Occupancy.UNOCCUPIED.value
+                return
+            elif next_index < 0:
+                self.track_model.crash_count += 1
+                print("TRAIN CRASH FROM SWITCH POSITION")
+                print("TRAIN CRASH FROM SWITCH POSITION")
+                print("TRAIN CRASH FROM SWITCH POSITION")
+                print("TRAIN CRASH FROM SWITCH POSITION")
+                print("TRAIN CRASH FROM SWITCH POSITION")
+                print("TRAIN CRASH FROM SWITCH POSITION")
+                print("TRAIN CRASH FROM SWITCH POSITION")
+                print("TRAIN CRASH FROM SWITCH POSITION")
+                print("TRAIN CRASH FROM SWITCH POSITION")
+                print("TRAIN CRASH FROM SWITCH POSITION")
+                print("TRAIN CRASH FROM SWITCH POSITION")
+                print("TRAIN CRASH FROM SWITCH POSITION")
+                print("TRAIN CRASH FROM SWITCH POSITION")
+                print("TRAIN CRASH FROM SWITCH POSITION")
             else:
-                self.previous_switch_exit = False
-                self.previous_switch_entrance = False
-                # Check for despawn block
-                if self.current_block == self.track_data.DESPAWN_BLOCK:
-                    self.track_model.remove_train(self.train_id)
-                    self.dynamic_track.occupancies[self.current_block.id] = Occupancy.UNOCCUPIED
-                    return
-                self.current_block = self.track_data.blocks[int(self.current_block.id[1:]) + (self.travel_direction * 2 - 1) - 1]
+                self.track_model.move_train(self, self.current_index, next_index)
+                self.current_index = next_index
+                self.current_block = self.track_data.blocks[next_index]
+                self.travel_direction = next_direction
 
             # broken rail failure check
-            if self.dynamic_track.failures.get(self.current_block.id, Failures.NONE) == Failures.BROKEN_RAIL_FAILURE:
+            if self.dynamic_track.failures[self.current_index] == Failures.BROKEN_RAIL_FAILURE.value:
+                self.track_model.crash_count += 1
                 print(f"TRAIN CRASH FROM BROKEN RAIL at block {self.current_block.id}!")
                 # simulate crash behavior - you could add self.train_model.crash() if you want too
                 return
 
 
             # check if new block is occupied (i.e. a crash occurs)
-            if self.dynamic_track.occupancies[self.current_block.id] == Occupancy.OCCUPIED:
+            if self.dynamic_track.occupancies[self.current_index] == Occupancy.OCCUPIED.value:
+                self.track_model.crash_count += 1
                 print("TRAIN CRASH FROM OCCUPANCIES")
                 print("TRAIN CRASH FROM OCCUPANCIES")
                 print("TRAIN CRASH FROM OCCUPANCIES")
@@ -180,10 +223,10 @@ class Train:
                 print("TRAIN CRASH FROM OCCUPANCIES")
             else:
                 # Set new block to occupied
-                self.dynamic_track.occupancies[self.current_block.id] = Occupancy.OCCUPIED
+                self.dynamic_track.occupancies[self.current_index] = Occupancy.OCCUPIED.value
 
             # Check for beacon data in new block, if its there, send to train model
-            if self.track_data.blocks[int(self.current_block.id[1:]) - 1].beacon:
+            if self.current_block.beacon:
                 send_to_train = {}
                 send_to_train["beacon_data"] = self.track_data.beacons[self.current_block.id].data
                 self.train_model.set_input_data(track_data=send_to_train)
@@ -197,12 +240,12 @@ class Train:
                 ticket_sales = self.track_model.station_ticket_sales.get(station_id, 0)
 
                 MAX_PASSENGERS = 148
-                MAX_BOARDING = random.randint(10, 25)
+                MAX_BOARDING = int(rng.streams.stream(self.track_model.name, "station", station_id).integers(10, 26))
 
                 min_required_to_leave = max(0, (self.passenger_count + MAX_BOARDING) - MAX_PASSENGERS)
                 max_possible_to_leave = min(25, self.passenger_count)
 
-                passengers_leaving = random.randint(min_required_to_leave, max_possible_to_leave) if max_possible_to_leave >= min_required_to_leave else self.passenger_count
+                passengers_leaving = int(self.rng.integers(min_required_to_leave, max_possible_to_leave + 1)) if max_possible_to_leave >= min_required_to_leave else self.passenger_count
                 self.passenger_count -= passengers_leaving
 
                 available_space = MAX_PASSENGERS - self.passenger_count
@@ -226,25 +269,6 @@ class Train:
 
 
 
-            # Move to new section
-            if self.current_block.id[0] != self.current_section:
-                # print("New section")
-                increasing = self.track_data.sections[self.current_block.id[0]].increasing
-                if increasing == 2:
-                    # Hard code red line directions cause they dont follow the rules
-                    if self.track_data.line_name == "Red":
-                        if self.current_block.id == "A1":
-                            self.travel_direction = 1
-                        elif self.previous_block == "O67" or self.previous_block == "R72":
-                            self.travel_direction = 1
-                        else:
-                            self.travel_direction = 1 if self.current_block.id[0] > self.current_section else 0
-                    else:
-                        self.travel_direction = 1 if self.current_block.id[0] > self.current_section else 0
-                else:
-                    self.travel_direction = increasing
-                self.current_section = self.current_block.id[0]
-                
             # print("BLOCK: " + self.current_block.id)
 
         
@@ -275,48 +299,47 @@ class TrackModel(QtWidgets.QMainWindow):
         self.wayside_integrated = wayside_integrated
         if wayside_integrated:
             self.wayside_collection = WaysideControllerCollection(self)
-            self.wayside_collection.frontend.show()
+            if not global_clock.clock.kernel_driven: # nobody looks at the windows when running headless
+                self.wayside_collection.frontend.show()
 
         self.trains = []  # holds Train instances
         self.train_counter = 0
+        self.trains_spawned = 0 # trains ever spawned on this line, unlike train_counter it never goes down
+        self.crash_count = 0 # crashes so far, read by the scenario runner
         self.train_collection = TrainCollection(line_name=self.name)
         
 
         # Populate dynamic track
-        self.dynamic_track = DynamicTrack()
-        for block in self.track_data.blocks:
-            self.dynamic_track.occupancies[block.id] = Occupancy.UNOCCUPIED
-            if block.switch:
-                self.dynamic_track.switch_states[block.id] = False
-            if block.light:
-                self.dynamic_track.light_states[block.id] = False
-            if block.crossing:
-                self.dynamic_track.crossing_states[block.id] = False
-
-        # Initializing Ticket Sales at Stations
+        self.dynamic_track = DynamicTrack(self.track_data)
+        self.trains_by_block = [[] for _ in self.track_data.blocks] # the trains whose current block is each block index
+
+        # Initializing Ticket Sales at Stations, drawn for every station at once from the line's stream
         self.station_ticket_sales = {}
-        for block in self.track_data.blocks:
-            if getattr(block, "station", None):  # Only for blocks with a station
-                self.station_ticket_sales[block.id] = random.randint(10, 100)
-                self.runtime_status[block.id] = {
-                    "ticket_sales": self.station_ticket_sales[block.id],
-                    "boarding": 0,
-                    "departing": 0
-                }
+        station_ids = [block.id for block in self.track_data.blocks if getattr(block, "station", None)] # Only for blocks with a station
+        ticket_sales = rng.streams.stream(self.name, "tickets").integers(10, 101, size=len(station_ids))
+        for block_id, sales in zip(station_ids, ticket_sales):
+            self.station_ticket_sales[block_id] = int(sales)
+            self.runtime_status[block_id] = {
+                "ticket_sales": self.station_ticket_sales[block_id],
+                "boarding": 0,
+                "departing": 0
+            }
 
 
         self.global_clock = global_clock.clock
         self.prev_time = None
         self.timer = QtCore.QTimer(self)
         self.timer.timeout.connect(self.update)
-        self.timer.start(self.global_clock.track_dt)
+        if not self.global_clock.kernel_driven:
+            self.timer.start(self.global_clock.track_dt)
 
         self.temperature = 70.0
         self.heater_status = {}
 
         self.heater_timer = QtCore.QTimer(self)
         self.heater_timer.timeout.connect(self.heater_step_up)
-        self.heater_timer.start(2000)  # every 2 seconds
+        if not self.global_clock.kernel_driven:
+            self.heater_timer.start(2000)  # every 2 seconds
 
 
         
@@ -325,18 +348,9 @@ class TrackModel(QtWidgets.QMainWindow):
         self.update_trains()
         self.update_occupancies_from_failures()
 
-        # Update occupancies based on failure state
-        for block_id, failure in self.dynamic_track.failures.items():
-            if failure in [Failures.POWER_FAILURE, Failures.BROKEN_RAIL_FAILURE]:
-                self.dynamic_track.occupancies[block_id] = Occupancy.OCCUPIED
-            elif failure == Failures.NONE:
-                # Only set UNOCCUPIED if no train is sitting on the block
-                train_present = any(train.current_block.id == block_id for train in self.trains)
-                if not train_present:
-                    self.dynamic_track.occupancies[block_id] = Occupancy.UNOCCUPIED
         if self.wayside_integrated:
             for controller in self.wayside_collection.controllers: # have to iterate through each controller now due to what profeta said
-                controller.set_occupancies(self.dynamic_track.occupancies) # use the dictionary for each controller, but the controller only looks at blocks in its territory
+                controller.set_occupancies(self.dynamic_track.occupancies) # use the array for each controller, but the controller only looks at blocks in its territory
 
     # Populating the trains with information sent from train
     def update_trains(self):
@@ -359,33 +373,18 @@ class TrackModel(QtWidgets.QMainWindow):
         # self.track_data.update(filepath) # ACTUALLY DO
 
     # Updating switches, lights, and railway crossings sent from wayside
-    def update_from_plc_outputs(self, sorted_blocks, switch_states, light_states, crossing_states):
-        # Updating switch position , should display the proper next block
-        # XOR with current position list and compare to see if update
-        switch_keys = [block.id for block in sorted_blocks if block.switch]
-        for i, state in enumerate(switch_states):
-            if i < len(switch_keys):
-                self.dynamic_track.switch_states[switch_keys[i]]=state
-                # direction = "higher-numbered" if state else "lower-numbered"
-                # print(f"[Wayside Update] Switch at Block {switch_keys[i]} set to {self.track_data.switches[switch_keys[i].positions[1 if state else 0]]} connection.")
-
-        # Updating light states, should display green/red
-        # XOR with current position list and compare to see if update
-        light_keys = [block.id for block in sorted_blocks if block.light]
-        for i, state in enumerate(light_states):
-            if i < len(light_keys):
-                self.dynamic_track.light_states[light_keys[i]]=state
-                # color = "Green" if state else "Red"
-                # print(f"[Wayside Update] Light at Block {light_keys[i]} turned {color}.")
-
-        # Updating railway crossing position, should display if open/closed
-        # XOR with current position list and compare to see if update
-        crossing_keys = [block.id for block in sorted_blocks if block.crossing]
-        for i, state in enumerate(crossing_states):
-            if i < len(crossing_keys):
-                self.dynamic_track.crossing_states[crossing_keys[i]]=state
-                # status = "ACTIVE (train approaching)" if state else "INACTIVE (safe for cars)"
-                # print(f"[Wayside Update] Crossing at Block {crossing_keys[i]} is now {status}.")
+    def update_from_plc_outputs(self, device_block_indices, switch_states, light_states, crossing_states):
+        """
+        Sets the switches, lights and crossings of one wayside's territory from its plc outputs
+
+        :param device_block_indices: [switch, light, crossing] block indices of the territory in plc output order,
+                                     from WaysideControllerCollection.device_block_indices
+        """
+        # The wayside works out which block each output belongs to once, so the outputs are written straight into the arrays
+        switch_indices, light_indices, crossing_indices = device_block_indices
+        self.dynamic_track.switch_states[switch_indices] = switch_states
+        self.dynamic_track.light_states[light_indices] = light_states
+        self.dynamic_track.crossing_states[crossing_indices] = crossing_states
 
     def update_from_comms_outputs(self, wayside_speeds={}, wayside_authorities={}, maintenances={}):
         for train in self.trains:
@@ -404,16 +403,20 @@ class TrackModel(QtWidgets.QMainWindow):
                         send_to_train["wayside_authority"] = wayside_authorities[train.previous_block.id] + train.previous_block.length
             if train.current_block.id in wayside_authorities:
                 send_to_train["wayside_authority"] = wayside_authorities[train.current_block.id]
+                if send_to_train["wayside_authority"] not in (0, None):
+                    # The authority counts from the start of the block, take off how far the train got before it arrived.
+                    # Only holds when the train didn't cross more than one block since the last update, see SimulationKernel.MAX_STEP
+                    send_to_train["wayside_authority"] -= train.train_model.get_output_data()["position"] - train.distance_traveled
 
             # Check if current or previous block has Track Circuit Failure
             if train.previous_block:
                 in_failure = (
-                    self.dynamic_track.failures.get(train.previous_block.id, Failures.NONE) == Failures.TRACK_CIRCUIT_FAILURE or
-                    self.dynamic_track.failures.get(train.current_block.id, Failures.NONE) == Failures.TRACK_CIRCUIT_FAILURE
+                    self.dynamic_track.failures[train.previous_index] == Failures.TRACK_CIRCUIT_FAILURE.value or
+                    self.dynamic_track.failures[train.current_index] == Failures.TRACK_CIRCUIT_FAILURE.value
                 )
             else:
                 in_failure = (
-                    self.dynamic_track.failures.get(train.current_block.id, Failures.NONE) == Failures.TRACK_CIRCUIT_FAILURE
+                    self.dynamic_track.failures[train.current_index] == Failures.TRACK_CIRCUIT_FAILURE.value
                 )
 
             if in_failure:
@@ -434,13 +437,14 @@ class TrackModel(QtWidgets.QMainWindow):
 
         # Update maintenance occupancies as normal
         for block, maintenance in maintenances.items():
-            self.dynamic_track.occupancies[block] = Occupancy.MAINTENANCE if maintenance else Occupancy.UNOCCUPIED
+            self.dynamic_track.set_occupancy(block, Occupancy.MAINTENANCE if maintenance else Occupancy.UNOCCUPIED)
 
         
     #  Sends beacon data when a train is on the specific block
     def send_beacon_data(self, block_id: str):
         # Check if a train is on this block
-        train_on_block = any(train.current_block == block_id for train in self.trains)
+        index = self.track_data.block_indices.get(block_id)
+        train_on_block = index is not None and len(self.trains_by_block[index]) > 0
         if not train_on_block:
             print(f"[Beacon] No train present on {block_id}. Beacon not sent.")
             return
@@ -451,7 +455,7 @@ class TrackModel(QtWidgets.QMainWindow):
             return
 
         # If track circuit failure - dont send
-        if self.dynamic_track.failures.get(block_id, Failures.NONE) == Failures.TRACK_CIRCUIT_FAILURE:
+        if self.dynamic_track.get_failure(block_id) == Failures.TRACK_CIRCUIT_FAILURE:
             print(f"[Beacon] Track Circuit Failure on {block_id}. Beacon not sent.")
             return
 
@@ -496,29 +500,50 @@ class TrackModel(QtWidgets.QMainWindow):
 
         # Store train in backend registry
         self.trains.append(new_train)
+        self.move_train(new_train, None, new_train.current_index)
 
         # Mark the block as occupied
-        self.dynamic_track.occupancies[spawn_block.id]=Occupancy.OCCUPIED
+        self.dynamic_track.set_occupancy(spawn_block.id, Occupancy.OCCUPIED)
         # self.update_block_occupancy(spawn_block, "Occupied")
 
         print(f"[Train Init] Train {train_id} initialized on {spawn_block}.")
     def remove_train(self, train_id):
+        rng.streams.forget(self.name, "train", self.trains[train_id].serial)
+        self.move_train(self.trains[train_id], self.trains[train_id].current_index, None)
         for i in range(train_id+1, self.train_counter):
             self.trains[i].train_id-=1
         self.train_collection.remove_train(train_id)
         self.trains.pop(train_id)
         self.train_counter-=1
         
-    def update_occupancies_from_failures(self):
-        for block_id in self.dynamic_track.occupancies:
-            failure = self.dynamic_track.failures.get(block_id, Failures.NONE)
+    def move_train(self, train, old_index, new_index):
+        """
+        Keeps the block to train index up to date when a train enters or leaves a block
 
-            if failure in [Failures.BROKEN_RAIL_FAILURE, Failures.POWER_FAILURE]:
-                self.dynamic_track.occupancies[block_id] = Occupancy.OCCUPIED
-            else:
+        :param train: The Train that moved
+
+        :param old_index: The index of the block it left, None when it was just spawned
+
+        :param new_index: The index of the block it entered, None when it is being removed
+        """
+        if old_index is not None:
+            self.trains_by_block[old_index].remove(train)
+            self.dynamic_track.changed_blocks.add(old_index)
+        if new_index is not None:
+            self.trains_by_block[new_index].append(train)
+            self.dynamic_track.changed_blocks.add(new_index)
+
+    def update_occupancies_from_failures(self):
+        # Only the blocks whose trains or failures changed since the last call need to be worked out again
+        occupancies = self.dynamic_track.occupancies
+        failures = self.dynamic_track.failures
+        for index in self.dynamic_track.changed_blocks:
+            if failures[index] in (Failures.BROKEN_RAIL_FAILURE.value, Failures.POWER_FAILURE.value):
+                occupancies[index] = Occupancy.OCCUPIED.value
+            elif not self.trains_by_block[index]:
                 # Only clear if no train is actually occupying the block
-                if all(train.current_block.id != block_id for train in self.trains):
-                    self.dynamic_track.occupancies[block_id] = Occupancy.UNOCCUPIED
+                occupancies[index] = Occupancy.UNOCCUPIED.value
+        self.dynamic_track.changed_blocks.clear()
 
 
     # Set temperature from frontend
@@ -549,11 +574,11 @@ class TrackModel(QtWidgets.QMainWindow):
 
     # Get current light state for a block
     def get_light_state(self, block_id):
-        return "GREEN" if self.dynamic_track.light_states.get(block_id, False) else "RED"
+        return "GREEN" if self.dynamic_track.get_light_state(block_id) else "RED"
 
     # Get current railway crossing state for a block
     def get_crossing_state(self, block_id):
-        return "ACTIVE" if self.dynamic_track.crossing_states.get(block_id, False) else "INACTIVE"
+        return "ACTIVE" if self.dynamic_track.get_crossing_state(block_id) else "INACTIVE"
 
 
 
@@ -362,8 +362,8 @@ class TrackMapCanvas(QGraphicsView):
 
         # Update block colors based on occupancy and general failure presence
         for block_id, item in self.block_items.items():
-            occ = self.backend.dynamic_track.occupancies.get(block_id, Occupancy.UNOCCUPIED)
-            fail = self.backend.dynamic_track.failures.get(block_id, Failures.NONE)
+            occ = self.backend.dynamic_track.get_occupancy(block_id)
+            fail = self.backend.dynamic_track.get_failure(block_id)
 
             if fail != Failures.NONE:
                 item.setBrush(QBrush(QColor("yellow")))
@@ -390,9 +390,7 @@ class TrackMapCanvas(QGraphicsView):
 
 
         # Add new failure icons
-        for block_id, failure in self.backend.dynamic_track.failures.items():
-            if failure == Failures.NONE:
-                continue
+        for block_id, failure in self.backend.dynamic_track.get_failed_blocks():
 
             rect = self.block_items.get(block_id)
             if not rect:
@@ -835,8 +833,8 @@ class TrackModelFrontEnd(QMainWindow):
             print(f"Block {block_id} not found.")
             return
 
-        occ = self.current_line.dynamic_track.occupancies.get(block_id, Occupancy.UNOCCUPIED)
-        fail = self.current_line.dynamic_track.failures.get(block_id, Failures.NONE)
+        occ = self.current_line.dynamic_track.get_occupancy(block_id)
+        fail = self.current_line.dynamic_track.get_failure(block_id)
         temp = self.current_line.temperature
         heater = self.current_line.heater_status.get(block_id, False)
 
@@ -878,7 +876,7 @@ class TrackModelFrontEnd(QMainWindow):
         self.ui.beacon_value.setText(beacon.data if beacon else "None")
 
         # Railway Crossing Status
-        crossing_state = self.current_line.dynamic_track.crossing_states.get(block_id, False)
+        crossing_state = self.current_line.dynamic_track.get_crossing_state(block_id)
         self.ui.railway_crossing_value.setText("Active" if crossing_state else "Inactive")
 
         # Environmental Info
@@ -896,7 +894,7 @@ class TrackModelFrontEnd(QMainWindow):
 
     def toggle_failure(self, kind):
         block_id = self.ui.block_selected_value.text()
-        current = self.current_line.dynamic_track.failures.get(block_id, Failures.NONE)
+        current = self.current_line.dynamic_track.get_failure(block_id)
 
         if kind == "track":
             new_val = Failures.NONE if current == Failures.TRACK_CIRCUIT_FAILURE else Failures.TRACK_CIRCUIT_FAILURE
@@ -908,15 +906,14 @@ class TrackModelFrontEnd(QMainWindow):
             print(f"[ERROR] Unknown failure kind: {kind}")
             return
 
-        self.current_line.dynamic_track.failures[block_id] = new_val
+        self.current_line.dynamic_track.set_failure(block_id, new_val)
 
         self.map_canvas.update_block_colors()
 
 
     def reset_failures(self):
         # Clear all failures in backend
-        for block_id in self.current_line.dynamic_track.failures:
-            self.current_line.dynamic_track.failures[block_id] = Failures.NONE
+        self.current_line.dynamic_track.clear_failures()
 
         # Force recheck of occupancy states (especially for rail/power failures)
         self.current_line.update_occupancies_from_failures()
@@ -998,7 +995,7 @@ class TrackModelFrontEnd(QMainWindow):
 
         elif icon_type == "switch":
             switch = line.track_data.switches.get(block_id)
-            state = line.dynamic_track.switch_states.get(block_id)
+            state = line.dynamic_track.get_switch_state(block_id)
             if switch and state is not None:
                 route = switch.positions[1 if state else 0]
                 print(f"[SWITCH INFO]")
@@ -1008,13 +1005,13 @@ class TrackModelFrontEnd(QMainWindow):
                 print(f"[SWITCH CLICKED] No switch found for block {block_id}")
 
         elif icon_type == "railway_crossing":
-            crossing_state = line.dynamic_track.crossing_states.get(block_id, False)
+            crossing_state = line.dynamic_track.get_crossing_state(block_id)
             print(f"[CROSSING INFO]")
             print(f"  Block: {block_id}")
             print(f"  State: {'Active' if crossing_state else 'Inactive'}")
 
         elif icon_type == "traffic_light":
-            light_state = line.dynamic_track.light_states.get(block_id, False)
+            light_state = line.dynamic_track.get_light_state(block_id)
             print(f"[TRAFFIC LIGHT INFO]")
             print(f"  Block: {block_id}")
             print(f"  State: {'Green' if light_state else 'Red'}")
@@ -1073,7 +1070,7 @@ class TrackModelFrontEnd(QMainWindow):
             switch = backend.track_data.switches.get(block_id)
             if not switch:
                 return None
-            state = backend.dynamic_track.switch_states.get(block_id, False)
+            state = backend.dynamic_track.get_switch_state(block_id)
             route = switch.positions[1 if state else 0]
 
             try:
@@ -1115,7 +1112,7 @@ class TrackModelFrontEnd(QMainWindow):
 
 
         elif icon_type == "railway_crossing":
-            crossing_state = backend.dynamic_track.crossing_states.get(block_id, False)
+            crossing_state = backend.dynamic_track.get_crossing_state(block_id)
             payload.update({
                 "name": "Railway Crossing",
                 "icon_path": os.path.join(BASE_DIR, "Resources",
@@ -1126,7 +1123,7 @@ class TrackModelFrontEnd(QMainWindow):
 
 
         elif icon_type == "traffic_light":
-            light_state = backend.dynamic_track.light_states.get(block_id, False)
+            light_state = backend.dynamic_track.get_light_state(block_id)
             payload.update({
                 "name": "Traffic Light",
                 "icon_path": os.path.join(BASE_DIR, "Resources",
@@ -9,6 +9,7 @@ os.environ['QT_AUTO_SCREEN_SCALE_FACTOR'] = '1'
 import globals.global_clock as global_clock
 import globals.track_data_class as track_data
 import globals.signals as signals
+import globals.rng as rng
 
 # Actual backend
 from Track.TrackModel.track_model_backend import TrackModel
@@ -28,6 +29,7 @@ if __name__ == "__main__":
 
     # Required global state
     global_clock.init()
+    rng.init()
     track_data.init()  # This is the actual real data you want
     signals.init()
 
@@ -43,7 +45,7 @@ if __name__ == "__main__":
 
                 train = self.track_model.trains[0]
                 block_id = train.current_block.id
-                occupancy = self.track_model.dynamic_track.occupancies[block_id]
+                occupancy = self.track_model.dynamic_track.get_occupancy(block_id)
 
                 print(f"Train successfully initialized on block {block_id}")
                 print(f"Block {block_id} occupancy: {occupancy.name}")
@@ -1,7 +1,27 @@
+from Track.WaysideController.plc_library import bit, bit_range, set_bit, set_bits, bits_shift, bits_look_ahead_clamp
+
+PLC_IO = "bitmask" # every argument is an int where bit i is what index i of the list would be, see plc_library
+
+# Sections, as masks of their blocks
+A_B_C = bit_range(0, 12)
+D_E_F = bit_range(12, 28)
+E = bit_range(16, 20)
+Y_Z = bit_range(50, 54)
+
+# Blocks of each branch that get the look ahead clamp check, the last two blocks of a branch are left to the switch clamping
+# (overlapping territory in other wayside should account for the end of the section)
+TERRITORY_BRANCH_W_Z = bit_range(38, 52)
+TERRITORY_BRANCH_D_I = bit_range(12, 36)
+TERRITORY_BRANCH_F_A = bit_range(2, 28) # travelled from f28 down to a
+F28 = 1 << 27
+
+
 def plc_logic(block_occupancies, switch_positions, light_signals, crossing_signals, previous_occupancies, exit_blocks, clamps):
     """
     User-defined logic for controlling track switches, lights, and crossing signals.
 
+    Runs with PLC_IO = "bitmask", so every argument and return value is an int where bit i is what index i of the list would be.
+
     :param block_occupancies: The current occupancies of the track
 
         - True for occupancies indicates: OCCUPIED
@@ -44,87 +64,32 @@ def plc_logic(block_occupancies, switch_positions, light_signals, crossing_signa
     # Has 4 Lights A1, C12, G29, Z150
     # Has 1 Crossing E19
 
-    train_in_a_b_c = any(block_occupancies[0:12])
+    train_in_a_b_c = bool(block_occupancies & A_B_C)
 
-    train_in_d_e_f = any(block_occupancies[12:28])
+    train_in_d_e_f = bool(block_occupancies & D_E_F)
 
-    train_in_e = any(block_occupancies[16:20])
+    train_in_e = bool(block_occupancies & E)
 
-    train_in_y_z = any(block_occupancies[50:54])
-    
-    train_in_a = any(block_occupancies[0:3])
+    train_in_y_z = bool(block_occupancies & Y_Z)
   
-    switch_positions[0] = train_in_a_b_c and not train_in_d_e_f
-    light_signals[0] = switch_positions[0]
-    light_signals[1] = not light_signals[0]
-
-    switch_positions[1] = train_in_y_z and not (train_in_d_e_f or train_in_a_b_c)
-    light_signals[2] = not switch_positions[1]
-    light_signals[3] = not light_signals[2]
-
-    crossing_signals[0] = train_in_e
-
-    territory_branch_w_z = list(range(38,54)) # that specify which blocks in the block occupancies list to iterate through
-    territory_branch_d_i = list(range(12,38))
-    territory_branch_f_a = list(range(27,-1,-1)) 
-
-    # each branch needs to do separate checks.
-    for i, block_idx in enumerate(territory_branch_w_z): # block index is a value within the range, but i is just index based on the length of the range
-        if block_occupancies[block_idx]: # for any occupied block
-            distance_to_end = len(territory_branch_w_z) - i 
-            if distance_to_end > 2: # that is not next to the end of the section (overlapping territory in other wayside should account for this, or approaching a switch which is handled differently)
-                if block_occupancies[block_idx] and previous_occupancies[block_idx - 1 if block_idx > 0 else 0]: # if traveling 
-                    if block_occupancies[block_idx + 2]: # only need to check the blocks that arent right by the switch since switch clamping is handled separate?
-                        clamps[block_idx] = True
-                elif block_occupancies[block_idx] and previous_occupancies[block_idx]: # if stationary at the block since last cycle
-                    if block_occupancies[block_idx + 2]:
-                        clamps[block_idx] = True
-                
-                if clamps[block_idx]: # check any current clamps to make sure the condition is no longer true
-                    if not block_occupancies[block_idx + 2]:
-                        clamps[block_idx] = False
-
-    for i, block_idx in enumerate(territory_branch_d_i):
-        if block_occupancies[block_idx]:
-            distance_to_end = len(territory_branch_d_i) - i
-            if distance_to_end > 2:
-                if block_occupancies[block_idx] and previous_occupancies[block_idx - 1 if block_idx > 0 else 0]: # if traveling 
-                    if block_occupancies[block_idx + 2]: # only need to check the blocks that arent right by the switch since switch clamping is handled separate?
-                        clamps[block_idx] = True
-                elif block_occupancies[block_idx] and previous_occupancies[block_idx]: # if stationary at the block since last cycle
-                    if block_occupancies[block_idx + 2]:
-                        clamps[block_idx] = True
-               
-                if clamps[block_idx]: # check any current clamps to make sure the condition is no longer trade
-                    if not block_occupancies[block_idx + 2]:
-                        clamps[block_idx] = False
-
-    for i, block_idx in enumerate(territory_branch_f_a):
-        if block_occupancies[block_idx]:
-            distance_to_end = abs(len(territory_branch_f_a) - i)
-            if distance_to_end > 2:
-                if block_occupancies[block_idx] and previous_occupancies[block_idx + 1 if block_idx < (len(territory_branch_f_a) - 1)  else block_idx]: # if traveling 
-                    if block_occupancies[block_idx - 2]: # only need to check the blocks that arent right by the switch since switch clamping is handled separate?
-                        clamps[block_idx] = True
-                elif block_occupancies[block_idx] and previous_occupancies[block_idx]: # if stationary at the block since last cycle
-                    if block_occupancies[block_idx - 2]:
-                        clamps[block_idx] = True
-                
-                if clamps[block_idx]: # check any current clamps to make sure the condition is no longer trade
-                    if not block_occupancies[block_idx - 2]:
-                        clamps[block_idx] = False
+    switch_0 = train_in_a_b_c and not train_in_d_e_f
+    switch_1 = train_in_y_z and not (train_in_d_e_f or train_in_a_b_c)
+    switch_positions = set_bit(set_bit(switch_positions, 0, switch_0), 1, switch_1)
+    light_signals = set_bit(set_bit(set_bit(set_bit(light_signals, 0, switch_0), 1, not switch_0), 2, not switch_1), 3, switch_1)
+
+    crossing_signals = set_bit(crossing_signals, 0, train_in_e)
+
+    # each branch needs to do separate checks, bit i of the shifted occupancies lines block i up with the block it runs into
+    # or came from, w-z and d-i are both travelled in increasing order
+    clamps = bits_look_ahead_clamp(block_occupancies, previous_occupancies, clamps, TERRITORY_BRANCH_W_Z | TERRITORY_BRANCH_D_I,
+                                   bits_shift(block_occupancies, 2), bits_shift(previous_occupancies, -1))
+    # the block behind f28 is f28 itself
+    clamps = bits_look_ahead_clamp(block_occupancies, previous_occupancies, clamps, TERRITORY_BRANCH_F_A,
+                                   bits_shift(block_occupancies, -2), bits_shift(previous_occupancies, 1) & ~F28)
      
     # if the switch position is in the wrong position 13-12 and there is a train in the off section
-    if not switch_positions[0] and train_in_a_b_c:
-        clamps[0:2] = [True]*len(clamps[0:2]) # clamp the blocks in a just in case
-    else:
-        clamps[0:2] = [False]*len(clamps[0:2])
+    clamps = set_bits(clamps, bit_range(0, 2), not switch_0 and train_in_a_b_c) # clamp the blocks in a just in case
     # if the switch is in the wrong position 28-29 and there is a train in the section incoming
-    if not switch_positions[1] and train_in_y_z:
-        clamps[52:54] = [True]*len(clamps[52:54]) # clamp the blocks in z in case
-    else:
-        clamps[52:54] = [False]*len(clamps[52:54])
-     
+    clamps = set_bits(clamps, bit_range(52, 54), not switch_1 and train_in_y_z) # clamp the blocks in z in case
         
     return switch_positions, light_signals, crossing_signals, clamps
-    
@@ -1,7 +1,23 @@
+from Track.WaysideController.plc_library import bit, bit_range, set_bit, set_bits, bits_shift, bits_look_ahead_clamp
+
+PLC_IO = "bitmask" # every argument is an int where bit i is what index i of the list would be, see plc_library
+PLC_TIME_DEPENDENT = True # light 1 flips every scan, so the program has to run even when nothing else changed
+
+# Sections, as masks of their blocks
+I = bit_range(0, 22)
+J = bit_range(22, 27)
+
+# Blocks of each branch that get the look ahead clamp check, both are travelled in increasing order
+TERRITORY_BRANCH_I_L = bit_range(0, 37)
+TERRITORY_BRANCH_U_W = bit_range(39, 64)
+
+
 def plc_logic(block_occupancies, switch_positions, light_signals, crossing_signals, previous_occupancies, exit_blocks, clamps):
     """
     User-defined logic for controlling track switches.
 
+    Runs with PLC_IO = "bitmask", so every argument and return value is an int where bit i is what index i of the list would be.
+
     :param block_occupancies: The current occupancies of the track
 
         - True for occupancies indicates: OCCUPIED
@@ -34,6 +50,7 @@ def plc_logic(block_occupancies, switch_positions, light_signals, crossing_signa
     
     :returns switch_positions, light_signals, light_signals crossing_signals, previous_occupancies:
     """
+
     # For Wayside #2
     # HAS 66 Blocks in its Territory
     # Sections: I[0,22) J[22,27) K[27,33) L[33,39) U[39,43) V[43,48) W[48,64) y[64,66)
@@ -41,65 +58,26 @@ def plc_logic(block_occupancies, switch_positions, light_signals, crossing_signa
     # Has 4 Lights J58, J62, y151, y152
     # Has 0 Crossings
 
+    train_in_i = bool(block_occupancies & I)
 
+    train_in_j = bool(block_occupancies & J)
 
-    train_in_i = any(block_occupancies[0:22])
+    train_entering_track = bit(block_occupancies, 64)
 
-    train_in_j = any(block_occupancies[22:27])
+    switch_0 = (train_in_i and bit(exit_blocks, 1)) 
+    switch_1 = train_in_j
+    switch_positions = set_bit(set_bit(switch_positions, 0, switch_0), 1, switch_1)
+    light_signals = set_bit(set_bit(set_bit(set_bit(light_signals, 0, not switch_0), 1, not bit(light_signals, 1)), 2, switch_1), 3, not switch_1)
 
-    train_entering_track = block_occupancies[64]
-
-    switch_positions[0] = (train_in_i and exit_blocks[1]) 
-    light_signals[0] = not switch_positions[0]
-    light_signals[1] = not light_signals[1]
-    
-    switch_positions[1] = train_in_j
-    light_signals[2] = switch_positions[1]
-    light_signals[3] = not light_signals[2]
-
-
-    territory_branch_i_l = list(range(0,39))
-    territory_branch_u_w = list(range(39,64))
-
-    for i, block_idx in enumerate(territory_branch_i_l):
-        if block_occupancies[block_idx]:  # only need to check until overlap section reached or a few blocks before a switch
-            distance_to_end = abs(len(territory_branch_i_l) - i)
-            if distance_to_end > 2:
-                if block_occupancies[block_idx] and previous_occupancies[block_idx - 1 if block_idx > 0 else 0]:
-                    if block_occupancies[block_idx + 2]:
-                        clamps[block_idx] = True
-                elif block_occupancies[block_idx] and previous_occupancies[block_idx]:
-                    if block_occupancies[block_idx + 2]:
-                        clamps[block_idx] = True
-                if clamps[block_idx]:
-                    if not block_occupancies[block_idx + 2]:
-                        clamps[block_idx] = False
-
-    for i, block_idx in enumerate(territory_branch_u_w):
-        if block_occupancies[block_idx]:
-            distance_to_end = abs(len(territory_branch_i_l) - i)
-            if distance_to_end > 2: # only need to check until overlap section reached or a few blocks before a switch
-                if block_occupancies[block_idx] and previous_occupancies[block_idx - 1 if block_idx > 0 else 0]:
-                    if block_occupancies[block_idx + 2]:
-                        clamps[block_idx] = True
-                elif block_occupancies[block_idx] and previous_occupancies[block_idx]:
-                    if block_occupancies[block_idx + 2]:
-                        clamps[block_idx] = True
-                if clamps[block_idx]:
-                    if not block_occupancies[block_idx + 2]:
-                        clamps[block_idx] = False
+    # only need to check until overlap section reached or a few blocks before a switch
+    clamps = bits_look_ahead_clamp(block_occupancies, previous_occupancies, clamps, TERRITORY_BRANCH_I_L | TERRITORY_BRANCH_U_W,
+                                   bits_shift(block_occupancies, 2), bits_shift(previous_occupancies, -1))
 
     # if switch position facing the yard and train in j
-    if not switch_positions[1] and train_in_j:
+    if not switch_1 and train_in_j:
         print("clamping j")
-        clamps[25:27] = [True]*len(clamps[25:27])
-    else:
-        clamps[25:27] = [False]*len(clamps[25:27])
+    clamps = set_bits(clamps, bit_range(25, 27), not switch_1 and train_in_j)
     
-    if switch_positions[1] and train_entering_track:
-        clamps[64] = True
-    else:
-        clamps[64] = False
+    clamps = set_bit(clamps, 64, switch_1 and train_entering_track)
     
     return switch_positions, light_signals, crossing_signals, clamps
-
@@ -1,7 +1,26 @@
+from Track.WaysideController.plc_library import bit, bit_range, set_bit, set_bits, bits_shift, bits_look_ahead_clamp
+
+PLC_IO = "bitmask" # every argument is an int where bit i is what index i of the list would be, see plc_library
+
+# Sections, as masks of their blocks
+O_P_Q = bit_range(17, 33)
+N = bit_range(8, 17)
+M = bit_range(5, 8)
+T = bit_range(36, 41)
+
+# Blocks of each branch that get the look ahead clamp check, all travelled in increasing order.
+# n is shared by n-q and n-u and only checked on the way to q
+TERRITORY_BRANCH_L_M = bit_range(0, 6)
+TERRITORY_BRANCH_N_Q = bit_range(8, 30)
+TERRITORY_BRANCH_R_U = bit_range(32, 42)
+
+
 def plc_logic(block_occupancies, switch_positions, light_signals, crossing_signals, previous_occupancies, exit_blocks, clamps):
     """
     User-defined logic for controlling track switches.
 
+    Runs with PLC_IO = "bitmask", so every argument and return value is an int where bit i is what index i of the list would be.
+
     :param block_occupancies: The current occupancies of the track
 
         - True for occupancies indicates: OCCUPIED
@@ -34,6 +53,7 @@ def plc_logic(block_occupancies, switch_positions, light_signals, crossing_signa
     
     :returns switch_positions, light_signals, light_signals crossing_signals, previous_occupancies:
     """
+
     # For Wayside #3
     # HAS 44 Blocks in its Territory
     # Sections: L[0, 5) M[5, 8) N[8, 17) O[17, 20) P[20, 29) Q[29, 32) R[32, 33) S[33, 36) T[36, 41) U[41,44)
@@ -41,80 +61,25 @@ def plc_logic(block_occupancies, switch_positions, light_signals, crossing_signa
     # Has 4 Lights M76, Q86, Q100, R101
     # Has 1 Crossing T108
 
-    train_in_o_p_q = any(block_occupancies[17:33])
-    train_in_n = any(block_occupancies[8:17])
-    train_in_m = any(block_occupancies[5:8])
-    train_in_t = any(block_occupancies[36:41])
-
-
-    switch_positions[0] = train_in_n or train_in_o_p_q 
-    light_signals[0] = not switch_positions[0]
-    light_signals[2] = not light_signals[0]
-
-
-    switch_positions[1] = train_in_o_p_q and not train_in_n
-    light_signals[1] = not switch_positions[1]
-    light_signals[3] = not light_signals[1]
-
-    crossing_signals[0] = train_in_t
-
-    territory_branch_l_m = list(range(0,8))
-    territory_branch_n_u = list(range(16,7,-1)) + list(range(32,44))
-    territory_branch_n_q = list(range(8,32))
-
-    for i, block_idx in enumerate(territory_branch_l_m):
-        if block_occupancies[block_idx]:  # only need to check until overlap section reached or a few blocks before a switch
-            distance_to_end = abs(len(territory_branch_l_m) - i)
-            if distance_to_end > 2:
-                if block_occupancies[block_idx] and previous_occupancies[block_idx - 1 if block_idx > 0 else 0]:
-                    if block_occupancies[block_idx + 2]:
-                        clamps[block_idx] = True
-                elif block_occupancies[block_idx] and previous_occupancies[block_idx]:
-                    if block_occupancies[block_idx + 2]:
-                        clamps[block_idx] = True
-                if clamps[block_idx]:
-                    if not block_occupancies[block_idx + 2]:
-                        clamps[block_idx] = False
-
-    for i, block_idx in enumerate(territory_branch_n_q):
-        if block_occupancies[block_idx]:  # only need to check until overlap section reached or a few blocks before a switch
-            distance_to_end = abs(len(territory_branch_n_q) - i)
-            if distance_to_end > 2:
-                if block_occupancies[block_idx] and previous_occupancies[block_idx - 1 if block_idx > 0 else 0]:
-                    if block_occupancies[block_idx + 2]:
-                        clamps[block_idx] = True
-                elif block_occupancies[block_idx] and previous_occupancies[block_idx]:
-                    if block_occupancies[block_idx + 2]:
-                        clamps[block_idx] = True
-                if clamps[block_idx]:
-                    if not block_occupancies[block_idx + 2]:
-                        clamps[block_idx] = False
-
-                        
-    for i, block_idx in enumerate(territory_branch_n_u):
-        if block_occupancies[block_idx]:  # only need to check until overlap section reached or a few blocks before a switch
-            distance_to_end = abs(len(territory_branch_n_u) - i)
-            if block_idx in range(8,17):
-                 pass
-            else:
-                if distance_to_end > 2:
-                    if block_occupancies[block_idx] and previous_occupancies[block_idx - 1 if block_idx > 0 else 0]:
-                        if block_occupancies[block_idx + 2]:
-                            clamps[block_idx] = True
-                    elif block_occupancies[block_idx] and previous_occupancies[block_idx]:
-                        if block_occupancies[block_idx + 2]:
-                            clamps[block_idx] = True
-                    if clamps[block_idx]:
-                        if not block_occupancies[block_idx + 2]:
-                            clamps[block_idx] = False
+    train_in_o_p_q = bool(block_occupancies & O_P_Q)
+    train_in_n = bool(block_occupancies & N)
+    train_in_m = bool(block_occupancies & M)
+    train_in_t = bool(block_occupancies & T)
+
+
+    switch_0 = train_in_n or train_in_o_p_q 
+    switch_1 = train_in_o_p_q and not train_in_n
+    switch_positions = set_bit(set_bit(switch_positions, 0, switch_0), 1, switch_1)
+    light_signals = set_bit(set_bit(set_bit(set_bit(light_signals, 0, not switch_0), 2, switch_0), 1, not switch_1), 3, switch_1)
+
+    crossing_signals = set_bit(crossing_signals, 0, train_in_t)
+
+    # only need to check until overlap section reached or a few blocks before a switch
+    clamps = bits_look_ahead_clamp(block_occupancies, previous_occupancies, clamps,
+                                   TERRITORY_BRANCH_L_M | TERRITORY_BRANCH_N_Q | TERRITORY_BRANCH_R_U,
+                                   bits_shift(block_occupancies, 2), bits_shift(previous_occupancies, -1))
 
     # switch to position 77-101 and train in m
-    if switch_positions[0] and train_in_m:
-        clamps[6:8] = [True]*len(clamps[6:8])
-    else:
-        clamps[6:8] = [False]*len(clamps[6:8])
-    
-    
+    clamps = set_bits(clamps, bit_range(6, 8), switch_0 and train_in_m)
 
     return switch_positions, light_signals, crossing_signals, clamps
-
@@ -0,0 +1,186 @@
+"""
+Date: 10-18-2026
+Description:
+    Vectorized building blocks for PLC programs that use the bitset I/O modes instead of lists of booleans.
+    A PLC program picks its mode by setting PLC_IO at the top of the file:
+
+        PLC_IO = "list"    # the default, every input and output is a list of bools
+        PLC_IO = "numpy"   # every input and output is a NumPy bool array, index i is block/switch/light/crossing i
+        PLC_IO = "bitmask" # every input and output is an int, bit i is block/switch/light/crossing i
+
+    plc_logic keeps the same arguments and return values in every mode, only their type changes.
+
+    The wayside controller skips scans whose inputs are the same as the last scan that ran. A program whose outputs depend on
+    anything besides its arguments (the time, a counter kept between scans) has to set PLC_TIME_DEPENDENT = True to run every scan.
+"""
+import numpy as np
+
+PLC_IO_MODES = ("list", "numpy", "bitmask")
+
+
+# ----- NumPy bool arrays -----
+
+def range_any(values, start, stop):
+    """
+    :return: True if any of values[start:stop] is True, e.g. whether a train is in a section
+    """
+    return bool(values[start:stop].any())
+
+
+def branch(start, stop, step=1):
+    """
+    :return: The block indices of a branch in the order a train travels through it, the same as list(range(start, stop, step))
+    """
+    return np.arange(start, stop, step)
+
+
+def shifted(blocks, offset, low=0, high=None):
+    """
+    :param blocks: Block indices, e.g. from branch
+
+    :param offset: How many blocks to shift by, e.g. 2 for two blocks ahead on an increasing branch
+
+    :param low: The lowest index the result is limited to
+
+    :param high: The highest index the result is limited to, no limit when None
+
+    :return: The indices offset blocks away from each block, limited to [low, high]
+    """
+    return np.clip(blocks + offset, low, high)
+
+
+def look_ahead_clamp(occupancies, previous_occupancies, clamps, blocks, ahead, behind):
+    """
+    The clamp rule the PLC programs use on every branch, for a whole branch at once:
+    an occupied block is clamped when the block ahead of it is occupied and the train was travelling (the block behind
+    it was occupied last scan) or stationary (its own block was occupied last scan), and a clamp is released as soon
+    as the block ahead is clear. Unoccupied blocks keep their clamp.
+
+    :param occupancies: The current occupancies
+
+    :param previous_occupancies: The occupancies from the last scan
+
+    :param clamps: The clamps, updated in place
+
+    :param blocks: The indices of the blocks to check
+
+    :param ahead: For each block, the index of the block the train would run into
+
+    :param behind: For each block, the index of the block the train came from
+
+    :return: clamps
+    """
+    occupied = occupancies[blocks]
+    keep = clamps[blocks] | previous_occupancies[behind] | previous_occupancies[blocks]
+    clamps[blocks] = np.where(occupied, occupancies[ahead] & keep, clamps[blocks])
+    return clamps
+
+
+def rising_edge(current, previous):
+    """
+    :return: True where a value turned on since the last scan, e.g. a train entering a block
+    """
+    return current & ~previous
+
+
+def falling_edge(current, previous):
+    """
+    :return: True where a value turned off since the last scan, e.g. a train leaving a block
+    """
+    return ~current & previous
+
+
+# ----- Integer bitmasks -----
+
+def to_bits(values):
+    """
+    :param values: A list or array of bools
+
+    :return: An int with bit i set when values[i] is True
+    """
+    return sum(1 << i for i, value in enumerate(values) if value)
+
+
+def from_bits(bits, count):
+    """
+    :param bits: An int bitmask
+
+    :param count: The number of values the bitmask holds
+
+    :return: A list of count bools, True where the bit is set
+    """
+    # formatting as a binary string is quicker than testing each bit
+    return [digit == "1" for digit in reversed(format(bits, "0%db" % count))][:count]
+
+
+def bit_range(start, stop):
+    """
+    :return: A mask with bits start to stop - 1 set
+    """
+    return ((1 << (stop - start)) - 1) << start
+
+
+def bits_any(bits, start, stop):
+    """
+    :return: True if any of bits start to stop - 1 are set
+    """
+    return bool(bits & bit_range(start, stop))
+
+
+def bit(bits, index):
+    """
+    :return: Whether bit index is set
+    """
+    return bool(bits >> index & 1)
+
+
+def set_bit(bits, index, value):
+    """
+    :return: bits with bit index set to value
+    """
+    return bits | (1 << index) if value else bits & ~(1 << index)
+
+
+def set_bits(bits, mask, value):
+    """
+    :return: bits with every bit in mask set to value, e.g. to clamp a whole section
+    """
+    return bits | mask if value else bits & ~mask
+
+
+def bits_shift(bits, offset):
+    """
+    :return: A bitmask where bit i is bit i + offset of bits, so offset 2 lines every block up with the block two ahead of it
+    """
+    return bits >> offset if offset >= 0 else bits << -offset
+
+
+def bits_look_ahead_clamp(occupancies, previous_occupancies, clamps, blocks, ahead, behind):
+    """
+    look_ahead_clamp for bitmasks
+
+    :param blocks: A mask of the blocks to check
+
+    :param ahead: A bitmask where bit i is the occupancy of the block block i would run into, e.g. bits_shift(occupancies, 2)
+
+    :param behind: A bitmask where bit i is the previous occupancy of the block block i came from, e.g. bits_shift(previous_occupancies, -1)
+
+    :return: The new clamps
+    """
+    occupied = occupancies & blocks
+    clamped = ahead & (clamps | behind | previous_occupancies)
+    return (clamps & ~occupied) | (clamped & occupied)
+
+
+def bits_rising_edge(current, previous):
+    """
+    :return: The bits that turned on since the last scan
+    """
+    return current & ~previous
+
+
+def bits_falling_edge(current, previous):
+    """
+    :return: The bits that turned off since the last scan
+    """
+    return ~current & previous
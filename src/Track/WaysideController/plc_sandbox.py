@@ -0,0 +1,552 @@
+"""
+Date: 10-18-2026
+Description:
+    Runs PLC programs in worker processes instead of importing them into the simulator, turned on with settings.PLC_SANDBOX.
+    Every program gets a worker of its own. A program that is slow, loops forever or crashes can't stall or take down the
+    simulation or another territory's program, it only misses its own scans: the controller keeps the last safe outputs and
+    the miss is reported. Its worker is restarted when it is stuck or dead, and after PlcSandbox.QUARANTINE_FAULTS faults in a
+    row the program is quarantined instead, it stays stopped until a new program is loaded. Territories scan at the same time,
+    on different cores when there are some.
+
+    Inputs and outputs cross between the processes as bit packed bytes, each list of bools becomes ceil(n / 8) bytes.
+
+    With settings.PLC_TMR each program is loaded into three workers (triple modular redundancy). Every scan runs on
+    all three at once and each output bit is majority voted, so a replica that crashes, hangs or gives a wrong answer is
+    outvoted. Disagreements between the replicas are recorded.
+"""
+import importlib.util
+import multiprocessing
+import os
+import time
+
+import globals.global_clock as global_clock
+import globals.settings as settings
+from Track.WaysideController.plc_library import PLC_IO_MODES, to_bits, from_bits
+
+INPUT_FIELDS = ("blocks", "switches", "lights", "crossings", "blocks", "exits", "blocks") # the arguments of plc_logic
+OUTPUT_FIELDS = ("switches", "lights", "crossings", "blocks") # and what it returns
+TMR_REPLICAS = 3 # copies of each program settings.PLC_TMR runs
+WORKER_DIED = "its worker died" # why a scan or load failed when the program took its whole worker process down with it
+
+
+def pack(values, counts):
+    """
+    :param values: Lists of bools
+
+    :param counts: The length of each list
+
+    :return: The lists bit packed into one bytes object
+    """
+    return b"".join(to_bits(field).to_bytes((count + 7) // 8, "little") for field, count in zip(values, counts))
+
+
+def unpack(buffer, counts):
+    """
+    :param buffer: Bytes made by pack
+
+    :param counts: The length of each list
+
+    :return: The bits of each list as an int
+    """
+    fields = []
+    start = 0
+    for count in counts:
+        stop = start + (count + 7) // 8
+        fields.append(int.from_bytes(buffer[start:stop], "little"))
+        start = stop
+    return fields
+
+
+def to_program(bits, count, plc_io):
+    """
+    :return: A field's bits as the type the program asked for with PLC_IO
+    """
+    if plc_io == "bitmask":
+        return bits
+    values = from_bits(bits, count)
+    if plc_io == "numpy":
+        import numpy as np # only loaded by workers that run numpy programs
+        return np.array(values, dtype=bool)
+    return values
+
+
+def from_program(output, plc_io, name, count):
+    """
+    :param count: The number of values the output should have
+
+    :return: One of a program's outputs as bits, raises TypeError if it isn't the type the program's PLC_IO promises and
+             ValueError if it has the wrong number of values
+    """
+    if plc_io == "bitmask":
+        valid = isinstance(output, int)
+    elif plc_io == "numpy":
+        valid = getattr(output, "dtype", None) == bool
+    else:
+        valid = isinstance(output, list) and all(isinstance(value, bool) for value in output)
+    if not valid:
+        raise TypeError(f"Error: The PLC logic function must only modify {name} as boolean (True/False).")
+    if plc_io != "bitmask" and len(output) != count:
+        raise ValueError(f"Error: The PLC logic function must return {count} {name} for this territory, not {len(output)}.")
+    return output if plc_io == "bitmask" else to_bits(output)
+
+
+def run_scan(program, inputs):
+    """
+    :param program: (module, plc_io, counts) of a loaded program
+
+    :param inputs: The packed arguments of plc_logic
+
+    :return: The packed outputs
+    """
+    module, plc_io, counts = program
+    input_counts = [counts[field] for field in INPUT_FIELDS]
+    arguments = [to_program(bits, count, plc_io) for bits, count in zip(unpack(inputs, input_counts), input_counts)]
+    outputs = module.plc_logic(*arguments)
+    names = ("switch positions", "light signals", "crossing signals", "clamps")
+    bits = [from_program(output, plc_io, name, counts[field]) for output, name, field in zip(outputs, names, OUTPUT_FIELDS)]
+    return b"".join(field.to_bytes((counts[name] + 7) // 8, "little") for field, name in zip(bits, OUTPUT_FIELDS))
+
+
+def load_program(file_path, key, counts):
+    """
+    Imports a program in the worker and runs it once on an empty track, the same checks WaysideController.load_program does
+
+    :return: (module, plc_io, counts)
+    """
+    spec = importlib.util.spec_from_file_location(f"plc_program_{key}", file_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    if not hasattr(module, "plc_logic") or not callable(module.plc_logic):
+        raise ValueError("Error: The PLC program must define a callable 'plc_logic(block_occupancies, switch_positions, light_signals, crossing_signals, previous_occupancies, exit_blocks, clamps)' function.")
+    plc_io = getattr(module, "PLC_IO", "list")
+    if plc_io not in PLC_IO_MODES:
+        raise ValueError(f"Error: PLC_IO must be one of {PLC_IO_MODES}.")
+    program = (module, plc_io, counts)
+    run_scan(program, pack([[False] * counts[field] for field in INPUT_FIELDS], [counts[field] for field in INPUT_FIELDS]))
+    return program
+
+
+def plc_worker(connection):
+    """
+    Entry point of a worker process, loads programs and scans them when the main process asks
+
+    :param connection: The worker's end of the pipe to the main process
+    """
+    programs = {}
+    while True:
+        command, request, key, payload = connection.recv()
+        try:
+            if command == "scan":
+                connection.send(("outputs", request, run_scan(programs[key], payload)))
+            elif command == "load":
+                programs[key] = load_program(payload[0], key, payload[1])
+                connection.send(("loaded", request, bool(getattr(programs[key][0], "PLC_TIME_DEPENDENT", False))))
+            elif command == "close":
+                break
+        except BaseException as e: # anything the user's program raises is sent back instead of killing the worker, sys.exit too
+            connection.send(("error", request, f"{type(e).__name__}: {e}"))
+    connection.close()
+
+
+class PlcSandbox:
+    LOAD_TIMEOUT = 30.0 # seconds to wait for a program to load, the first load also waits for the worker to start
+    QUARANTINE_FAULTS = 5 # faults in a row (exceptions, missed deadlines, dead workers) before a program is stopped for good
+
+    def __init__(self, deadline=None):
+        """
+        :param deadline: Wall clock seconds a scan has to finish in, settings.PLC_SCAN_DEADLINE when None and one wayside_dt
+                         of the global clock when that is None too
+        """
+        self.deadline = deadline or settings.PLC_SCAN_DEADLINE
+        # Spawn instead of fork so the workers start without the simulator's Qt state
+        self.context = multiprocessing.get_context("spawn")
+        # Every program gets its own worker, so a program that crashes or hangs never takes another territory's scans with it
+        self.workers = [] # (process, connection) of each program's worker, None once it is stopped
+        self.worker_keys = [] # the key of the program each worker runs
+        self.restarting = [] # (reloads not answered yet, time to give up) of each worker being restarted
+        self.loaded = {} # key: (worker index, file path, counts) of every loaded program, to reload them after a restart
+        self.pending = {} # key: (worker index, request number, deadline) of the scan each program is running
+        self.replies = {} # request number: replies that arrived while waiting for another request
+        self.faults = {} # key: faults of the program in a row
+        self.quarantined = {} # key: why the program was stopped
+        self.next_key = 0
+        self.next_request = 0
+
+    def scan_deadline(self):
+        """
+        :return: Wall clock seconds a scan has to finish in, the outputs have to be voted on before the next wayside update
+        """
+        return self.deadline or global_clock.clock.wayside_dt / 1000
+
+    def start_worker(self, index):
+        connection, worker_connection = self.context.Pipe()
+        process = self.context.Process(target=plc_worker, args=(worker_connection,), daemon=True)
+        process.start()
+        worker_connection.close()
+        self.workers[index] = (process, connection)
+
+    def stop_worker(self, index):
+        """
+        Kills a worker for good, its program was unloaded or quarantined
+        """
+        if self.workers[index] is not None:
+            process, connection = self.workers[index]
+            process.kill()
+            process.join()
+            connection.close()
+        self.workers[index] = None
+        self.restarting[index] = None
+
+    def restart_worker(self, index):
+        """
+        Kills a worker that missed a deadline, it could be stuck in a loop, and loads its program into a new one.
+        The load isn't waited for, the program misses its scans until it is back up.
+        """
+        process, connection = self.workers[index]
+        process.kill()
+        process.join()
+        connection.close()
+        self.start_worker(index)
+        reloads = set()
+        for key, (worker, file_path, counts) in self.loaded.items():
+            if worker == index:
+                request = self.next_request
+                self.next_request += 1
+                try:
+                    self.workers[index][1].send(("load", request, key, (file_path, counts)))
+                except OSError:
+                    break # the new worker died while loading, is_restarting finds out and restarts it again
+                reloads.add(request)
+        self.restarting[index] = (reloads, time.perf_counter() + self.LOAD_TIMEOUT) if reloads else None
+        # scans the old worker was running are lost
+        for key, (worker, request, deadline) in list(self.pending.items()):
+            if worker == index:
+                self.pending[key] = (worker, None, deadline)
+
+    def fault(self, key, reason, restart):
+        """
+        Counts a fault of a program. After QUARANTINE_FAULTS in a row the program is quarantined: its worker is stopped and
+        it misses every scan from then on, instead of its worker being restarted over and over.
+
+        :param restart: Whether the program's worker has to be restarted, it is stuck or dead
+
+        :return: Why the scan was missed
+        """
+        self.faults[key] = self.faults.get(key, 0) + 1
+        index = self.loaded[key][0]
+        if self.faults[key] >= self.QUARANTINE_FAULTS:
+            self.quarantined[key] = f"quarantined after {self.faults[key]} faults in a row, the last one: {reason}"
+            self.stop_worker(index)
+            return self.quarantined[key]
+        if restart:
+            self.restart_worker(index)
+        return reason
+
+    def is_restarting(self, index):
+        """
+        :return: Whether a restarted worker is still reloading its program, without waiting for it
+        """
+        if self.restarting[index]:
+            connection = self.workers[index][1]
+            try:
+                while self.restarting[index] and connection.poll(0):
+                    self.receive(index, connection.recv(), None)
+            except (EOFError, OSError): # the program killed the worker while loading
+                self.fault(self.worker_keys[index], WORKER_DIED, restart=True)
+                return True
+            if self.restarting[index] and time.perf_counter() > self.restarting[index][1]:
+                self.fault(self.worker_keys[index], "it took too long to load", restart=True) # the program hangs while loading
+        return bool(self.restarting[index])
+
+    def receive(self, index, reply, request):
+        """
+        Sorts a reply from a worker, keeps replies to scans that will be collected later and drops the rest
+
+        :param request: The request being waited for
+        """
+        if self.restarting[index] and reply[1] in self.restarting[index][0]:
+            self.restarting[index][0].discard(reply[1])
+            if not self.restarting[index][0]:
+                self.restarting[index] = None
+        elif reply[1] == request or any(reply[1] == pending for _, pending, _ in self.pending.values()):
+            self.replies[reply[1]] = reply
+
+    def send(self, index, command, key, payload):
+        """
+        :return: The number of the request, to wait for its reply with, None if the worker is dead
+        """
+        request = self.next_request
+        self.next_request += 1
+        try:
+            self.workers[index][1].send((command, request, key, payload))
+        except OSError: # the pipe is broken, a program took the worker down, e.g. with os._exit or a segfault
+            return None
+        return request
+
+    def wait(self, index, request, deadline):
+        """
+        :return: The reply a worker sent to a request, None if it didn't arrive before the deadline, an error reply if the
+                 worker died
+        """
+        connection = self.workers[index][1]
+        try:
+            while request not in self.replies:
+                # a reply already in the pipe still counts when the deadline passed while another program was waited for
+                if not connection.poll(max(deadline - time.perf_counter(), 0)):
+                    return None
+                self.receive(index, connection.recv(), request)
+        except (EOFError, OSError): # the worker is gone, a program called sys.exit in a way it couldn't catch, os._exit, segfaulted...
+            return ("error", request, WORKER_DIED)
+        return self.replies.pop(request)
+
+    def load(self, file_path, counts):
+        """
+        Loads a program into a worker of its own
+
+        :param file_path: The path to the plc program
+
+        :param counts: The number of "blocks", "switches", "lights", "crossings" and "exits" of the program's territory
+
+        :return: A SandboxedProgram, raises ValueError if the program couldn't be loaded
+        """
+        file_path = os.path.abspath(file_path)
+        key = self.next_key
+        self.next_key += 1
+        index = len(self.workers)
+        self.workers.append(None)
+        self.worker_keys.append(key)
+        self.restarting.append(None)
+        self.start_worker(index)
+        request = self.send(index, "load", key, (file_path, counts))
+        reply = ("error", request, WORKER_DIED) if request is None else self.wait(index, request, time.perf_counter() + self.LOAD_TIMEOUT)
+        if reply is None or reply[0] == "error":
+            self.stop_worker(index)
+        if reply is None:
+            raise ValueError("Error: The PLC program took too long to load.")
+        if reply[0] == "error":
+            raise ValueError(reply[2] if reply[2] != WORKER_DIED else f"Error: The PLC program could not be loaded, {WORKER_DIED}.")
+        self.loaded[key] = (index, file_path, counts)
+        return SandboxedProgram(self, key, counts, reply[2])
+
+    def load_replicated(self, file_path, counts):
+        """
+        Loads TMR_REPLICAS copies of a program, each in its own worker
+
+        :return: A TmrProgram, raises ValueError if the program couldn't be loaded
+        """
+        replicas = []
+        try:
+            for _ in range(TMR_REPLICAS):
+                replicas.append(self.load(file_path, counts))
+        except ValueError:
+            for replica in replicas:
+                replica.unload()
+            raise
+        return TmrProgram(replicas)
+
+    def unload(self, key):
+        """
+        Forgets a program that was replaced and stops its worker
+        """
+        if key in self.loaded:
+            self.stop_worker(self.loaded.pop(key)[0])
+        _, request, _ = self.pending.pop(key, (None, None, None))
+        self.replies.pop(request, None)
+
+    def submit(self, key, inputs):
+        """
+        Starts a scan without waiting for it
+
+        :param inputs: The packed arguments of plc_logic
+        """
+        index = self.loaded[key][0]
+        # is_restarting can quarantine the program too, so it is checked again after
+        if key in self.quarantined or self.is_restarting(index) or key in self.quarantined:
+            request = None
+        else:
+            request = self.send(index, "scan", key, inputs)
+            if request is None:
+                self.fault(key, WORKER_DIED, restart=True)
+        self.pending[key] = (index, request, time.perf_counter() + self.scan_deadline())
+
+    def collect(self, key):
+        """
+        Waits for a scan started with submit
+
+        :return: (the packed outputs or None, why there are none)
+        """
+        index, request, deadline = self.pending.pop(key)
+        if key in self.quarantined:
+            return None, self.quarantined[key]
+        if request is None:
+            return None, "its worker is restarting"
+        reply = self.wait(index, request, deadline)
+        if reply is None:
+            return None, self.fault(key, f"missed the {self.scan_deadline() * 1000:.0f} ms deadline", restart=True)
+        if reply[0] == "error":
+            return None, self.fault(key, reply[2], restart=reply[2] == WORKER_DIED)
+        self.faults[key] = 0
+        return reply[2], None
+
+    def close(self):
+        """
+        Stops the worker processes
+        """
+        for index, worker in enumerate(self.workers):
+            if worker is None:
+                continue
+            process, connection = worker
+            if process.is_alive():
+                try:
+                    connection.send(("close", None, None, None))
+                except OSError:
+                    pass # it died after all, it is killed below either way
+            process.join(1.0)
+            if process.is_alive():
+                process.kill()
+            connection.close()
+            self.workers[index] = None
+
+
+class SandboxedProgram:
+    PLC_IO = "list"
+
+    def __init__(self, sandbox, key, counts, time_dependent):
+        """
+        Stands in for a program's module in WaysideController.program, plc_logic runs the program in the sandbox
+
+        :param sandbox: The PlcSandbox the program is loaded in
+
+        :param key: The program's key in the sandbox
+
+        :param counts: The number of "blocks", "switches", "lights", "crossings" and "exits" of the program's territory
+
+        :param time_dependent: The program's PLC_TIME_DEPENDENT
+        """
+        self.sandbox = sandbox
+        self.key = key
+        self.input_counts = [counts[field] for field in INPUT_FIELDS]
+        self.output_counts = [counts[field] for field in OUTPUT_FIELDS]
+        self.PLC_TIME_DEPENDENT = time_dependent
+        self.safe_outputs = None # what the controller keeps when a scan is missed
+        self.last_miss = None # why the last scan was missed, None if it wasn't
+        self.submit_time = 0.0
+        self.scan_latency = 0.0 # wall clock seconds from submit until the outputs of the last scan were collected
+
+    def submit(self, *inputs):
+        """
+        Starts a scan, takes the same arguments as plc_logic
+        """
+        self.safe_outputs = (inputs[1], inputs[2], inputs[3], inputs[6])
+        self.submit_time = time.perf_counter()
+        self.sandbox.submit(self.key, pack(inputs, self.input_counts))
+
+    def collect(self):
+        """
+        :return: The outputs of the scan started with submit, the last safe outputs if it was missed
+        """
+        outputs = self.collect_bits()
+        if outputs is None:
+            return self.safe_outputs
+        return [from_bits(bits, count) for bits, count in zip(outputs, self.output_counts)]
+
+    def collect_bits(self):
+        """
+        :return: The outputs of the scan started with submit as ints, None if it was missed
+        """
+        outputs, self.last_miss = self.sandbox.collect(self.key)
+        self.scan_latency = time.perf_counter() - self.submit_time
+        return None if outputs is None else unpack(outputs, self.output_counts)
+
+    def plc_logic(self, *inputs):
+        self.submit(*inputs)
+        return self.collect()
+
+    @property
+    def quarantined(self):
+        """
+        :return: Whether the sandbox stopped the program for faulting too many times in a row
+        """
+        return self.key in self.sandbox.quarantined
+
+    def unload(self):
+        self.sandbox.unload(self.key)
+
+
+class TmrProgram(SandboxedProgram):
+    OUTPUT_NAMES = ("switch positions", "light signals", "crossing signals", "clamps")
+
+    def __init__(self, replicas):
+        """
+        Runs every scan on each replica of a program at the same time and majority votes their outputs bit by bit
+
+        :param replicas: The SandboxedPrograms of the replicas, each in a different worker
+        """
+        self.replicas = replicas
+        self.output_counts = replicas[0].output_counts
+        self.PLC_TIME_DEPENDENT = replicas[0].PLC_TIME_DEPENDENT
+        self.safe_outputs = None
+        self.last_miss = None
+        self.submit_time = 0.0
+        self.scan_latency = 0.0
+        self.disagreements = [] # (output name, replica index, mask of the bits it was outvoted on) from the last scan
+
+    def submit(self, *inputs):
+        self.safe_outputs = (inputs[1], inputs[2], inputs[3], inputs[6])
+        self.submit_time = time.perf_counter()
+        for replica in self.replicas:
+            replica.submit(*inputs)
+
+    def collect(self):
+        """
+        :return: The voted outputs of the scan started with submit, the last safe outputs if fewer than two replicas answered
+        """
+        results = [replica.collect_bits() for replica in self.replicas]
+        self.scan_latency = time.perf_counter() - self.submit_time
+        answered = [bits for bits in results if bits is not None]
+        missed = [f"replica {i + 1}: {replica.last_miss}" for i, replica in enumerate(self.replicas) if replica.last_miss]
+        self.disagreements = []
+        # a single replica has nothing to be voted against, its outputs can't be trusted with the switches and clamps
+        self.last_miss = "; ".join(missed) if len(answered) < 2 else None
+        if len(answered) < 2:
+            return self.safe_outputs
+
+        voted = []
+        for output, name in enumerate(self.OUTPUT_NAMES):
+            values = [bits[output] for bits in answered]
+            if len(values) >= 3:
+                a, b, c = values[:3]
+                vote = (a & b) | (a & c) | (b & c)
+            else:
+                # no majority where the two left disagree, keep the safe value for those bits
+                agree = ~(values[0] ^ values[1])
+                vote = (values[0] & agree) | (to_bits(self.safe_outputs[output]) & ~agree)
+            voted.append(vote)
+            for i, bits in enumerate(results):
+                if bits is not None and bits[output] != vote:
+                    self.disagreements.append((name, i, bits[output] ^ vote))
+        return [from_bits(bits, count) for bits, count in zip(voted, self.output_counts)]
+
+    @property
+    def quarantined(self):
+        """
+        :return: Whether too many replicas were quarantined for a vote to be held again
+        """
+        return sum(not replica.quarantined for replica in self.replicas) < 2
+
+    def unload(self):
+        for replica in self.replicas:
+            replica.unload()
+
+
+sandbox = None
+
+
+def shared_sandbox():
+    """
+    :return: The PlcSandbox every controller in this process shares, started the first time it is asked for
+    """
+    global sandbox
+    if sandbox is None:
+        sandbox = PlcSandbox()
+    return sandbox
@@ -8,16 +8,23 @@ import importlib.util
 import sys
 import time
 import os
+from collections import deque
 import globals.signals as Signals
 import globals.global_clock as global_clock
+import globals.settings as settings
 from pathlib import Path
+import numpy as np
 from PyQt5.QtCore import pyqtSlot, QObject, QTimer
 from Track.TrackModel.track_model_enums import Occupancy
 from Track.WaysideController.wayside_controller_collection import WaysideControllerCollection
+from Track.WaysideController.plc_library import PLC_IO_MODES, to_bits, from_bits
+from Track.WaysideController.plc_sandbox import SandboxedProgram, TmrProgram, shared_sandbox
 class WaysideController(QObject):
     """
     Accepts a user created plc program at runtime and executes it.
     """
+    TMR_EVENT_LIMIT = 1000 # only the newest disagreements are kept
+
     def __init__(self, block_count: int, switch_count: int, light_count: int, crossing_count: int, exit_block_count: int, index: int, collection_reference: WaysideControllerCollection):
         """
         :param block_count: Nonnegative Integer number of input blocks to the PLC program
@@ -49,15 +56,35 @@ class WaysideController(QObject):
         self.maintenance_mode = False # A boolean that indicates when the wayside controller is in maintenance mode.
         self.clamps = [False] * block_count # a list of blocks that should have their authority clamped by the plc
         self.program = None # python file uploaded by programmer
+        self.plc_io = "list" # how the program wants its inputs and outputs, set by PLC_IO in the program, see plc_library
+        self.plc_lists = [None] * 7 # the arguments of plc_logic last converted when plc_io is "bitmask"
+        self.plc_bits = [0] * 7 # and what they were converted to
+        self.plc_time_dependent = False # set by PLC_TIME_DEPENDENT in the program, the program then runs every scan even when its inputs didn't change
+        self.last_plc_inputs = None # the inputs of the last scan the program ran on
+        self.last_plc_outputs = None # and the outputs it gave
+        self.executed_scans = 0 # number of scans the program ran on
+        self.skipped_scans = 0 # number of scans skipped because the inputs were the same as the last scan that ran
+        self.missed_scans = 0 # number of sandboxed scans that missed their deadline or crashed, the last safe outputs were kept
+        self.over_budget_scans = 0 # number of sandboxed scans whose outputs came back later than one wayside_dt after they were started
+        self.reported_miss = None # why the last missed scan was missed, so a program that keeps missing is only reported once
+        self.tmr_events = deque(maxlen=self.TMR_EVENT_LIMIT) # replicas that were outvoted when settings.PLC_TMR is on, newest last
+        self.scan_started = False # start_scan has run and finish_scan hasn't yet
+        self.scan_runs = False # whether the started scan runs the program
+        self.block_ids = [block.id for block in self.collection.blocks[self.index]] # ids of the blocks in this territory, used as the keys sent to the ctc
+        self.delta_sequence = 0 # sequence number of the last delta sent to the ctc
+        self.resync_pending = True # the next delta holds every value instead of only the changes, the first one always does
+        self.sent_values = None # (occupancies, switches, lights, crossings) as of the last delta sent to the ctc
 
         Signals.communication_ctc[self.collection.LINE_NAME].ctc_suggested.connect(self.handle_suggested_values) # connect signals
         Signals.communication_ctc[self.collection.LINE_NAME].ctc_exit_blocks.connect(self.handle_exit_blocks)
+        Signals.communication_ctc[self.collection.LINE_NAME].ctc_resync.connect(self.handle_resync)
 
         self.global_clock = global_clock.clock
         self.timer = QTimer() # initialize update timer
         self.timer.setInterval(self.global_clock.wayside_dt)
         self.timer.timeout.connect(self.update)
-        self.timer.start()
+        if not self.global_clock.kernel_driven:
+            self.timer.start()
 
 
     @pyqtSlot()
@@ -67,8 +94,9 @@ class WaysideController(QObject):
         """
         if self.program != None:
             prev_clamps = self.clamps[:] # only need previous clamps temporarily
-            self.previous_occupancies = self.block_occupancies[:] # get what the previous occupancies are
-            self.execute_cycle() # make it so that it calls programmers code 3 times and checks
+            if not self.scan_started: # the kernel starts every controller's scan first so sandboxed programs scan in parallel
+                self.start_scan()
+            self.finish_scan()
                   
             if self.collection.track_model != None:
                 blocks = self.collection.blocks[self.index]
@@ -88,10 +116,13 @@ class WaysideController(QObject):
                         self.commanded_authorities[i] = None
                         self.to_send_authorities[blocks[i].id] = None
                                         
-                Signals.communication_track.wayside_block_occupancies.emit(self.to_send_occupancies, self.collection.LINE_NAME)
-                Signals.communication_track.wayside_plc_outputs.emit(blocks,self.switch_positions,self.light_signals,self.crossing_signals, self.collection.LINE_NAME)
+                if Signals.communication_track.delta_mode:
+                    self.send_delta()
+                else:
+                    Signals.communication_track.wayside_block_occupancies.emit(self.to_send_occupancies, self.collection.LINE_NAME)
+                    Signals.communication_track.wayside_plc_outputs.emit(self.collection.device_block_indices[self.index],self.switch_positions,self.light_signals,self.crossing_signals, self.collection.LINE_NAME)
 
-                self.collection.track_model.update_from_plc_outputs(sorted_blocks=blocks,
+                self.collection.track_model.update_from_plc_outputs(device_block_indices=self.collection.device_block_indices[self.index],
                                                                     switch_states=self.switch_positions,light_states=self.light_signals,
                                                                     crossing_states=self.crossing_signals)
 
@@ -101,25 +132,53 @@ class WaysideController(QObject):
                     self.to_send_speeds = {}
 
 
-    def set_occupancies(self, occupancies: dict):
+    def set_occupancies(self, occupancies):
         """
         Receives occupancy updates from the track model (called by the track model)
 
-        :param occupancies: A dictionary of block occupancies with keyed with the block id
+        :param occupancies: An array of Occupancy values for every block on the line, indexed by block index
         """
         if self.collection.track_model != None and not self.maintenance_mode:
-            for i, block in enumerate(self.collection.blocks[self.index]): # index the blocks only in the range of this controller
-                occupancy = occupancies.get(block.id, Occupancy.UNOCCUPIED) # read from the dictionary
-
-                if occupancy == Occupancy.UNOCCUPIED:
-                    self.block_occupancies[i] = False
-                    self.to_send_occupancies[block.id] = False
-                else:
-                    self.block_occupancies[i] = True # will have to change this with failures but should be fine for now
-                    self.to_send_occupancies[block.id] = True
+            # slice out the blocks only in the range of this controller
+            territory = occupancies[self.collection.block_indices[self.index]]
+            self.block_occupancies = (territory != Occupancy.UNOCCUPIED.value).tolist() # will have to change this with failures but should be fine for now
+            self.to_send_occupancies.update(zip(self.block_ids, self.block_occupancies))
 
                 
 
+    def send_delta(self):
+        """
+        Sends the ctc the occupancies and plc outputs that changed since the last delta, keyed by block index.
+        Nothing is sent when nothing changed, unless the ctc asked for a resync.
+        """
+        values = (self.block_occupancies, self.switch_positions, self.light_signals, self.crossing_signals)
+        block_indices = (self.collection.block_indices[self.index].tolist(), self.collection.switch_block_indices[self.index],
+                         self.collection.light_block_indices[self.index], self.collection.crossing_block_indices[self.index])
+        full = self.resync_pending or self.sent_values is None
+        self.resync_pending = False # cleared before sending since the ctc can ask for a resync while handling this delta
+
+        deltas = []
+        for i, (indices, current) in enumerate(zip(block_indices, values)):
+            if full:
+                deltas.append(dict(zip(indices, current)))
+            else:
+                deltas.append({index: value for index, value, sent in zip(indices, current, self.sent_values[i]) if value != sent})
+
+        if full or any(deltas):
+            self.delta_sequence += 1
+            Signals.communication_track.wayside_delta.emit(self.index, self.delta_sequence, full, *deltas, self.collection.LINE_NAME)
+        self.sent_values = tuple(list(current) for current in values)
+
+    @pyqtSlot(int)
+    def handle_resync(self, index):
+        """
+        Called when the ctc missed a delta from a controller, makes the next delta a full one
+
+        :param index: The index of the controller that has to resync
+        """
+        if index == self.index:
+            self.resync_pending = True
+
     @pyqtSlot(dict, dict)
     def handle_suggested_values(self, speeds, authorities):
         """
@@ -170,17 +229,35 @@ class WaysideController(QObject):
         :param file_path: The file path to the plc program
         """
         try:
-            spec = importlib.util.spec_from_file_location("plc_program", file_path)
-            module = importlib.util.module_from_spec(spec)
-            sys.modules["plc_program"] = module
-            spec.loader.exec_module(module)
+            counts = {"blocks": len(self.block_occupancies), "switches": len(self.switch_positions), "lights": len(self.light_signals),
+                      "crossings": len(self.crossing_signals), "exits": len(self.exit_blocks)}
+            if settings.PLC_TMR:
+                # Three copies that are voted on, each in a different worker process, see plc_sandbox.py
+                module = shared_sandbox().load_replicated(file_path, counts)
+            elif settings.PLC_SANDBOX:
+                # The program is only imported in a worker process, see plc_sandbox.py
+                module = shared_sandbox().load(file_path, counts)
+            else:
+                spec = importlib.util.spec_from_file_location("plc_program", file_path)
+                module = importlib.util.module_from_spec(spec)
+                sys.modules["plc_program"] = module
+                spec.loader.exec_module(module)
             
             # Verify that the program has a valid plc_logic function
             if not hasattr(module, "plc_logic") or not callable(module.plc_logic):
                 raise ValueError("Error: The PLC program must define a callable 'plc_logic(block_occupancies, switch_positions, light_signals, crossing_signals, previous_occupancies, exit_blocks, clamps)' function.")
+            plc_io = getattr(module, "PLC_IO", "list")
+            if plc_io not in PLC_IO_MODES:
+                raise ValueError(f"Error: PLC_IO must be one of {PLC_IO_MODES}.")
 
           
+            if isinstance(self.program, SandboxedProgram):
+                self.program.unload()
             self.program = module
+            self.plc_io = plc_io
+            self.plc_time_dependent = bool(getattr(module, "PLC_TIME_DEPENDENT", False))
+            self.last_plc_inputs = None # a new program always runs on its first scan
+            self.reported_miss = None
 
             # Run an initial verification test
             self.verify_boolean_io()
@@ -220,34 +297,124 @@ class WaysideController(QObject):
 
     def test_program_logic(self):
         """Test if the user-defined PLC logic function modifies only booleans."""
-        test_switches, test_lights, test_crossings, test_clamps = self.program.plc_logic(self.block_occupancies, self.switch_positions, 
-                                                                                           self.light_signals, self.crossing_signals, 
-                                                                                           self.previous_occupancies, self.exit_blocks,
-                                                                                           self.clamps)
+        test_outputs = self.program.plc_logic(*self.plc_inputs())
 
         # Verify outputs after execution
-        if not all(isinstance(value, bool) for value in test_switches):
-            raise TypeError("Error: The PLC logic function must only modify switch positions as boolean (True/False).")
-        
-        if not all(isinstance(value, bool) for value in test_lights):
-            raise TypeError("Error: The PLC logic function must only modify light signals as boolean (True/False).")
-        
-        if not all(isinstance(value, bool) for value in test_crossings):
-            raise TypeError("Error: The PLC logic function must only modify crossing signals as boolean (True/False).")
-        
-        if not all(isinstance(value, bool) for value in test_clamps):
-            raise TypeError("Error: The PLC logic function must only modify clamps as boolean (True/False).")
+        counts = (self.collection.SWITCH_COUNTS[self.index], self.collection.LIGHT_COUNTS[self.index],
+                  self.collection.CROSSING_COUNTS[self.index], self.collection.BLOCK_COUNTS[self.index])
+        for name, output, count in zip(("switch positions", "light signals", "crossing signals", "clamps"), test_outputs, counts):
+            if self.plc_io == "numpy":
+                valid = isinstance(output, np.ndarray) and output.dtype == bool
+            elif self.plc_io == "bitmask":
+                valid = isinstance(output, int)
+            else:
+                valid = all(isinstance(value, bool) for value in output)
+            if not valid:
+                raise TypeError(f"Error: The PLC logic function must only modify {name} as boolean (True/False).")
+            # the track model writes each output straight onto its block, so there has to be exactly one per device
+            if self.plc_io != "bitmask" and len(output) != count:
+                raise ValueError(f"Error: The PLC logic function must return {count} {name} for this territory, not {len(output)}.")
+
+    def plc_inputs(self):
+        """
+        :return: The arguments of plc_logic in the program's I/O mode
+        """
+        inputs = [self.block_occupancies, self.switch_positions, self.light_signals, self.crossing_signals,
+                  self.previous_occupancies, self.exit_blocks, self.clamps]
+        if self.plc_io == "numpy":
+            return [np.array(values, dtype=bool) for values in inputs]
+        if self.plc_io == "bitmask":
+            # Most scans have the same inputs as the last one, so only the lists that changed are converted again
+            if inputs != self.plc_lists:
+                for argument, values in enumerate(inputs):
+                    if values != self.plc_lists[argument]:
+                        self.plc_lists[argument] = values[:]
+                        self.plc_bits[argument] = to_bits(values)
+            return self.plc_bits
+        return inputs
+
+    def plc_outputs(self, outputs):
+        """
+        :param outputs: What plc_logic returned, in the program's I/O mode
 
+        :return: switch positions, light signals, crossing signals and clamps as lists of bools
+        """
+        if self.plc_io == "numpy":
+            return [output.tolist() for output in outputs]
+        if self.plc_io == "bitmask":
+            lists = [self.switch_positions, self.light_signals, self.crossing_signals, self.clamps]
+            # switch positions, light signals, crossing signals and clamps are arguments 1, 2, 3 and 6 of plc_logic
+            for i, argument in enumerate((1, 2, 3, 6)):
+                if outputs[i] != self.plc_bits[argument]:
+                    lists[i] = from_bits(outputs[i], len(lists[i]))
+                    # remember the conversion so the next scan doesn't convert the list back
+                    self.plc_lists[argument] = lists[i][:]
+                    self.plc_bits[argument] = outputs[i]
+            return lists
+        return outputs
+
+
+
+    def plc_fingerprint(self):
+        """
+        :return: Everything the program's outputs depend on, its arguments and whether the controller is in maintenance mode
+        """
+        return [self.maintenance_mode, self.block_occupancies, self.switch_positions, self.light_signals, self.crossing_signals,
+                self.previous_occupancies, self.exit_blocks, self.clamps]
 
+    def start_scan(self):
+        """
+        First half of a scan. Decides whether the program has to run, it does if the inputs changed since the last scan that ran,
+        and starts sandboxed programs so that they run while the other controllers start theirs.
+        Most scans on a quiet line have the same inputs, and the program would give the same outputs for them.
+        """
+        self.previous_occupancies = self.block_occupancies[:] # get what the previous occupancies are
+        fingerprint = self.plc_fingerprint()
+        self.scan_runs = self.plc_time_dependent or fingerprint != self.last_plc_inputs
+        if self.scan_runs:
+            # copy since list programs change their arguments in place
+            self.last_plc_inputs = [value[:] if isinstance(value, list) else value for value in fingerprint]
+            if isinstance(self.program, SandboxedProgram):
+                self.program.submit(*self.plc_inputs())
+        self.scan_started = True
+
+    def finish_scan(self):
+        """
+        Second half of a scan, runs the program or collects what the sandbox ran, otherwise reuses the last outputs
+        """
+        self.scan_started = False
+        if self.scan_runs:
+            if isinstance(self.program, SandboxedProgram):
+                self.switch_positions, self.light_signals, self.crossing_signals, self.clamps = self.program.collect()
+                if self.program.last_miss:
+                    if self.program.last_miss != self.reported_miss:
+                        print(f"❌ {self.collection.LINE_NAME} Wayside #{self.index + 1} PLC scan missed, keeping the last outputs: {self.program.last_miss}")
+                    self.reported_miss = self.program.last_miss
+                    self.missed_scans += 1
+                    self.last_plc_inputs = None # the scan has to run again even if nothing changes
+                else:
+                    self.reported_miss = None
+                    if self.program.scan_latency > self.global_clock.wayside_dt / 1000:
+                        self.over_budget_scans += 1
+                if isinstance(self.program, TmrProgram):
+                    for output, replica, mask in self.program.disagreements:
+                        self.tmr_events.append({"time": self.global_clock.elapsed_seconds, "output": output, "replica": replica + 1,
+                                                "indices": [i for i in range(mask.bit_length()) if mask >> i & 1]})
+            else:
+                self.execute_cycle()
+            self.last_plc_outputs = [self.switch_positions[:], self.light_signals[:], self.crossing_signals[:], self.clamps[:]]
+            self.executed_scans += 1
+        else:
+            # only have to put the outputs back if something else changed them since
+            if [self.switch_positions, self.light_signals, self.crossing_signals, self.clamps] != self.last_plc_outputs:
+                self.switch_positions, self.light_signals, self.crossing_signals, self.clamps = [values[:] for values in self.last_plc_outputs]
+            self.skipped_scans += 1
 
     def execute_cycle(self):
         """Runs one PLC scan cycle"""
         if self.program and hasattr(self.program, "plc_logic"):
             # Run the user-defined PLC logic
-            self.switch_positions, self.light_signals, self.crossing_signals, self.clamps = self.program.plc_logic(self.block_occupancies, self.switch_positions, 
-                                                                                                                   self.light_signals, self.crossing_signals, 
-                                                                                                                   self.previous_occupancies, self.exit_blocks,
-                                                                                                                   self.clamps)
+            self.switch_positions, self.light_signals, self.crossing_signals, self.clamps = self.plc_outputs(self.program.plc_logic(*self.plc_inputs()))
        
             #compare these lists of values with the currently stored ones
             #figure out block id's based on index
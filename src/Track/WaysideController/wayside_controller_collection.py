@@ -5,6 +5,7 @@ Description:
     A Class that contains several WaysideControllers and a Frontend. Responsible for interfacing with the Track Model and CTC
 """
 import sys
+import numpy as np
 import globals.track_data_class as init_track_data
 import globals.signals as signals
 from Track.TrackModel.track_model_enums import Occupancy
@@ -46,6 +47,15 @@ class WaysideControllerCollection(QObject):
 
         # my blocks are a list of lists i filter the main list by territory and then i use ranges to index them in my ui
         self.blocks = [self.get_blocks_for_territory(i + 1, self.track_data.blocks) for i in range(self.CONTROLLER_COUNT)]
+        # the index of each of those blocks in the whole track, so the track model's arrays can be sliced directly
+        self.block_indices = [np.array([self.track_data.block_indices[block.id] for block in blocks], dtype=np.intp) for blocks in self.blocks]
+        # the block index of each switch, light and crossing output of each territory's plc, in the order the plc outputs them
+        self.switch_block_indices = [[self.track_data.block_indices[block.id] for block in blocks if block.switch] for blocks in self.blocks]
+        self.light_block_indices = [[self.track_data.block_indices[block.id] for block in blocks if block.light] for blocks in self.blocks]
+        self.crossing_block_indices = [[self.track_data.block_indices[block.id] for block in blocks if block.crossing] for blocks in self.blocks]
+        # all three together, what the track model and the ctc need to put a plc's outputs on the right blocks
+        self.device_block_indices = [[np.array(indices, dtype=np.intp) for indices in devices] for devices in
+                                     zip(self.switch_block_indices, self.light_block_indices, self.crossing_block_indices)]
 
         # Will get the number corresponding to each wayside controller below (CONSTANTS)
         self.BLOCK_COUNTS = [] 
@@ -86,6 +96,14 @@ class WaysideControllerCollection(QObject):
         self.connect_signals()
 
 
+    def start_scans(self):
+        """
+        Starts every controller's PLC scan before any of them are updated, so sandboxed programs scan in parallel
+        """
+        for controller in self.controllers:
+            if controller.program != None:
+                controller.start_scan()
+
     def get_sort_territory(self, territory):
         if isinstance(territory, int):
             return (territory, 1)  # normal territory, secondary sort to put them before overlap
@@ -139,7 +157,7 @@ class WaysideControllerCollection(QObject):
         Called when the ctc dispatches a train. Verifies that it is safe to dispatch the train
         """
         if self.track_model != None:
-            if self.track_model.dynamic_track.occupancies[self.track_model.track_data.SPAWN_BLOCK.id] == Occupancy.UNOCCUPIED:
+            if self.track_model.dynamic_track.get_occupancy(self.track_model.track_data.SPAWN_BLOCK.id) == Occupancy.UNOCCUPIED:
                 self.track_model.initialize_train()
 
         
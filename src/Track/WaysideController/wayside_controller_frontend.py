@@ -60,7 +60,7 @@ class WaysideControllerFrontend(QMainWindow):
 
         if(auto_import_programs): # auto import the programs if necessary
             for i in range(self.collection.CONTROLLER_COUNT):
-                filepath = "src\Track\WaysideController\PLC\\" + self.collection.LINE_NAME.lower() + "_line_plc_" + str(i+1) + ".py"
+                filepath = os.path.join("src", "Track", "WaysideController", "PLC", self.collection.LINE_NAME.lower() + "_line_plc_" + str(i+1) + ".py")
                 self.auto_get_program(i,filepath)
 
         self.timer.start()
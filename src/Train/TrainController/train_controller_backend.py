@@ -3,13 +3,13 @@ Author: Aragya Goyal and Connor Marsh
 Date: 2025-04-24
 Description: This file implements the backend of the Train Controller. The Train Controller backend interacts with the backend of the Train Model to get its inputs and send outputs to.
 """
-from PyQt5.QtWidgets import QMainWindow
-from PyQt5.QtCore import QTimer
 import globals.global_clock as global_clock
 import globals.track_data_class as global_track_data
+from Train.TrainController.train_controller_fleet import TrainControllerFleet
+from Train.TrainModel.train_fleet import fleet_value
 import math
 
-class TrainController(QMainWindow):
+class TrainController:
     MPS_TO_MPH  = 2.23694
     M_TO_YARDS = 1.09361
     MI_TO_YARDS = 1760
@@ -18,23 +18,60 @@ class TrainController(QMainWindow):
     GRAVITY = 9.81 # (m/s²)
     DWELL_TIME_MS = 30000
 
-    def __init__(self, train_integrated=False, line_name="Green"):
+    # Values used by the power and safety calculations live in the fleet's arrays so they can be batched
+    hardware = fleet_value("hardware", bool)
+    manual_mode = fleet_value("manual_mode", bool)
+    actual_speed = fleet_value("actual_speed", float)
+    speed_limit = fleet_value("speed_limit", float)
+    wayside_speed = fleet_value("wayside_speed", float)
+    driver_target_speed = fleet_value("driver_target_speed", float)
+    target_speed = fleet_value("target_speed", float)
+    error = fleet_value("error", float)
+    integral_error = fleet_value("integral_error", float)
+    Kp = fleet_value("kp", float)
+    Ki = fleet_value("ki", float)
+    unramped_commanded_power = fleet_value("unramped_commanded_power", float)
+    commanded_power = fleet_value("commanded_power", float)
+    wayside_authority = fleet_value("wayside_authority", float)
+    position = fleet_value("position", float)
+    previous_position = fleet_value("previous_position", float)
+    service_brake = fleet_value("service_brake", bool)
+    emergency_brake = fleet_value("emergency_brake", bool)
+    ebrake_from_auth = fleet_value("ebrake_from_auth", bool)
+    stopping = fleet_value("stopping", bool)
+    stop_asap = fleet_value("stop_asap", bool)
+    signal_failure = fleet_value("signal_failure", bool)
+    brake_failure = fleet_value("brake_failure", bool)
+    engine_failure = fleet_value("engine_failure", bool)
+
+    # A plain object instead of a Qt window, only the frontend touches Qt so controllers are cheap to spawn and can be built anywhere
+    __slots__ = ("fleet", "slot", "line_name", "track_data", "previous_authority", "beacon_data", "actual_temperature",
+                 "desired_temperature", "air_conditioning_signal", "heating_signal", "headlights", "interior_lights",
+                 "right_doors", "left_doors", "block_distance_traveled", "next_station", "beacon_data_recieved",
+                 "started_timer1", "started_timer2", "block", "current_index", "travel_direction", "waiting_for_beacon",
+                 "dwell", "just_stopped_at_station", "global_clock", "__weakref__")
+
+    def __init__(self, train_integrated=False, line_name="Green", fleet=None):
         """
         Initializes a Train Controller Backend instance per Train and initializes all the variables necessary.
 
         Args:
             train_integrated (bool) : Whether the train has been integrated with rest of system
             line_name (string) : What line does this train belong to
+            fleet (TrainControllerFleet) : Where this controller's state is stored, a private one is made when None
 
         Returns:
             None
         """
         
-        super().__init__()
+        self.fleet = fleet if fleet is not None else TrainControllerFleet(capacity=1)
+        self.slot = self.fleet.add()
 
         # Set up static memory
         self.line_name = line_name
         self.track_data = global_track_data.lines[self.line_name]
+        if self.fleet.braking_curves is None:
+            self.fleet.braking_curves = self.track_data.braking_curves
 
         # Set up defaults
         self.actual_speed = 0.0
@@ -73,13 +110,9 @@ class TrainController(QMainWindow):
         
         # Spawn defaults
         self.current_block = self.track_data.SPAWN_BLOCK
-        self.current_section = self.current_block.id[0]
-        self.previous_switch_entrance = False
-        self.previous_switch_exit = True
-        if self.line_name == "Red":
-            self.travel_direction = self.track_data.sections[self.current_section].decreasing
-        else:
-            self.travel_direction = self.track_data.sections[self.current_section].increasing
+        self.current_index = self.track_data.block_indices[self.current_block.id]
+        self.travel_direction = self.track_data.SPAWN_DIRECTION
+        self.waiting_for_beacon = False # True between leaving a switch and working out which way it sent us
 
         # Default for power calculation
         self.integral_error = 0.0
@@ -92,19 +125,14 @@ class TrainController(QMainWindow):
         self.just_stopped_at_station = False
 
         self.global_clock = global_clock.clock
-
-        if not train_integrated:
-            # Set up timer for callback/update function
-            self.timer = QTimer(self)
-            self.timer.timeout.connect(self.update)
-            self.timer.start(self.global_clock.train_dt)
+        # Controllers without a train model are updated by TrainCollection's tick
     
-    def update(self):
+    def update(self, dt=None):
         """
         General update function called by update function of Train Model.
 
         Args:
-            None
+            dt (float) : Simulated seconds since the last update, the global clock's last tick when None
 
         Returns:
             None
@@ -117,7 +145,8 @@ class TrainController(QMainWindow):
         self.target_speed = min(self.target_speed, self.speed_limit*0.9)
 
         self.error = self.target_speed - self.actual_speed
-        dt = self.global_clock.train_dt/1000 * self.global_clock.time_multiplier
+        if dt is None:
+            dt = self.global_clock.dt
         self.integral_error += self.error * dt
         commanded_power_1 = (self.Kp * self.error) + (self.Ki * self.integral_error)
         commanded_power_2 = (self.Kp * self.error) + (self.Ki * self.integral_error)
@@ -129,7 +158,19 @@ class TrainController(QMainWindow):
 
         self.update_track_location()
         self.update_auxiliary()
-        self.update_safety()
+        self.update_safety(dt)
+
+    @property
+    def current_block(self):
+        return self.block
+
+    @current_block.setter
+    def current_block(self, block):
+        # the batched safety check reads the block's values from the fleet
+        self.block = block
+        self.fleet.block_speed_limit[self.slot] = block.speed_limit
+        self.fleet.block_grade[self.slot] = block.grade
+        self.fleet.block_index[self.slot] = self.track_data.block_indices[block.id]
 
     def update_track_location(self):
         """
@@ -146,28 +187,32 @@ class TrainController(QMainWindow):
         if distance_within_block > self.current_block.length:
             self.just_stopped_at_station = False
             self.block_distance_traveled += self.current_block.length
-            if self.current_block.switch and not self.previous_switch_exit:
-                self.previous_switch_exit = True
-                self.previous_switch_entrance = True
-                QTimer.singleShot(int(500/self.global_clock.time_multiplier), self.process_beacon_data)
-            elif self.current_block.switch_exit and not self.previous_switch_entrance:
-                self.previous_switch_exit = True
-                self.previous_switch_entrance = False
-                switch = self.track_data.switches[self.track_data.switch_exits[self.current_block.id].switch_entrance]
-                self.current_block = self.track_data.blocks[int(switch.positions[0].split("-")[0])-1]
-            elif not (self.previous_switch_entrance and self.previous_switch_exit):
-                self.current_block = self.track_data.blocks[int(self.current_block.id[1:])+(self.travel_direction*2-1)-1]
-                self.previous_switch_exit = False
-                self.previous_switch_entrance = False
-
-        # Move to new section
-        if self.current_block.id[0] != self.current_section:
-            increasing = self.track_data.sections[self.current_block.id[0]].increasing
-            if increasing == 2:
-                self.travel_direction = 1 if self.current_block.id[0] > self.current_section else 0
+            if self.waiting_for_beacon:
+                return
+            switch_index = self.track_data.end_switches[self.current_index, self.travel_direction]
+            switch_state = self.track_data.end_switch_states[self.current_index, self.travel_direction]
+            if switch_index >= 0 and switch_state < 0:
+                # The switch could go either way, so wait for the beacon to tell us which
+                self.waiting_for_beacon = True
+                self.global_clock.single_shot(500, self.process_beacon_data)
             else:
-                self.travel_direction = increasing
-            self.current_section = self.current_block.id[0]
+                self.move_to_next_block(max(switch_state, 0))
+
+    def move_to_next_block(self, switch_state):
+        """
+        Moves to the block the topology tables say comes next.
+
+        Args:
+            switch_state (int) : The state of the switch at the end of the current block, 0 if there is none
+
+        Returns:
+            None
+        """
+        next_index, next_direction = self.track_data.next_block(self.current_index, self.travel_direction, switch_state)
+        if next_index >= 0:
+            self.current_index = next_index
+            self.current_block = self.track_data.blocks[next_index]
+            self.travel_direction = next_direction
 
     def update_auxiliary(self):
         """
@@ -232,7 +277,7 @@ class TrainController(QMainWindow):
             # Mark that we are in the stopping/dwell process
             self.stopping = True
             # Call start_dwell after a short delay (to let the stopping process complete)
-            QTimer.singleShot(int(500 / self.global_clock.time_multiplier), self.start_dwell)
+            self.global_clock.single_shot(500, self.start_dwell)
             
         # if we are not at a station, reset the next station announcement
         if not station: 
@@ -244,12 +289,12 @@ class TrainController(QMainWindow):
         if self.dwell or self.stopping:
             self.service_brake = True
 
-    def update_safety(self):
+    def update_safety(self, dt=None):
         """
         Checks Safety of trains after all calculations.
 
         Args:
-            None
+            dt (float) : Simulated seconds since the last update, the global clock's last tick when None
 
         Returns:
             None
@@ -260,7 +305,8 @@ class TrainController(QMainWindow):
         if self.unramped_commanded_power > self.commanded_power:
             ramp_rate = 10000.0
             power_diff = self.unramped_commanded_power - self.commanded_power
-            dt = self.global_clock.train_dt/1000 * self.global_clock.time_multiplier
+            if dt is None:
+                dt = self.global_clock.dt
             max_delta = ramp_rate * dt
             if abs(power_diff) < max_delta:
                 self.commanded_power = self.unramped_commanded_power
@@ -288,9 +334,7 @@ class TrainController(QMainWindow):
         self.wayside_authority -= self.position - self.previous_position
         self.previous_position = self.position
 
-        theta = math.atan(self.current_block.grade / 100)
-        service_dist = ((self.actual_speed/self.MPS_TO_MPH) ** 2) / (2 * (self.SERVICE_BRAKE_DECEL + (self.GRAVITY * math.sin(theta * (math.pi/180)))))
-        service_dist *= self.M_TO_YARDS
+        service_dist = float(self.track_data.braking_curves.service_distance(self.actual_speed, self.track_data.block_indices[self.current_block.id]))
 
         if self.wayside_authority < 5:
             self.service_brake = True
@@ -324,7 +368,7 @@ class TrainController(QMainWindow):
         """
         self.dwell = True
         # Set a timer to end dwell after 30 seconds.
-        QTimer.singleShot(int(self.DWELL_TIME_MS / self.global_clock.time_multiplier), self.end_dwell)
+        self.global_clock.single_shot(self.DWELL_TIME_MS, self.end_dwell)
 
     def end_dwell(self):
         """
@@ -354,26 +398,15 @@ class TrainController(QMainWindow):
         Returns:
             None
         """
-        self.previous_switch_entrance = True
-        self.previous_switch_exit = False
-        switch = self.track_data.switches[self.current_block.id]
-        switch_block_0 = switch.positions[0].split("-")[1]
-        switch_block_1 = switch.positions[1].split("-")[1]
-        if switch_block_0=="Yard":
-            self.current_block = self.track_data.blocks[int(switch_block_1)-1]
-        elif switch_block_1=="Yard":
-            self.current_block = self.track_data.blocks[int(switch_block_0)-1]
-        elif self.beacon_data_recieved:
-            if self.track_data.blocks[int(switch_block_0)-1].beacon:
-                self.current_block = self.track_data.blocks[int(switch_block_0)-1]
-            else:
-                self.current_block = self.track_data.blocks[int(switch_block_1)-1]
+        self.waiting_for_beacon = False
+        branch_0 = self.track_data.next_block(self.current_index, self.travel_direction, 0)[0]
+        branch_1 = self.track_data.next_block(self.current_index, self.travel_direction, 1)[0]
+        if self.beacon_data_recieved:
+            switch_state = 0 if self.track_data.blocks[branch_0].beacon else 1
             self.beacon_data_recieved = False
         else:
-            if not self.track_data.blocks[int(switch_block_0)].beacon:
-                self.current_block = self.track_data.blocks[int(switch_block_0)-1]
-            else:
-                self.current_block = self.track_data.blocks[int(switch_block_1)-1]
+            switch_state = 0 if not self.track_data.blocks[branch_0 + 1].beacon else 1
+        self.move_to_next_block(switch_state)
 
     def set_input_data(self, testbench_data=None, train_model_data=None):
         """
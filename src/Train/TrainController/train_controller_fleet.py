@@ -0,0 +1,133 @@
+"""
+Date: 10-18-2026
+Description: Struct of arrays holding the control state of every software Train Controller on a line. The PI power law, power ramp,
+authority decrement, service brake distance and emergency brake logic are evaluated for the whole fleet at once.
+Hardware controllers keep a slot so their values can be read the same way, but they are updated one at a time.
+"""
+import numpy as np
+from Train.TrainModel.train_fleet import Fleet
+
+
+class TrainControllerFleet(Fleet):
+    MPS_TO_MPH  = 2.23694
+    M_TO_YARDS = 1.09361
+    SERVICE_BRAKE_DECEL = 1.2 # (m/s²)
+    GRAVITY = 9.81 # (m/s²)
+    POWER_RAMP_RATE = 10000.0 # (W/s) how fast the power can increase for passenger comfort
+    MAX_POWER = 120000.0 # (W)
+
+    ARRAYS = {
+        "hardware": bool, # hardware controllers are skipped by the batched update
+        "manual_mode": bool,
+        "actual_speed": float, # mph
+        "speed_limit": float, # mph
+        "block_speed_limit": float, # speed limit of the current block (mph)
+        "block_grade": float, # grade of the current block (percent)
+        "block_index": int, # index of the current block, used to look up the braking curves
+        "wayside_speed": float, # mph
+        "driver_target_speed": float, # mph
+        "target_speed": float, # mph
+        "error": float,
+        "integral_error": float,
+        "kp": float,
+        "ki": float,
+        "unramped_commanded_power": float, # (W)
+        "commanded_power": float, # (W)
+        "wayside_authority": float, # yards
+        "position": float, # yards
+        "previous_position": float, # yards
+        "service_brake": bool,
+        "emergency_brake": bool,
+        "ebrake_from_auth": bool,
+        "stopping": bool,
+        "stop_asap": bool,
+        "signal_failure": bool,
+        "brake_failure": bool,
+        "engine_failure": bool,
+    }
+    DEFAULTS = {"kp": 20000.0, "ki": 75.0}
+
+    def __init__(self, capacity=8):
+        """
+        :param capacity: The number of train slots to allocate up front, the arrays grow when this is exceeded
+        """
+        super().__init__(capacity)
+        self.braking_curves = None # the line's BrakingCurves, set by the first controller added
+
+    def update(self, dt, slots=None):
+        """
+        Runs the power calculation and the safety checks for many controllers at once.
+        Equivalent to the power calculation at the top of TrainController.update followed by TrainController.update_safety,
+        so update_track_location and update_auxiliary must already have been called on each controller.
+
+        :param dt: Simulated seconds since the last update
+
+        :param slots: The slots to update, every active software controller when None
+        """
+        if slots is None:
+            slots = np.flatnonzero(self.active & ~self.hardware)
+        if len(slots) == 0:
+            return
+
+        manual_mode = self.manual_mode[slots]
+        stopping = self.stopping[slots]
+        actual_speed = self.actual_speed[slots]
+
+        # PI power law
+        target_speed = np.where(manual_mode, self.driver_target_speed[slots], self.wayside_speed[slots])
+        target_speed = np.minimum(target_speed, self.speed_limit[slots]*0.9)
+        error = target_speed - actual_speed
+        integral_error = self.integral_error[slots] + error * dt
+        unramped_commanded_power = self.kp[slots] * error + self.ki[slots] * integral_error
+
+        # Ramp up power for passenger comfort
+        commanded_power = self.commanded_power[slots]
+        max_delta = self.POWER_RAMP_RATE * dt
+        power_diff = unramped_commanded_power - commanded_power
+        ramped = np.where(np.abs(power_diff) < max_delta, unramped_commanded_power, commanded_power + max_delta)
+        commanded_power = np.where(unramped_commanded_power > commanded_power, ramped, unramped_commanded_power)
+
+        # Check for failures
+        emergency_brake = self.emergency_brake[slots] | self.signal_failure[slots] | self.brake_failure[slots] | self.engine_failure[slots] | self.stop_asap[slots]
+
+        # Check for invalid power commands
+        new_service_state = commanded_power <= 0
+        commanded_power = np.clip(commanded_power, 0.0, self.MAX_POWER)
+        service_brake = np.where(~manual_mode & ~stopping, new_service_state, self.service_brake[slots])
+
+        # Authority decrement and stopping distance
+        position = self.position[slots]
+        wayside_authority = self.wayside_authority[slots] - (position - self.previous_position[slots])
+        if self.braking_curves is not None:
+            service_dist = self.braking_curves.service_distance(actual_speed, self.block_index[slots])
+        else:
+            theta = np.arctan(self.block_grade[slots] / 100)
+            service_dist = ((actual_speed/self.MPS_TO_MPH) ** 2) / (2 * (self.SERVICE_BRAKE_DECEL + (self.GRAVITY * np.sin(theta * (np.pi/180)))))
+            service_dist *= self.M_TO_YARDS
+
+        too_close = wayside_authority < 5
+        overrun = ~too_close & (wayside_authority < service_dist) & (wayside_authority > 10)
+        approaching = ~too_close & ~overrun & (wayside_authority < (3*service_dist))
+        clear = ~too_close & ~overrun & ~approaching
+        ebrake_from_auth = self.ebrake_from_auth[slots]
+
+        service_brake |= too_close | approaching
+        emergency_brake = (emergency_brake | overrun) & ~(clear & ebrake_from_auth)
+        ebrake_from_auth = (ebrake_from_auth | overrun) & ~clear
+
+        # Kill engine if a brake is activated
+        braking = emergency_brake | service_brake
+        commanded_power[braking] = 0.0
+        integral_error[braking] = 0
+
+        self.target_speed[slots] = target_speed
+        self.error[slots] = error
+        self.integral_error[slots] = integral_error
+        self.unramped_commanded_power[slots] = unramped_commanded_power
+        self.commanded_power[slots] = commanded_power
+        self.speed_limit[slots] = self.block_speed_limit[slots]
+        self.emergency_brake[slots] = emergency_brake
+        self.ebrake_from_auth[slots] = ebrake_from_auth
+        self.service_brake[slots] = service_brake
+        self.wayside_authority[slots] = wayside_authority
+        self.previous_position[slots] = position
@@ -115,8 +115,6 @@ class TrainControllerFrontend(QMainWindow):
             state['Kp'] = self.ui.kp_line_edit.text()
             state['Ki'] = self.ui.ki_line_edit.text()
             state['driver_target_speed'] = self.ui.target_speed_spin_box.value()
-            self.current_train.door_left = state['door_left']
-            self.current_train.door_right = state['door_right']
 
     def load_ui_state(self, train):
         """
@@ -140,8 +138,6 @@ class TrainControllerFrontend(QMainWindow):
         self.ui.kp_line_edit.setEnabled(state['control_constants'])
         self.ui.ki_line_edit.setEnabled(state['control_constants'])
         self.ui.target_speed_spin_box.setValue(state['driver_target_speed'])
-        train.door_left = state['door_left']
-        train.door_right = state['door_right']
 
     def on_train_selection_changed(self, index):
         """
@@ -62,16 +62,21 @@ for word in readDataFormat:
     readData[word]=0.0
 
 class TrainControllerHW(TrainController):
-    def __init__(self, train_integrated=True, line_name="Green"):
-        super().__init__(train_integrated=train_integrated, line_name=line_name)
+    __slots__ = ()
 
-    def update(self):
-        self.update_hardware()
+    def __init__(self, train_integrated=True, line_name="Green", fleet=None):
+        super().__init__(train_integrated=train_integrated, line_name=line_name, fleet=fleet)
+        self.hardware = True # the raspi does the power calculation, so this controller is never batched
+
+    def update(self, dt=None):
+        if dt is None:
+            dt = self.global_clock.dt
+        self.update_hardware(dt)
         self.update_track_location()
         self.update_auxiliary()
-        self.update_safety()
+        self.update_safety(dt)
 
-    def update_hardware(self):
+    def update_hardware(self, dt):
         # Send data to and retrive data from raspi
         # Raspi does the power calculation, and has a hardware UI, and thats it
         # sendDataFormat = ["actual_speed", "wayside_speed", "wayside_authority", "emergency_brake",
@@ -98,7 +103,8 @@ class TrainControllerHW(TrainController):
         sendData["announcements"] = self.next_station
         sendData["time_string"] = self.global_clock.full_text
         sendData["time_multiplier"] = self.global_clock.time_multiplier
-        sendData["dt"] = self.global_clock.train_dt
+        # the raspi works out the simulated dt as dt/1000 * time_multiplier, so send the wall milliseconds this step stands for
+        sendData["dt"] = dt * 1000 / self.global_clock.time_multiplier if self.global_clock.time_multiplier else 0
         sendData["kp"] = self.Kp
         sendData["ki"] = self.Ki
         sendData["commanded_power"] = self.commanded_power
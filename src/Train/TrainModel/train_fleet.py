@@ -0,0 +1,215 @@
+"""
+Date: 10-18-2026
+Description:
+    Struct of arrays holding the physical state of every train on a line. The force and trapezoidal integration for the whole
+    fleet is done in one vectorized step, the per train TrainModel objects are thin views into these arrays.
+"""
+import numpy as np
+
+
+def fleet_value(name, cast):
+    """
+    Makes a property that reads and writes one slot of an array in a fleet, used by the per train view objects.
+    The owning class needs a fleet attribute and a slot attribute.
+
+    :param name: The name of the array in the fleet
+
+    :param cast: Converts the numpy scalar back to a plain python value
+    """
+    def getter(self):
+        return cast(getattr(self.fleet, name)[self.slot])
+    def setter(self, value):
+        getattr(self.fleet, name)[self.slot] = value
+    return property(getter, setter)
+
+
+class Fleet:
+    """
+    Base for the struct of arrays containers. Every train owns one slot (index) into each of the arrays.
+    Subclasses list their arrays in ARRAYS and any non zero starting values in DEFAULTS.
+    """
+    ARRAYS = {} # name of the array: numpy dtype
+    DEFAULTS = {} # name of the array: value a newly added slot starts with
+
+    def __init__(self, capacity=8):
+        """
+        :param capacity: The number of train slots to allocate up front, the arrays grow when this is exceeded
+        """
+        self.capacity = 0
+        self.active = np.zeros(0, dtype=bool) # slots that currently belong to a train
+        for name, dtype in self.ARRAYS.items():
+            setattr(self, name, np.zeros(0, dtype=dtype))
+        self.grow(max(capacity, 1))
+
+    def grow(self, capacity):
+        """
+        Reallocates every array to hold more trains, existing slots keep their index
+
+        :param capacity: The new number of slots
+        """
+        for name in ("active", *self.ARRAYS):
+            old = getattr(self, name)
+            new = np.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def add(self):
+        """
+        Claims a free slot and resets it to its starting values
+
+        :return: The index of the slot
+        """
+        free = np.flatnonzero(~self.active)
+        if len(free) == 0:
+            slot = self.capacity
+            self.grow(self.capacity * 2)
+        else:
+            slot = int(free[0])
+        for name in self.ARRAYS:
+            getattr(self, name)[slot] = self.DEFAULTS.get(name, 0)
+        self.active[slot] = True
+        return slot
+
+    def remove(self, slot):
+        """
+        Frees a slot so that it is no longer stepped and can be reused
+
+        :param slot: The index of the slot
+        """
+        self.active[slot] = False
+
+
+class TrainFleet(Fleet):
+    # Conversion factors and physics constants.
+    MPS_TO_MPH        = 2.23694
+    MAX_ACCEL         = 100000    # (m/s²)
+    GRAVITY           = 9.81      # (m/s²)
+    EMERGENCY_DECEL   = -2.73     # (m/s²)
+    SERVICE_DECEL     = -1.2      # (m/s²)
+    SERVICE_RAMP_RATE = 10.0      # (m/s³) how fast the acceleration can move towards the service brake target
+    RAMP_RATE         = 1.0       # (m/s³) how fast the acceleration can move towards the target with no brakes
+    MAX_SPEED         = 43.49 / MPS_TO_MPH # (m/s)
+    DRAG_COEFFICIENT  = 1.2       # Example value; tune based on actual train data.
+    FRONTAL_AREA      = 9.06      # Frontal Area calculated from train dimensions --> (Width * Height) in m².
+    AIR_DENSITY       = 1.225     # kg/m³ at sea level.
+    EMPTY_MASS_KG     = 37103.86
+    DEGREES_PER_SECOND = 0.01     # how fast the heating and air conditioning change the cabin temperature
+
+    ARRAYS = {
+        "position": float, # (m)
+        "actual_speed": float, # (m/s)
+        "current_acceleration": float, # (m/s²)
+        "previous_acceleration": float, # (m/s²)
+        "mass_kg": float,
+        "grade": float, # percent
+        "commanded_power": float, # (W)
+        "service_brake": bool,
+        "emergency_brake": bool,
+        "heating": bool,
+        "air_conditioning": bool,
+        "actual_temperature": float, # Celsius
+    }
+    DEFAULTS = {"mass_kg": EMPTY_MASS_KG, "actual_temperature": 25}
+    INTEGRATORS = ("trapezoidal", "euler", "rk4")
+
+    def __init__(self, capacity=8, integrator="trapezoidal"):
+        """
+        :param capacity: The number of train slots to allocate up front, the arrays grow when this is exceeded
+
+        :param integrator: How step integrates the velocity and position, one of INTEGRATORS
+        """
+        if integrator not in self.INTEGRATORS:
+            raise ValueError(f"Unknown integrator {integrator}, expected one of {self.INTEGRATORS}")
+        self.integrator = integrator
+        super().__init__(capacity)
+
+    def step(self, dt, slots=None):
+        """
+        Integrates the dynamics of many trains at once. The acceleration is ramped once per step, then the velocity and
+        position are integrated with the trapezoidal rule, semi-implicit Euler or RK4 depending on self.integrator.
+        Long steps should be split up by the caller, see TrainCollection.update.
+
+        :param dt: Simulated seconds to integrate over
+
+        :param slots: The slots to step, every active slot when None
+        """
+        if slots is None:
+            slots = np.flatnonzero(self.active)
+        else:
+            slots = np.atleast_1d(slots)
+        if len(slots) == 0:
+            return
+
+        speed = self.actual_speed[slots]
+        final_acceleration = self.acceleration(slots, speed, dt)
+
+        if self.integrator == "euler":
+            # Semi-implicit, the position uses the updated velocity
+            new_velocity = np.maximum(speed + dt * final_acceleration, 0.0)
+            self.position[slots] += dt * new_velocity
+        elif self.integrator == "rk4":
+            # The acceleration depends on the velocity through the motor force and the drag
+            v2 = np.maximum(speed + (dt / 2.0) * final_acceleration, 0.0)
+            a2 = self.acceleration(slots, v2, dt)
+            v3 = np.maximum(speed + (dt / 2.0) * a2, 0.0)
+            a3 = self.acceleration(slots, v3, dt)
+            v4 = np.maximum(speed + dt * a3, 0.0)
+            a4 = self.acceleration(slots, v4, dt)
+            new_velocity = np.maximum(speed + (dt / 6.0) * (final_acceleration + 2*a2 + 2*a3 + a4), 0.0)
+            self.position[slots] += (dt / 6.0) * (speed + 2*v2 + 2*v3 + v4)
+        else:
+            # Trapezoidal rule for the velocity and then the position
+            new_velocity = speed + (dt / 2.0) * (final_acceleration + self.previous_acceleration[slots])
+            new_velocity = np.maximum(new_velocity, 0.0)
+            self.position[slots] += (dt / 2.0) * (speed + new_velocity)
+        new_velocity = np.minimum(new_velocity, self.MAX_SPEED)
+
+        self.previous_acceleration[slots] = final_acceleration
+        self.current_acceleration[slots] = final_acceleration
+        self.actual_speed[slots] = new_velocity
+
+        heating = self.heating[slots]
+        air_conditioning = self.air_conditioning[slots]
+        dtemp = np.where(heating & ~air_conditioning, self.DEGREES_PER_SECOND * dt,
+                         np.where(air_conditioning & ~heating, -self.DEGREES_PER_SECOND * dt,
+                                  np.where(air_conditioning & heating, 0.0, 0.0001)))
+        self.actual_temperature[slots] += dtemp
+
+    def acceleration(self, slots, speed, dt):
+        """
+        Works out the acceleration of some trains from the forces on them, ramped from their current acceleration
+
+        :param slots: The slots of the trains
+
+        :param speed: The velocity of each of those trains to evaluate the forces at (m/s)
+
+        :param dt: Simulated seconds the ramp has to move the acceleration over
+
+        :return: The acceleration of each train (m/s²)
+        """
+        mass = self.mass_kg[slots]
+        acceleration = self.current_acceleration[slots]
+        emergency = self.emergency_brake[slots]
+        service = self.service_brake[slots] & ~emergency
+
+        v_eff = np.where(speed > 0.001, speed, 0.001)
+        dyn_force = self.commanded_power[slots] / v_eff
+
+        theta = np.arctan(self.grade[slots] / 100.0)
+        grav_force = mass * self.GRAVITY * np.sin(theta * 3.14159/180)
+
+        # drag_force = 0.5 * rho * A * C_d * v^2
+        velocity_magnitude = np.sqrt(speed**2 + speed**2)
+        drag_force = 0.5 * self.AIR_DENSITY * self.FRONTAL_AREA * self.DRAG_COEFFICIENT * velocity_magnitude**2
+        net_force = dyn_force - grav_force - drag_force
+        safe_mass = np.where(mass != 0, mass, 1.0)
+        a_base = np.where(mass != 0, net_force / safe_mass, 0.0)
+
+        # The emergency brake is applied at once, the other two cases ramp towards their target
+        target_a = np.where(emergency, self.EMERGENCY_DECEL - a_base,
+                            np.where(service, self.SERVICE_DECEL - a_base, a_base))
+        max_delta = np.where(service, self.SERVICE_RAMP_RATE, self.RAMP_RATE) * dt
+        accel_diff = target_a - acceleration
+        ramped = np.where(np.abs(accel_diff) < max_delta, target_a, acceleration + np.copysign(max_delta, accel_diff))
+        return np.clip(np.where(emergency, target_a, ramped), -self.MAX_ACCEL, self.MAX_ACCEL)
@@ -6,42 +6,58 @@ Description:
 """
 
 # backend.py
-import math
 import os
 import sys
 import time
-from PyQt5.QtWidgets import QMainWindow, QWidget
-from PyQt5.QtCore import QTimer, QTime, QDateTime
 
 from Train.TrainController.train_controller_backend import TrainController
 from Train.TrainController.train_controller_hw_backend import TrainControllerHW
+from Train.TrainModel.train_fleet import TrainFleet, fleet_value
 import globals.global_clock as global_clock
 
-class TrainModel(QMainWindow):
+class TrainModel:
     # Conversion factors and constants.
     MPS_TO_MPH  = 2.23694
     KG_TO_LBS   = 2.20462
     M_TO_FT     = 3.281
     M_TO_YARD = 1.09361
 
-    MAX_ACCEL         = 100000    # (m/s²)
-    GRAVITY           = 9.81      # (m/s²)
-    EMERGENCY_DECEL   = -2.73     # (m/s²)
-    SERVICE_DECEL     = -1.2      # (m/s²)
     MIN_SPEED_NO_BRAKE= 0.1       # (m/s)
-    
-    # Coefficients for drag force calculation.
-    DRAG_COEFFICIENT = 1.2    # Example value; tune based on actual train data.
-    FRONTAL_AREA = 9.06       # Frontal Area calculated from train dimensions --> (Width * Height) in m².
-    AIR_DENSITY = 1.225       # kg/m³ at sea level.
-
-    def __init__(self, train_integrated=True, hardware_controller=False, line_name="Green"):
-        super().__init__()
+    # The rest of the physics constants live in TrainFleet, which does the integration
+
+    # The physical state lives in the fleet's arrays so the whole fleet can be integrated at once
+    position = fleet_value("position", float)
+    actual_speed = fleet_value("actual_speed", float)
+    current_acceleration = fleet_value("current_acceleration", float)
+    previous_acceleration = fleet_value("previous_acceleration", float)
+    mass_kg = fleet_value("mass_kg", float)
+    grade = fleet_value("grade", float)
+    commanded_power = fleet_value("commanded_power", float)
+    service_brake = fleet_value("service_brake", bool)
+    emergency_brake = fleet_value("emergency_brake", bool)
+    heating = fleet_value("heating", bool)
+    air_conditioning = fleet_value("air_conditioning", bool)
+    actual_temperature = fleet_value("actual_temperature", float)
+
+    # A plain object instead of a Qt window, only the frontend touches Qt so trains are cheap to spawn and can be built anywhere
+    __slots__ = ("fleet", "slot", "controller", "send_emergency_brake_signal", "cabin_lights", "headlights", "left_doors",
+                 "right_doors", "announcement", "wayside_speed", "wayside_authority", "unclamped_authority", "beacon_data",
+                 "crew_count", "length_m", "height_m", "width_m", "passenger_count", "brake_failure", "signal_failure",
+                 "engine_failure", "global_clock", "backend", "__weakref__")
+
+    def __init__(self, train_integrated=True, hardware_controller=False, line_name="Green", fleet=None, controller_fleet=None):
+        """
+        :param fleet: The TrainFleet this train's physical state is stored in, a private one is made when None
+
+        :param controller_fleet: The TrainControllerFleet the controller's state is stored in, a private one is made when None
+        """
+        self.fleet = fleet if fleet is not None else TrainFleet(capacity=1)
+        self.slot = self.fleet.add()
         if train_integrated:
             if hardware_controller:
-                self.controller = TrainControllerHW(line_name="Green")
+                self.controller = TrainControllerHW(line_name=line_name, fleet=controller_fleet)
             else:
-                self.controller = TrainController(line_name="Green")
+                self.controller = TrainController(line_name=line_name, fleet=controller_fleet)
         else:
             self.controller = None
         self.position = 0.0
@@ -81,111 +97,43 @@ class TrainModel(QMainWindow):
 
         self.global_clock = global_clock.clock
 
-        self.prev_time = None
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update)
-        self.timer.start(self.global_clock.train_dt)
-
         # Ensure a backend attribute exists.
         self.backend = self
 
-    def update(self):
-        if self.controller:
-            self.controller.set_input_data(train_model_data=self.get_output_data())
-            self.controller.update()
-            self.set_input_data(train_controller_data=self.controller.get_output_data())
-        current_time = QDateTime.currentMSecsSinceEpoch()
-        if self.prev_time is None:
-            self.prev_time = current_time
-            return
-        dt = (current_time - self.prev_time) / 1000.0 * self.global_clock.time_multiplier
-        self.prev_time = current_time
-
-        try:
-            v_eff = self.actual_speed if self.actual_speed > 0.001 else 0.001
-            dyn_force = self.commanded_power / v_eff
-        except ZeroDivisionError:
-            dyn_force = 1000.0
-
-        theta = math.atan(self.grade / 100.0)
-        grav_force = self.mass_kg * self.GRAVITY * math.sin(theta * 3.14159/180)
-        
-        """Calculate drag force using the drag equation.
-            drag_force = 0.5 * rho * A * C_d * v^2 """
-        # air_resistance_constant = 20
-        velocity_magnitude = math.sqrt(self.actual_speed**2 + self.actual_speed**2) # Calculate velocity magnitude
-        drag_force = 0.5 * self.AIR_DENSITY * self.FRONTAL_AREA * self.DRAG_COEFFICIENT * velocity_magnitude**2
-        # net_force = dyn_force - grav_force * air_resistance_constant
-        net_force = dyn_force - grav_force - drag_force
-        a_base = net_force / self.mass_kg if self.mass_kg != 0 else 0.0
-
-        if self.emergency_brake:
-            target_a = self.EMERGENCY_DECEL - a_base
-            self.current_acceleration = target_a
-        elif self.service_brake:
-            target_a = self.SERVICE_DECEL - a_base
-            ramp_rate = 10.0
-            accel_diff = target_a - self.current_acceleration
-            max_delta = ramp_rate * dt
-            if abs(accel_diff) < max_delta:
-                self.current_acceleration = target_a
-            else:
-                self.current_acceleration += math.copysign(max_delta, accel_diff)
-        else:
-            target_a = a_base
-            ramp_rate = 1.0
-            accel_diff = target_a - self.current_acceleration
-            max_delta = ramp_rate * dt
-            if abs(accel_diff) < max_delta:
-                self.current_acceleration = target_a
-            else:
-                self.current_acceleration += math.copysign(max_delta, accel_diff)
-
-        final_acceleration = self.current_acceleration
-        if final_acceleration > self.MAX_ACCEL:
-            final_acceleration = self.MAX_ACCEL
-        elif final_acceleration < -self.MAX_ACCEL:
-            final_acceleration = -self.MAX_ACCEL
-
-        old_velocity = self.actual_speed
-        # Calculate new velocity using the trapezoidal rule.
-        new_velocity = old_velocity + (dt / 2.0) * (final_acceleration + self.previous_acceleration)
-        if new_velocity < 0:
-            new_velocity = 0
-        # Calculate new position using the trapezoidal rule.
-        new_position = self.position + (dt / 2.0) * (old_velocity + new_velocity)
-        self.position = new_position
-        # Clamp the speed to a maximum of 43.49 mph (≈19.44 m/s)
-        max_speed_mps = 43.49 / self.MPS_TO_MPH
-        if new_velocity > max_speed_mps:
-            new_velocity = max_speed_mps
+    def update(self, dt=None):
+        """
+        Updates this one train on its own. Normally TrainCollection's tick steps every train in the fleet at once instead.
 
-        self.previous_acceleration = final_acceleration
-        self.actual_speed = new_velocity
-        self.current_acceleration = final_acceleration
+        :param dt: Simulated seconds to integrate over, the global clock's last tick when None
+        """
+        if dt is None:
+            dt = self.global_clock.dt
+        self.update_controller(dt)
+        self.fleet.step(dt, self.slot)
 
+        new_velocity = self.actual_speed
         brake_off = (not self.emergency_brake) and (not self.service_brake)
         if brake_off and new_velocity < self.MIN_SPEED_NO_BRAKE:
             new_velocity = self.MIN_SPEED_NO_BRAKE
-
-        degrees_per_second = 0.01
-        if self.heating and not self.air_conditioning:
-            dtemp = degrees_per_second * dt
-        elif self.air_conditioning and not self.heating:
-            dtemp = -degrees_per_second * dt
-        elif self.air_conditioning and self.heating:
-            dtemp = 0.0
-        else:
-            dtemp = 0.0001
-        self.actual_temperature += dtemp
         display_temp = (self.actual_temperature * 1.8) + 32
 
         return {
-            "acceleration": final_acceleration,
+            "acceleration": self.current_acceleration,
             "velocity": new_velocity,
             "actual_temperature": display_temp
         }
 
+    def update_controller(self, dt=None):
+        """
+        Exchanges data with the train controller and lets it update
+
+        :param dt: Simulated seconds since the last update
+        """
+        if self.controller:
+            self.controller.set_input_data(train_model_data=self.get_output_data())
+            self.controller.update(dt)
+            self.set_input_data(train_controller_data=self.controller.get_output_data())
+
     def set_input_data(self, testbench_data=None, track_data=None, train_controller_data=None):
         selected_data = None
         selected = ""
@@ -7,7 +7,6 @@ Description:
 # frontend.py
 import sys
 import os
-import random
 
 os.environ['QT_AUTO_SCREEN_SCALE_FACTOR'] = "1"
 
@@ -17,6 +16,7 @@ from PyQt5.QtGui import QPixmap
 from Train.TrainModel.train_model_ui_iteration_1 import Ui_MainWindow as TrainModelUI
 from Train.TrainModel.train_model_testbench import TrainModelTestbench
 import globals.global_clock as global_clock
+import globals.rng as rng
 
 class TrainModelFrontEnd(QMainWindow):
     def __init__(self, collection):
@@ -76,10 +76,12 @@ class TrainModelFrontEnd(QMainWindow):
 
     def rotate_advertisements(self):
         """Randomly assign different advertisement images to each ad label."""
+        # Its own stream so the user interface never changes the simulation's random numbers
+        generator = rng.streams.stream("advertisements")
         selected_ads = (
-            random.sample(self.ad_paths, len(self.ad_labels))
+            [self.ad_paths[i] for i in generator.permutation(len(self.ad_paths))[:len(self.ad_labels)]]
             if len(self.ad_paths) >= len(self.ad_labels)
-            else [random.choice(self.ad_paths) for _ in range(len(self.ad_labels))]
+            else [self.ad_paths[i] for i in generator.integers(len(self.ad_paths), size=len(self.ad_labels))]
         )
         for label, ad_path in zip(self.ad_labels, selected_ads):
             label.setPixmap(QPixmap(ad_path))
@@ -1,14 +1,19 @@
 import sys
 import os
+import time
 
 from Train.TrainModel.train_model_backend import TrainModel
+from Train.TrainModel.train_fleet import TrainFleet
+from Train.TrainController.train_controller_fleet import TrainControllerFleet
 from Train.TrainModel.train_model_testbench import TrainModelTestbench
 from Train.TrainController.train_controller_backend import TrainController
 from Train.TrainController.train_controller_hw_backend import TrainControllerHW
-from globals.settings import USING_HARDWARE
+from globals.settings import USING_HARDWARE, TRAIN_INTEGRATOR, TRAIN_SUBSTEP
+import math
+import globals.global_clock as global_clock
 
 from PyQt5.QtWidgets import QApplication#, QMainWindow, QWidget
-from PyQt5.QtCore import qInstallMessageHandler
+from PyQt5.QtCore import qInstallMessageHandler, QTimer
 
 def customMessageHandler(msg_type, context, message):
     # Filter out warnings about unknown properties.
@@ -25,6 +30,20 @@ class TrainCollection:
         self.train_list = []
         self.hardware_active = False
         self.line_name = line_name
+        self.fleet = TrainFleet(integrator=TRAIN_INTEGRATOR) # physical state of every train model in this collection
+        self.max_substep = TRAIN_SUBSTEP # longer updates are split into equal steps no longer than this
+        self.controller_fleet = TrainControllerFleet() # control state of every train controller in this collection
+
+        # One timer steps every train, instead of each train model and controller running its own
+        self.global_clock = global_clock.clock
+        self.tick_cost = 0.0 # wall clock seconds the last tick took
+        self.total_tick_cost = 0.0 # wall clock seconds spent in every tick so far
+        self.tick_count = 0
+        self.last_sim_time = self.global_clock.sim_time
+        self.timer = QTimer()
+        self.timer.timeout.connect(self.tick)
+        if not self.global_clock.kernel_driven:
+            self.timer.start(self.global_clock.train_dt)
 
         # If model or controller != None, then we are running a single module with a testbench
         if model:
@@ -32,13 +51,13 @@ class TrainCollection:
             self.train_controller_ui = None
             self.train_list = []
             for _ in range(num_trains):
-                self.train_list.append(TrainModel(train_integrated=False))
+                self.train_list.append(TrainModel(train_integrated=False, fleet=self.fleet))
         elif controller:
             self.train_controller_ui = controller
             self.train_model_ui = None
             self.train_list = []
             for _ in range(num_trains):
-                self.train_list.append(TrainController(train_integrated=False))
+                self.train_list.append(TrainController(train_integrated=False, fleet=self.controller_fleet))
             self.train_controller_ui.update_train_dropdown()
         else:
             # Lazy import to avoid circular dependency:
@@ -46,8 +65,9 @@ class TrainCollection:
             self.train_model_ui = TrainModelFrontEnd(self)  # Pass self to front-end
             from Train.TrainController.train_controller_frontend import TrainControllerFrontend
             self.train_controller_ui = TrainControllerFrontend(self)
-            self.train_model_ui.show()
-            self.train_controller_ui.show()
+            if not self.global_clock.kernel_driven: # nobody looks at the windows when running headless
+                self.train_model_ui.show()
+                self.train_controller_ui.show()
             self.train_list = []
             for _ in range(num_trains):
                 self.create_train()
@@ -55,20 +75,79 @@ class TrainCollection:
     def create_train(self):
         # Create a new TrainModel and append it to the list.
         if USING_HARDWARE and not self.hardware_active and len(self.train_list)>0:
-            self.train_list.append(TrainModel(hardware_controller=True, line_name=self.line_name))
+            self.train_list.append(TrainModel(hardware_controller=True, line_name=self.line_name, fleet=self.fleet, controller_fleet=self.controller_fleet))
             self.hardware_active = True
         else:
-            self.train_list.append(TrainModel(line_name=self.line_name))
+            self.train_list.append(TrainModel(line_name=self.line_name, fleet=self.fleet, controller_fleet=self.controller_fleet))
         self.train_model_ui.update_train_dropdown()
         self.train_controller_ui.update_train_dropdown()
     
     def remove_train(self, idx):
         removedTrain = self.train_list.pop(idx)
+        self.fleet.remove(removedTrain.slot)
+        if removedTrain.controller:
+            self.controller_fleet.remove(removedTrain.controller.slot)
         if type(removedTrain.controller) == TrainControllerHW:
             self.hardware_active = False
         self.train_model_ui.update_train_dropdown()
         self.train_controller_ui.update_train_dropdown()
 
+    def tick(self):
+        """
+        Called by the collection's timer when the simulation kernel is not driving it, steps every train by the
+        simulated time the global clock moved since the last tick
+        """
+        sim_time = self.global_clock.sim_time
+        dt = sim_time - self.last_sim_time
+        self.last_sim_time = sim_time
+        if dt > 0:
+            self.update(dt)
+
+    def update(self, dt):
+        """
+        Updates every train in the collection, in the order of train_list. An update longer than max_substep is split into
+        equal sub-steps so the controllers and the integrator stay stable at large time multipliers.
+        The wall clock cost of the whole update is kept in tick_cost.
+
+        :param dt: Simulated seconds since the last update
+        """
+        start = time.perf_counter()
+        substeps = max(1, math.ceil(dt / self.max_substep - 1e-9)) if self.max_substep else 1
+        for _ in range(substeps):
+            self.substep(dt / substeps)
+
+        self.tick_cost = time.perf_counter() - start
+        self.total_tick_cost += self.tick_cost
+        self.tick_count += 1
+
+    def substep(self, dt):
+        """
+        Updates every train by one step. The software controllers' power and safety calculations and the train physics
+        are each done in one batched call, the hardware controller still goes through its own update.
+
+        :param dt: Simulated seconds to step by
+        """
+        if self.train_controller_ui and not self.train_model_ui:
+            # Controller testbench, there are no train models so each controller runs on its own
+            for controller in self.train_list:
+                controller.update(dt)
+        else:
+            for train in self.train_list:
+                controller = train.controller
+                if controller is None:
+                    continue # train model testbench
+                controller.set_input_data(train_model_data=train.get_output_data())
+                if controller.hardware:
+                    controller.update(dt)
+                else:
+                    controller.update_track_location()
+                    controller.update_auxiliary()
+            self.controller_fleet.update(dt)
+            for train in self.train_list:
+                if train.controller:
+                    train.set_input_data(train_controller_data=train.controller.get_output_data())
+            self.fleet.step(dt)
+
     # IMPORTANT NOTE
     # WHEN REMOVING TRAIN, CHECK type(train.controller) and if its HW
     # THEN SET self.hardware_active = False
@@ -0,0 +1,84 @@
+'''
+Date: 10-18-2026
+Description:
+    Service and emergency brake stopping distances worked out ahead of time over a grid of speeds for every distinct grade on a line.
+    The train controllers' safety check, the CTC and anything else that needs a stopping distance look it up here instead of
+    redoing the trigonometry every tick.
+'''
+import numpy as np
+
+
+class BrakingCurves:
+    MPS_TO_MPH = 2.23694
+    M_TO_YARDS = 1.09361
+    SERVICE_BRAKE_DECEL = 1.2 # (m/s²)
+    EMERGENCY_BRAKE_DECEL = 2.73 # (m/s²)
+    GRAVITY = 9.81 # (m/s²)
+    SPEED_STEP = 0.5 # (mph) spacing of the speed grid
+    MAX_SPEED = 80.0 # (mph) faster than any train can go, higher speeds are clamped to this
+
+    def __init__(self, blocks):
+        """
+        Builds the tables for one line
+
+        :param blocks: The line's blocks, indexed by block index
+        """
+        self.grades = np.array(sorted({float(block.grade) for block in blocks})) # every distinct grade on the line (percent)
+        self.block_grades = np.searchsorted(self.grades, [float(block.grade) for block in blocks]) # block index -> row of the tables
+        self.speeds = np.arange(0.0, self.MAX_SPEED + self.SPEED_STEP, self.SPEED_STEP) # mph
+        self.service_table = self.stopping_distances(self.SERVICE_BRAKE_DECEL) # yards, [grade row, speed]
+        self.emergency_table = self.stopping_distances(self.EMERGENCY_BRAKE_DECEL) # yards, [grade row, speed]
+
+    def stopping_distances(self, decel):
+        """
+        Works out the stopping distance at every grid point, the same way TrainController.update_safety always has
+
+        :param decel: The brake's deceleration (m/s²)
+
+        :return: Distances in yards indexed by [grade row, speed]
+        """
+        theta = np.arctan(self.grades / 100)
+        deceleration = decel + (self.GRAVITY * np.sin(theta * (np.pi/180)))
+        speeds = self.speeds / self.MPS_TO_MPH
+        return (speeds[np.newaxis, :] ** 2) / (2 * deceleration[:, np.newaxis]) * self.M_TO_YARDS
+
+    def lookup(self, table, speed, block_index):
+        """
+        Interpolates a table between the two nearest grid speeds. The distance grows with the square of the speed, so the
+        interpolation is done against speed squared, which makes it exact between grid points.
+
+        :param table: service_table or emergency_table
+
+        :param speed: The train speed (mph), a number or an array
+
+        :param block_index: The index of the block the train is in, a number or an array the same shape as speed
+
+        :return: The stopping distance in yards, the same shape as speed
+        """
+        speed = np.clip(speed, 0.0, self.MAX_SPEED)
+        low = np.minimum((speed / self.SPEED_STEP).astype(int), len(self.speeds) - 2)
+        low_speed = self.speeds[low]
+        high_speed = self.speeds[low + 1]
+        weight = (speed**2 - low_speed**2) / (high_speed**2 - low_speed**2)
+        rows = self.block_grades[block_index]
+        return table[rows, low] * (1 - weight) + table[rows, low + 1] * weight
+
+    def service_distance(self, speed, block_index):
+        """
+        :param speed: The train speed (mph), a number or an array
+
+        :param block_index: The index of the block the train is in, a number or an array
+
+        :return: The distance in yards the service brake needs to stop the train
+        """
+        return self.lookup(self.service_table, speed, block_index)
+
+    def emergency_distance(self, speed, block_index):
+        """
+        :param speed: The train speed (mph), a number or an array
+
+        :param block_index: The index of the block the train is in, a number or an array
+
+        :return: The distance in yards the emergency brake needs to stop the train
+        """
+        return self.lookup(self.emergency_table, speed, block_index)
@@ -0,0 +1,66 @@
+'''
+Date: 10-18-2026
+Description:
+    A priority queue of callbacks keyed on simulated time. Any module can post a callback to run after some amount of
+    simulated time, the global clock fires them in order as it advances, no matter how fast the simulation is running.
+'''
+import heapq
+import itertools
+
+
+class EventQueue:
+    def __init__(self):
+        self.heap = [] # (due time in seconds, posting order, callback)
+        self.order = itertools.count() # ties are fired in the order they were posted
+        self.pending = set() # posting order of events in the heap that will still fire, so cancel doesn't search the heap
+        self.cancelled = set() # posting order of events that were cancelled but are still in the heap
+
+    def __len__(self):
+        return len(self.pending)
+
+    def post(self, due, callback):
+        """
+        Adds a callback to the queue
+
+        :param due: The simulated time in seconds that the callback should run at
+
+        :param callback: The function to call, it takes no arguments
+
+        :return: An id that can be passed to cancel
+        """
+        event_id = next(self.order)
+        heapq.heappush(self.heap, (due, event_id, callback))
+        self.pending.add(event_id)
+        return event_id
+
+    def cancel(self, event_id):
+        """
+        Stops an event that has not fired yet from firing
+
+        :param event_id: The id returned by post
+        """
+        if event_id in self.pending:
+            self.pending.discard(event_id)
+            self.cancelled.add(event_id)
+
+    def next_due(self):
+        """
+        :return: The due time of the next event to fire, None if the queue is empty
+        """
+        self.discard_cancelled()
+        return self.heap[0][0] if self.heap else None
+
+    def pop(self):
+        """
+        Removes the next event to fire from the queue
+
+        :return: (due time in seconds, callback)
+        """
+        self.discard_cancelled()
+        due, event_id, callback = heapq.heappop(self.heap)
+        self.pending.discard(event_id)
+        return due, callback
+
+    def discard_cancelled(self):
+        while self.heap and self.heap[0][1] in self.cancelled:
+            self.cancelled.discard(heapq.heappop(self.heap)[1])
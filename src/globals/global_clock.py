@@ -1,40 +1,141 @@
-from PyQt5.QtWidgets import QMainWindow
-from PyQt5.QtCore import QTimer, QTime
+import time
+import globals.settings as settings
+from globals.event_queue import EventQueue
+
+class GlobalClock:
+    # A plain object so the clock can be used without a QApplication, the Qt timer that drives it in the GUI is made by init
+    __slots__ = ("am_pm", "text", "full_text", "hour", "minute", "time_multiplier", "MAX_MULTIPLIER", "ctc_dt", "wayside_dt",
+                 "track_dt", "train_dt", "clock_dt", "kernel_driven", "events", "elapsed_seconds", "dt", "paused",
+                 "timer", "last_wall_time", "__weakref__")
+    START_TIME = 6*3600 + 59*60 # 06:59 AM in seconds since midnight
 
-class GlobalClock(QMainWindow):
     def __init__(self):
-        super().__init__()
         self.am_pm = "AM"
         self.text = "06:59"
         self.full_text = self.text + " " + self.am_pm
         self.hour = 6
         self.minute = 59
-        
+
         # update speeds for the various modules
         self.time_multiplier = 20
-        self.MAX_MULTIPLIER = 50
+        # A tick at 500x is 5 simulated seconds, the longest tick a train was checked to still make its station stops with.
+        # The trains' own updates are split into settings.TRAIN_SUBSTEP sub-steps, but the ctc and wayside only see the trains
+        # once a tick, so longer ticks let a train run past the block it was meant to stop in. Without sub-steps the old
+        # limit of 50x is kept.
+        self.MAX_MULTIPLIER = 500 if settings.TRAIN_SUBSTEP else 50
         self.ctc_dt = 10
         self.wayside_dt = 10
         self.track_dt = 10
         self.train_dt=1
-        
+        self.clock_dt = 10 # wall milliseconds between clock ticks when the clock runs on its own timer
+
+        # When the simulation kernel drives the modules, they must not start their own timers
+        self.kernel_driven = False
+        self.events = EventQueue() # callbacks posted through single_shot, fired as the simulated time reaches them
+
+        self.elapsed_seconds = 0.0 # simulated seconds since START_TIME, every module reads the time from here
+        self.dt = 0.0 # simulated seconds the last tick advanced by
+        self.paused = False
+        self.timer = None # the QTimer calling update, None when something else drives the clock
+        self.last_wall_time = time.perf_counter()
+
+    @property
+    def sim_time(self):
+        """Simulated seconds since START_TIME"""
+        return self.elapsed_seconds
 
-        self.time = QTime(6, 59, 0)
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update)
-        self.timer.start(1000)
-        
     def update(self):
-        self.time = self.time.addSecs(self.time_multiplier)
-        self.hour = self.time.hour()
-        self.minute = self.time.minute()
+        # Advance by the wall time that actually passed, timer ticks can arrive late or be skipped when the event loop is busy
+        wall_time = time.perf_counter()
+        if not self.paused:
+            self.advance((wall_time - self.last_wall_time) * self.time_multiplier)
+        self.last_wall_time = wall_time
+
+    def pause(self):
+        """
+        Stops the simulated time, the modules see a dt of 0 until resume is called
+        """
+        self.paused = True
+        self.dt = 0.0
+
+    def resume(self):
+        """
+        Starts the simulated time again after pause, the time spent paused is skipped
+        """
+        self.paused = False
+        self.last_wall_time = time.perf_counter()
+
+    def step(self, seconds=None):
+        """
+        Advances the time by one tick, meant to be used while paused
+
+        :param seconds: The simulated seconds to step by, one clock tick at the current multiplier when None
+        """
+        if seconds is None:
+            seconds = self.clock_dt / 1000 * self.time_multiplier
+        self.advance(seconds)
+
+    def warp(self, seconds):
+        """
+        Jumps the time forward at once, firing every callback that comes due on the way
+
+        :param seconds: The simulated seconds to jump by
+        """
+        self.advance(seconds)
+
+    def advance(self, seconds):
+        """
+        Moves the simulated time forward and fires any posted callbacks that are now due, in order.
+        While a callback runs the clock reads the time it was due at, so anything it posts is timed from there.
+
+        :param seconds: The amount of simulated seconds to advance by
+        """
+        self.dt = seconds
+        target = self.elapsed_seconds + seconds
+        while len(self.events) and self.events.next_due() <= target:
+            due, callback = self.events.pop()
+            self.elapsed_seconds = max(self.elapsed_seconds, due)
+            callback()
+        self.elapsed_seconds = target
+        time_of_day = (self.START_TIME + int(self.elapsed_seconds)) % 86400
+        self.hour = time_of_day // 3600
+        self.minute = time_of_day // 60 % 60
         self.am_pm = "AM" if self.hour < 12 else "PM"
         self.hour = self.hour % 12 or 12
         self.text = f"{self.hour:02d}:{self.minute:02d}"
         self.full_text = self.text + " " + self.am_pm
 
-def init():
-    global clock
-    clock = GlobalClock()
+    def single_shot(self, sim_ms, callback):
+        """
+        Calls a function once after an amount of simulated time has passed
+
+        :param sim_ms: The delay in simulated milliseconds
+
+        :param callback: The function to call
 
+        :return: An id that can be passed to cancel
+        """
+        return self.events.post(self.elapsed_seconds + sim_ms / 1000, callback)
 
+    def cancel(self, event_id):
+        """
+        Stops a callback posted with single_shot from being called
+
+        :param event_id: The id single_shot returned
+        """
+        self.events.cancel(event_id)
+
+def init(start_timer=True):
+    """
+    Makes the global clock
+
+    :param start_timer: Whether to drive the clock from a Qt timer on wall time, which needs a QApplication
+    """
+    global clock
+    clock = GlobalClock()
+    if start_timer:
+        from PyQt5.QtCore import QTimer
+        clock.timer = QTimer()
+        clock.timer.timeout.connect(clock.update)
+        clock.last_wall_time = time.perf_counter()
+        clock.timer.start(clock.clock_dt)
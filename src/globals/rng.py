@@ -0,0 +1,45 @@
+"""
+Date: 10-18-2026
+Description:
+    Seed tree for everything random in the simulation. One root seed gives an independent NumPy Generator stream for each
+    named part of the simulation, e.g. streams.stream("Green", "station", "K65"). A stream only depends on the root seed and
+    its name, so a run can be repeated bit for bit, adding a train doesn't change the numbers another station or train gets,
+    and scenario runs in separate processes with different root seeds are statistically independent.
+"""
+import zlib
+import numpy as np
+
+
+class RandomStreams:
+    def __init__(self, seed=None):
+        """
+        :param seed: The root seed, fresh entropy from the OS when None. Either way self.seed can be used to repeat the run.
+        """
+        self.root = np.random.SeedSequence(seed)
+        self.seed = self.root.entropy
+        self.streams = {}
+
+    def stream(self, *path):
+        """
+        :param path: Names identifying the stream, strings or non negative ints, e.g. ("Green", "train", 3)
+
+        :return: The Generator for that name, made the first time it is asked for
+        """
+        generator = self.streams.get(path)
+        if generator is None:
+            # crc32 rather than hash() so the key is the same in every process
+            spawn_key = tuple(part if isinstance(part, int) else zlib.crc32(str(part).encode()) for part in path)
+            generator = np.random.Generator(np.random.PCG64(np.random.SeedSequence(self.seed, spawn_key=spawn_key)))
+            self.streams[path] = generator
+        return generator
+
+    def forget(self, *path):
+        """
+        Drops a stream that won't be used again, e.g. a train that left the track. Asking for it again starts it over.
+        """
+        self.streams.pop(path, None)
+
+
+def init(seed=None):
+    global streams
+    streams = RandomStreams(seed)
@@ -1 +1,7 @@
 USING_HARDWARE=False
+TRAIN_INTEGRATOR="trapezoidal" # "trapezoidal", "euler" (semi-implicit) or "rk4", see TrainFleet.step
+TRAIN_SUBSTEP=0.1 # longest step in simulated seconds the trains are updated with, longer ticks are split up
+RANDOM_SEED=None # root seed of the simulation's random streams, a fresh one every run when None
+PLC_SANDBOX=False # run the wayside PLC programs in worker processes instead of the simulator, see plc_sandbox.py
+PLC_SCAN_DEADLINE=None # wall clock seconds a sandboxed PLC scan has to finish in before its last safe outputs are kept, one wayside_dt when None
+PLC_TMR=False # run three copies of each PLC program in the sandbox at once and majority vote their outputs, implies PLC_SANDBOX
@@ -23,19 +23,27 @@ class SignalsCtc(QObject):
     
     ctc_suggested = pyqtSignal(dict, dict)
 
+
+    ctc_resync = pyqtSignal(int) # the ctc missed a wayside delta, the index of the wayside controller that has to send everything again
+
     def __init__(self):
         super().__init__()
 
 class SignalsTrack(QObject):
     wayside_block_occupancies = pyqtSignal(dict, str) # block occupancies sent to the ctc, dictionary of occupacies then string for line name
 
-    wayside_plc_outputs = pyqtSignal(list,list,list,list, str) # wayside plc outputs sent to the ctc, sorted list of blocks, switches, lights, crossings, and line name
+    wayside_plc_outputs = pyqtSignal(list,list,list,list, str) # wayside plc outputs sent to the ctc, [switch, light, crossing] block indices, switches, lights, crossings, and line name
+
+    # only what changed since the wayside's last message: controller index, sequence number, True if it is a full resync,
+    # then dictionaries of block index -> occupancy, switch, light and crossing state, then string for line name
+    wayside_delta = pyqtSignal(int, int, bool, dict, dict, dict, dict, str)
 
     track_tickets = pyqtSignal(int, str) # track model sends the ticket count to the ctc, integer value representing count then string for line name
 
     track_temperature = pyqtSignal(float, str)  # temperature + line name
     def __init__(self):
         super().__init__()
+        self.delta_mode = True # waysides send wayside_delta instead of the full wayside_block_occupancies and wayside_plc_outputs every update
 
     
 def init():
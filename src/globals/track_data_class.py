@@ -5,8 +5,14 @@ Description:
     Defines a data structure that can extract a track layout from an excel and turn it into a usable form of lists and dictionaries
     of the blocks and infrastructure on the track
 """
+import hashlib
+import json
+import os
+import tempfile
+import numpy as np
 import pandas as pd
-from dataclasses import dataclass
+from globals.braking_curves import BrakingCurves
+from dataclasses import dataclass, asdict
 from collections import defaultdict
 
 
@@ -61,6 +67,20 @@ class Beacon:
 
 
 class TrackData():
+    # Special entries of the next block table
+    DESPAWN = -1 # the train leaves the line into the yard
+    SWITCH_CRASH = -2 # the switch is set against the train
+    DEAD_END = -3 # nothing is connected to this end of the block
+
+    # The parsed layout is saved next to the excel so that later launches can skip reading it. It is plain json, not a pickle,
+    # so a cache sitting next to a layout from somewhere else can't run code when it is loaded.
+    CACHE_EXTENSION = ".layout_cache.json"
+    CACHE_VERSION = 2 # bump this when the parsed attributes or the dataclasses change so old caches are ignored
+    CACHED_ATTRIBUTES = ("line_name", "blocks", "switches", "switch_exits", "stations", "lights", "crossings", "beacons",
+                         "SPAWN_BLOCK", "DESPAWN_BLOCK", "sections", "overlaps", "territory_counts", "device_counts")
+    CACHED_DICTIONARIES = {"switches": Switch, "switch_exits": SwitchExit, "stations": Station, "lights": Light, "crossings": Crossing,
+                           "beacons": Beacon, "sections": Section} # the attributes that are dictionaries of id: dataclass
+
     def __init__(self, filepath: str):
         """
         Initialization for the static track data.
@@ -68,16 +88,127 @@ class TrackData():
         :param filepath: The filepath to an excel containing information about the track
         """
         if filepath != None:
-            dataframe = pd.read_excel(filepath, engine="openpyxl", sheet_name="Sheet1")
-            dataframe2 = pd.read_excel(filepath,engine="openpyxl",sheet_name="Sheet2")
-            dictionary = {key: list(dataframe[key]) for key in dataframe.columns}
-            dictionary2 = {key: list(dataframe2[key]) for key in dataframe2.columns}
-            self.line_name = dictionary["Line"][0]
-
-            self.populate_blocks(dictionary,dictionary2)
-            self.overlaps = [] # this is a list that counts the number of overlaps, overlap count between 1-2 is in index 0, 2-3 in index 2 etc
-            self.count_territory()  
-    
+            source_hash = self.hash_file(filepath)
+            if not self.load_cache(filepath, source_hash):
+                dataframe = pd.read_excel(filepath, engine="openpyxl", sheet_name="Sheet1")
+                dataframe2 = pd.read_excel(filepath,engine="openpyxl",sheet_name="Sheet2")
+                dictionary = {key: list(dataframe[key]) for key in dataframe.columns}
+                dictionary2 = {key: list(dataframe2[key]) for key in dataframe2.columns}
+                self.line_name = dictionary["Line"][0]
+
+                self.populate_blocks(dictionary,dictionary2)
+                self.overlaps = [] # this is a list that counts the number of overlaps, overlap count between 1-2 is in index 0, 2-3 in index 2 etc
+                self.count_territory()
+                self.save_cache(filepath, source_hash)
+            self.compile_topology()
+            self.braking_curves = BrakingCurves(self.blocks) # stopping distances for every speed and grade on this line
+
+    @staticmethod
+    def hash_file(filepath: str):
+        """
+        Hashes the contents of a file so that a cache is only used for the exact layout it was made from
+
+        :param filepath: The file to hash
+
+        :return: The sha256 hex digest of the file
+        """
+        with open(filepath, "rb") as file:
+            return hashlib.sha256(file.read()).hexdigest()
+
+    def load_cache(self, filepath: str, source_hash: str):
+        """
+        Loads the parsed layout from the cache next to the excel if it was made from the same file
+
+        :param filepath: The filepath to the excel
+
+        :param source_hash: The hash of the excel's contents
+
+        :return: True if the cache was used, False if the excel has to be parsed
+        """
+        try:
+            with open(filepath + self.CACHE_EXTENSION, "r") as file:
+                cache = json.load(file)
+        except (OSError, ValueError):
+            return False # no cache yet, or it is unreadable
+
+        if not isinstance(cache, dict) or cache.get("version") != self.CACHE_VERSION or cache.get("source_hash") != source_hash:
+            return False
+        try:
+            attributes = self.attributes_from_json(cache["attributes"])
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return False # made by a different version of the dataclasses
+        for name in self.CACHED_ATTRIBUTES:
+            setattr(self, name, attributes[name])
+        return True
+
+    def save_cache(self, filepath: str, source_hash: str):
+        """
+        Saves the parsed layout next to the excel so it can be loaded instead of parsed next time
+
+        :param filepath: The filepath to the excel
+
+        :param source_hash: The hash of the excel's contents
+        """
+        cache = {
+            "version": self.CACHE_VERSION,
+            "source_hash": source_hash,
+            "attributes": self.attributes_to_json(),
+        }
+        cache_path = filepath + self.CACHE_EXTENSION
+        temporary_path = None
+        try:
+            # Written to a temporary file in the same folder that is then renamed over the cache, so processes starting at the
+            # same time (the scenario runner's, parallel simulation's and verifier's workers) never see a half written cache
+            with tempfile.NamedTemporaryFile("w", dir=os.path.dirname(os.path.abspath(cache_path)), suffix=".tmp", delete=False) as file:
+                temporary_path = file.name
+                json.dump(cache, file)
+            os.replace(temporary_path, cache_path)
+        except (OSError, TypeError, ValueError):
+            # the folder may be read only, the layout just gets parsed again next time
+            if temporary_path is not None and os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+    def attributes_to_json(self):
+        """
+        :return: The cached attributes as json types, dataclasses become dictionaries of their fields
+        """
+        attributes = {}
+        for name in self.CACHED_ATTRIBUTES:
+            value = getattr(self, name)
+            if name in self.CACHED_DICTIONARIES:
+                value = {key: asdict(item) for key, item in value.items()}
+            elif name == "blocks":
+                value = [asdict(block) for block in value]
+            elif name in ("SPAWN_BLOCK", "DESPAWN_BLOCK"):
+                value = asdict(value)
+            elif name in ("territory_counts", "device_counts"):
+                value = [[key, item] for key, item in value.items()] # json would turn the territory numbers into strings
+            attributes[name] = value
+        return attributes
+
+    def attributes_from_json(self, attributes):
+        """
+        :param attributes: What attributes_to_json made, after a trip through json
+
+        :return: The cached attributes with their dataclasses, tuples and int keys back
+        """
+        def fields(data):
+            # json turns tuples (territories, device positions) into lists
+            return {field: tuple(value) if isinstance(value, list) else value for field, value in data.items()}
+
+        loaded = {}
+        for name in self.CACHED_ATTRIBUTES:
+            value = attributes[name]
+            if name in self.CACHED_DICTIONARIES:
+                value = {key: self.CACHED_DICTIONARIES[name](**fields(item)) for key, item in value.items()}
+            elif name == "blocks":
+                value = [Block(**fields(block)) for block in value]
+            elif name in ("SPAWN_BLOCK", "DESPAWN_BLOCK"):
+                value = Block(**fields(value))
+            elif name in ("territory_counts", "device_counts"):
+                value = {key: item for key, item in value}
+            loaded[name] = value
+        return loaded
 
     def populate_blocks(self, dictionary, dictionary2):
         """
@@ -243,6 +374,123 @@ class TrackData():
         self.device_counts = {k: dict(v) for k, v in temp_device_counts.items()} 
         
 
+    def compile_topology(self):
+        """
+        Builds the track as an integer indexed directed graph so that nothing has to parse block ids or switch strings while running.
+        A train is described by its block index and its direction, 0 when moving towards the lower numbered end of the block
+        and 1 when moving towards the higher numbered end. For every (block index, direction, switch state) the tables hold the
+        next block index and the direction it is entered with.
+        """
+        block_count = len(self.blocks)
+        self.block_indices = {block.id: index for index, block in enumerate(self.blocks)} # block id -> index into self.blocks
+        self.next_block_table = np.full((block_count, 2, 2), self.DEAD_END, dtype=np.int32)
+        self.next_direction_table = np.zeros((block_count, 2, 2), dtype=np.int8)
+        self.end_switches = np.full((block_count, 2), -1, dtype=np.int32) # index of the switch block that decides where an end leads, -1 if none
+        self.end_switch_states = np.full((block_count, 2), -1, dtype=np.int8) # at a switch exit, the switch state that connects it, -1 at a fork
+
+        spawn = self.block_indices[self.SPAWN_BLOCK.id]
+        despawn = self.block_indices[self.DESPAWN_BLOCK.id]
+        yard = {spawn, despawn}
+
+        # The yard has a fixed direction on the green line, on the red line trains leave on the low end and come back on the high end
+        yard_direction = self.sections[self.SPAWN_BLOCK.id[0]].increasing
+        self.SPAWN_DIRECTION = yard_direction if yard_direction != 2 else 0
+        arrival_direction = yard_direction if yard_direction != 2 else 1
+
+        # The block each switch position leads to, the string parsing only happens here
+        switch_targets = {}
+        for entrance_id, switch in self.switches.items():
+            switch_targets[self.block_indices[entrance_id]] = tuple(int(position.split("-")[1]) - 1 for position in switch.positions)
+
+        # The end of a switch block that forks is the one facing the neighbouring block it can connect to
+        fork_ends = {}
+        for entrance, targets in switch_targets.items():
+            adjacent = [target for target in targets if abs(target - entrance) == 1]
+            fork_ends[entrance] = 1 if (adjacent[0] if adjacent else targets[0]) > entrance else 0
+
+        # The end of a switch exit block that connects to the switch
+        exit_ends = {}
+        exit_entrances = {}
+        for exit_id, switch_exit in self.switch_exits.items():
+            exit_index = self.block_indices[exit_id]
+            entrance = self.block_indices[switch_exit.switch_entrance]
+            exit_entrances[exit_index] = entrance
+            if exit_index == spawn:
+                exit_ends[exit_index] = self.SPAWN_DIRECTION
+            elif exit_index == despawn:
+                exit_ends[exit_index] = 1 - arrival_direction
+            elif abs(exit_index - entrance) == 1:
+                exit_ends[exit_index] = 1 if entrance > exit_index else 0
+            else:
+                exit_ends[exit_index] = self.far_exit_end(exit_index, entrance, yard)
+
+        switch_ends = {(index, end) for index, end in fork_ends.items()} | {(index, end) for index, end in exit_ends.items()}
+
+        for index in range(block_count):
+            for direction in (0, 1):
+                if index in fork_ends and fork_ends[index] == direction:
+                    self.end_switches[index, direction] = index
+                    for state, target in enumerate(switch_targets[index]):
+                        self.next_block_table[index, direction, state] = target
+                        self.next_direction_table[index, direction, state] = 1 - exit_ends[target]
+                elif index in exit_ends and exit_ends[index] == direction:
+                    entrance = exit_entrances[index]
+                    self.end_switches[index, direction] = entrance
+                    for state, target in enumerate(switch_targets[entrance]):
+                        if target == index:
+                            self.end_switch_states[index, direction] = state
+                            self.next_block_table[index, direction, state] = entrance
+                            self.next_direction_table[index, direction, state] = 1 - fork_ends[entrance]
+                        else:
+                            self.next_block_table[index, direction, state] = self.SWITCH_CRASH
+                elif index == despawn and direction == arrival_direction:
+                    self.next_block_table[index, direction] = self.DESPAWN
+                else:
+                    neighbour = index + direction*2 - 1
+                    # neighbouring blocks are connected unless one of the facing ends belongs to a switch
+                    if 0 <= neighbour < block_count and index not in yard and neighbour not in yard and (neighbour, 1 - direction) not in switch_ends:
+                        self.next_block_table[index, direction] = neighbour
+                        self.next_direction_table[index, direction] = direction
+
+    def far_exit_end(self, exit_index, entrance, yard):
+        """
+        Finds the end of a switch exit that is not next to its switch. That is the end with nothing plainly connected to it, meaning
+        it is the last block of the track, it faces the yard, or it faces another section's switch exit.
+
+        :param exit_index: The index of the switch exit block
+
+        :param entrance: The index of the switch block it connects to
+
+        :param yard: The indices of the yard blocks
+
+        :return: 0 for the low end, 1 for the high end
+        """
+        open_ends = []
+        for end in (0, 1):
+            neighbour = exit_index + end*2 - 1
+            if not (0 <= neighbour < len(self.blocks)) or neighbour in yard:
+                open_ends.append(end)
+            elif self.blocks[neighbour].id[0] != self.blocks[exit_index].id[0] and self.blocks[neighbour].switch_exit:
+                open_ends.append(end)
+        if len(open_ends) == 1:
+            return open_ends[0]
+        return 1 if entrance > exit_index else 0
+
+    def next_block(self, index, direction, switch_state=0):
+        """
+        Looks up where a train goes when it leaves a block
+
+        :param index: The index of the block the train is leaving
+
+        :param direction: The direction the train is moving in, 0 decreasing and 1 increasing
+
+        :param switch_state: The state of the switch in self.end_switches for this end, ignored when there is none
+
+        :return: (next block index or one of DESPAWN, SWITCH_CRASH, DEAD_END, direction in the next block)
+        """
+        return int(self.next_block_table[index, direction, switch_state]), int(self.next_direction_table[index, direction, switch_state])
+
+
 def init(filepath=None):
     global lines
     lines = {}
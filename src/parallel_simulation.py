@@ -0,0 +1,148 @@
+"""
+Date: 10-18-2026
+Description:
+    Runs each line's Track Model, Wayside Controllers and Trains in its own worker process, so a two line simulation uses two
+    cores. The CTC stays in the main process and the only thing sent between the processes is what the CTC and the lines
+    already say to each other over the signals (suggestions, dispatches, maintenance, occupancies, plc outputs and tickets),
+    batched once per time step over a pipe.
+"""
+import multiprocessing
+
+import globals.signals as signals
+from simulation import Simulation
+from simulation_kernel import SimulationKernel
+
+# SignalsTrack signals the CTC listens to, forwarded from the workers to the main process
+CTC_BOUND_SIGNALS = ("wayside_block_occupancies", "wayside_plc_outputs", "wayside_delta", "track_tickets")
+# SignalsCtc signals, forwarded from the main process to the worker running that line
+LINE_BOUND_SIGNALS = ("ctc_switch_maintenance", "ctc_exit_blocks", "ctc_dispatch", "ctc_block_maintenance", "ctc_suggested", "ctc_resync")
+
+
+def forward_to(outbox, signal_name):
+    """
+    :return: A slot that stores a signal's arguments in the outbox so they can be sent to the other process
+    """
+    return lambda *args: outbox.append((signal_name, args))
+
+
+def line_worker(connection, line_name, dt, seed, integrator, substep):
+    """
+    Entry point of a worker process, simulates one line without a CTC and answers the main process' commands
+
+    :param connection: The worker's end of the pipe to the main process
+
+    :param line_name: The line this worker simulates
+    """
+    simulation = Simulation(lines=(line_name,), ctc=False, dt=dt, seed=seed, integrator=integrator, substep=substep)
+    outbox = []
+    for signal_name in CTC_BOUND_SIGNALS:
+        getattr(signals.communication_track, signal_name).connect(forward_to(outbox, signal_name))
+
+    while True:
+        command, payload = connection.recv()
+        if command == "step":
+            # Deliver what the CTC said this step before the line updates, the same order as the single process kernel
+            for signal_name, args in payload:
+                getattr(signals.communication_ctc[line_name], signal_name).emit(*args)
+            simulation.step()
+            connection.send(outbox[:])
+            outbox.clear()
+        elif command == "call":
+            method, args = payload
+            connection.send(getattr(simulation, method)(*args))
+        elif command == "close":
+            break
+    connection.close()
+
+
+class ParallelSimulation(Simulation):
+    def __init__(self, lines=("Green", "Red"), dt=0.1, seed=0, integrator=None, substep=None):
+        """
+        Starts a worker process for each line and builds the CTC in this process.
+
+        :param lines: The names of the lines to simulate, each one gets its own process
+
+        :param dt: The fixed simulated time step in seconds
+
+        :param seed: The root seed of the random streams, every worker uses it and the streams are named by line, so the lines
+                     get the same random numbers as they would in a single process
+
+        :param integrator: The train integrator, see TrainFleet.INTEGRATORS
+
+        :param substep: The longest step the trains are updated with
+        """
+        # The main process only runs the clock and the CTC
+        self.kernel = SimulationKernel(dt=dt, seed=seed, lines=(), ctc=True)
+        self.kernel.ctc.update_every_line = True # each line has its own core so neither should get half the CTC updates
+        self.track_models = {}
+        self.line_names = tuple(lines)
+
+        self.outboxes = {line_name: [] for line_name in self.line_names}
+        for line_name, outbox in self.outboxes.items():
+            for signal_name in LINE_BOUND_SIGNALS:
+                getattr(signals.communication_ctc[line_name], signal_name).connect(forward_to(outbox, signal_name))
+
+        # Spawn instead of fork, a forked child would share the main process' Qt state
+        context = multiprocessing.get_context("spawn")
+        self.connections = {}
+        self.workers = {}
+        for line_name in self.line_names:
+            connection, worker_connection = context.Pipe()
+            worker = context.Process(target=line_worker, args=(worker_connection, line_name, dt, seed, integrator, substep), daemon=True)
+            worker.start()
+            worker_connection.close()
+            self.connections[line_name] = connection
+            self.workers[line_name] = worker
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Stops the worker processes
+        """
+        for line_name, connection in self.connections.items():
+            if self.workers[line_name].is_alive():
+                connection.send(("close", None))
+            connection.close()
+        for worker in self.workers.values():
+            worker.join()
+        self.connections = {}
+        self.workers = {}
+
+    def call(self, line_name, method, *args):
+        """
+        Calls one of Simulation's methods in the worker running a line
+
+        :return: What the method returned
+        """
+        self.connections[line_name].send(("call", (method, args)))
+        return self.connections[line_name].recv()
+
+    def step(self):
+        """
+        Advances the CTC and then every line by one time step, the lines step at the same time in their own processes
+        """
+        self.kernel.step()
+        for line_name, connection in self.connections.items():
+            connection.send(("step", self.outboxes[line_name][:]))
+            self.outboxes[line_name].clear()
+        # What the lines sent reaches the CTC before its next update, as it does when everything runs in one process
+        for connection in self.connections.values():
+            for signal_name, args in connection.recv():
+                getattr(signals.communication_track, signal_name).emit(*args)
+
+    def set_failure(self, line_name, block_id, failure):
+        self.call(line_name, "set_failure", line_name, block_id, failure)
+
+    def trains(self, line_name):
+        return self.call(line_name, "trains", line_name)
+
+    def occupied_blocks(self, line_name):
+        return self.call(line_name, "occupied_blocks", line_name)
+
+    def failures(self, line_name):
+        return self.call(line_name, "failures", line_name)
@@ -1,5 +1,7 @@
 import sys
 import os
+import json
+import argparse
 
 from PyQt5.QtWidgets import QMainWindow, QApplication
 from PyQt5.QtCore import QTimer, QTime, QDateTime, QObject
@@ -9,6 +11,7 @@ import globals.global_clock as global_clock
 import globals.track_data_class as track_data
 import globals.signals as signals
 import globals.settings as settings
+import globals.rng as rng
 
 # Make sure to set this setting before we potentially run the hardware module
 if __name__=="__main__":
@@ -27,7 +30,65 @@ from CTC.centralized_traffic_controller_frontend import CtcFrontEnd
 from CTC.centralized_traffic_controller_backend import CtcBackEnd
 
 
+def run_headless(argv):
+    """
+    Runs the simulation without any windows, e.g. python src/pittsburgh.py --headless --duration 3600 --dispatch Green:Dormont-N
+
+    :param argv: The command line arguments after the script name
+
+    :return: The exit code
+    """
+    parser = argparse.ArgumentParser(description="Run the simulation without a user interface")
+    parser.add_argument("--headless", action="store_true")
+    parser.add_argument("--duration", type=float, default=3600.0, help="simulated seconds to run for")
+    parser.add_argument("--speed", type=float, default=0.0, help="simulated seconds per wall second, 0 runs as fast as possible")
+    parser.add_argument("--lines", nargs="+", default=["Green", "Red"], help="the lines to simulate")
+    parser.add_argument("--dispatch", action="append", default=[], metavar="LINE:STATION", help="dispatch a train at the start, can be repeated")
+    parser.add_argument("--dt", type=float, default=0.1, help="simulated seconds per step")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--integrator", default=None, help="train integrator: trapezoidal, euler or rk4")
+    parser.add_argument("--processes", action="store_true", help="run each line in its own process")
+    parser.add_argument("--plc-sandbox", action="store_true", help="run the wayside plc programs in worker processes, not with --processes")
+    parser.add_argument("--plc-tmr", action="store_true", help="run three voted copies of each plc program in worker processes, not with --processes")
+    parser.add_argument("--output", default=None, help="file to write the final state to as json, printed when not given")
+    args = parser.parse_args(argv)
+    if args.processes and (args.plc_sandbox or args.plc_tmr):
+        # the line workers are daemon processes, they can't start the sandbox's worker processes
+        parser.error("--plc-sandbox and --plc-tmr can't be used with --processes")
+    settings.PLC_SANDBOX = args.plc_sandbox
+    settings.PLC_TMR = args.plc_tmr
+
+    # lazy imports, the kernel sets up the globals itself
+    if args.processes:
+        from parallel_simulation import ParallelSimulation
+        simulation = ParallelSimulation(lines=args.lines, dt=args.dt, seed=args.seed, integrator=args.integrator)
+    else:
+        from simulation import Simulation
+        simulation = Simulation(lines=args.lines, dt=args.dt, seed=args.seed, integrator=args.integrator)
+    for dispatch in args.dispatch:
+        line_name, _, station = dispatch.partition(":")
+        simulation.dispatch(line_name, station)
+
+    try:
+        wall_time = simulation.run(args.duration, speed=args.speed)
+        state = simulation.state()
+        state["wall_time"] = wall_time
+    finally:
+        if args.processes:
+            simulation.close() # stop the line workers even when a step raised
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(state, file, indent=2)
+    else:
+        print(json.dumps(state, indent=2))
+    print(f"Simulated {simulation.sim_time:.1f} s in {wall_time:.2f} s of wall time", file=sys.stderr)
+    return 0
+
+
 if __name__=="__main__":
+    if "--headless" in sys.argv:
+        sys.exit(run_headless(sys.argv[1:]))
+
     # Set this one if not using command line args
     if len(sys.argv)==1:
         running_module = "allWithRedLine" # all, allWithRedLine, CTC, WaysideController, TrackModel, Train, TrackWayside TrainModel, TrainController, TrainControllerHW, CtcWayside
@@ -53,6 +114,7 @@ if __name__=="__main__":
 
     # Setup global objects
     global_clock.init()
+    rng.init(settings.RANDOM_SEED)
     track_data.init()
     signals.init()
     # Instatiate Modules
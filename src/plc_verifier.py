@@ -0,0 +1,323 @@
+"""
+Date: 10-18-2026
+Description:
+    Offline safety verifier for wayside PLC programs. Instead of hoping a test run happens to drive the track into a bad state,
+    every occupancy pattern that up to a few trains can make in a territory is built from the TrackData graph and the PLC is
+    run on each one. A state is reported when the program's outputs
+
+        - throw a switch while its block is occupied
+        - leave a crossing inactive while a train is in the crossing's section
+        - leave a train unclamped while the block it runs into next is occupied
+
+    python src/plc_verifier.py Green 1 --trains 3 --output report.json
+
+    How the states are built: the previous scan's trains are any up to --trains blocks of the territory, each travelling in a
+    direction its section allows. The previous scan's outputs are what the program settles on for that occupancy (run with the
+    trains standing still until the outputs stop changing). From there every train either stays or moves to the block the graph
+    and the switch outputs send it to, trains clamped by the previous scan stay, trains can leave and new ones can come in
+    where the territory is entered, and every exit block selection is tried. Occupancies and outputs are int bitmasks so a
+    whole territory is checked with a few bit operations, and the previous scan patterns are split across a process pool.
+
+    This over approximates what the trains can physically do (any previous pattern, trains move a block a scan), so a reported
+    state may need two trains closer together than the train controllers would let them get. Nothing the graph allows is missed.
+"""
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+LAYOUTS = {"Green": os.path.join("src", "Track", "TrackModel", "GreenLine_Layout.xlsx"),
+           "Red": os.path.join("src", "Track", "TrackModel", "redline_layout.xlsx")}
+SWITCH_THROWN = "switch thrown under a train"
+CROSSING_INACTIVE = "crossing inactive with a train in its section"
+MISSING_CLAMP = "missing clamp behind a train"
+PLC_ERROR = "plc error"
+SETTLE_SCANS = 8 # most scans run to let the outputs settle for the previous pattern
+EXAMPLE_LIMIT = 20 # example states kept for each kind of violation
+CHUNK_SIZE = 500 # previous patterns per task sent to the pool
+
+
+class Territory:
+    def __init__(self, track_data, territory):
+        """
+        The parts of the track graph one wayside's PLC sees, in plain lists and ints so it can be sent to the worker processes.
+        Blocks are numbered in the order the PLC gets them, the same as WaysideControllerCollection.blocks.
+
+        :param track_data: The TrackData of the line
+
+        :param territory: The 1 based territory number
+        """
+        self.line_name = track_data.line_name
+        self.territory = territory
+        blocks = [block for block in track_data.blocks
+                  if (isinstance(block.territory, (tuple, list)) and territory in block.territory) or block.territory == territory]
+        self.block_ids = [block.id for block in blocks]
+        indices = [track_data.block_indices[block.id] for block in blocks]
+        local = {index: i for i, index in enumerate(indices)} # index in the whole track -> index in the territory
+
+        self.switch_blocks = [i for i, block in enumerate(blocks) if block.switch]
+        self.crossing_blocks = [i for i, block in enumerate(blocks) if block.crossing]
+        self.exit_blocks = [i for i, block in enumerate(blocks) if block.exit_block]
+        self.counts = {"blocks": len(blocks), "switches": len(self.switch_blocks), "lights": sum(block.light for block in blocks),
+                       "crossings": len(self.crossing_blocks), "exits": len(self.exit_blocks)}
+        # each crossing has to be active while its section has a train in it
+        self.crossing_sections = [sum(1 << i for i, block in enumerate(blocks) if block.id[0] == blocks[crossing].id[0])
+                                  for crossing in self.crossing_blocks]
+        switch_outputs = {indices[block]: output for output, block in enumerate(self.switch_blocks)}
+
+        # A train is (block, direction), the directions each section lets trains travel in
+        self.positions = []
+        for i, block in enumerate(blocks):
+            increasing = track_data.sections[block.id[0]].increasing
+            self.positions += [(i, direction) for direction in ((0, 1) if increasing == 2 else (increasing,))]
+
+        # For every position the ways out of its block: (switch output deciding it or -1, switch state, next position or None
+        # when the train leaves the territory). A switch another wayside controls could be in either state.
+        self.moves = {}
+        for i, direction in self.positions:
+            switch_block = int(track_data.end_switches[indices[i], direction])
+            switch_output = switch_outputs.get(switch_block, -1)
+            states = (0,) if switch_block == -1 else (0, 1)
+            moves = []
+            for state in states:
+                target, target_direction = track_data.next_block(indices[i], direction, state)
+                if target in (track_data.SWITCH_CRASH, track_data.DEAD_END):
+                    continue
+                next_position = (local[target], target_direction) if target in local else None
+                moves.append((switch_output, state, next_position))
+            self.moves[(i, direction)] = moves
+
+        # Where trains come into the territory from other territories or the yard
+        self.entries = set()
+        for i, direction in self.positions:
+            for index, from_direction, state in zip(*(track_data.next_block_table == indices[i]).nonzero()):
+                if index not in local and track_data.next_direction_table[index, from_direction, state] == direction:
+                    self.entries.add((i, direction))
+        spawn = track_data.block_indices[track_data.SPAWN_BLOCK.id]
+        if spawn in local:
+            self.entries.add((local[spawn], track_data.SPAWN_DIRECTION))
+        self.entries = sorted(self.entries)
+
+    def ahead(self, position, switch_positions):
+        """
+        :param position: A train's (block, direction)
+
+        :param switch_positions: The switch outputs
+
+        :return: The territory blocks the train could run into next as a mask
+        """
+        mask = 0
+        for switch_output, state, next_position in self.moves[position]:
+            if next_position is not None and (switch_output == -1 or (switch_positions >> switch_output & 1) == state):
+                mask |= 1 << next_position[0]
+        return mask
+
+    def names(self, bits):
+        """
+        :return: The ids of the blocks set in a mask
+        """
+        return [block_id for i, block_id in enumerate(self.block_ids) if bits >> i & 1]
+
+
+def previous_patterns(territory, trains):
+    """
+    :return: Every set of up to trains positions in different blocks
+    """
+    for count in range(trains + 1):
+        for pattern in itertools.combinations(territory.positions, count):
+            if len({block for block, _ in pattern}) == count:
+                yield pattern
+
+
+def init_worker(territory, program_path, trains):
+    """
+    Loads the program once in each worker process
+    """
+    from Track.WaysideController.plc_sandbox import load_program # lazy import, the workers are spawned
+    global verifier_territory, verifier_program, verifier_trains
+    verifier_territory = territory
+    verifier_trains = trains
+    verifier_program = load_program(program_path, "verifier", territory.counts)
+
+
+def scan(inputs):
+    """
+    :param inputs: (occupancies, switches, lights, crossings, previous occupancies, exits, clamps) as bitmasks
+
+    :return: (switches, lights, crossings, clamps) as bitmasks
+    """
+    from Track.WaysideController.plc_sandbox import INPUT_FIELDS, OUTPUT_FIELDS, to_program, from_program
+    module, plc_io, counts = verifier_program
+    if plc_io == "bitmask":
+        outputs = module.plc_logic(*inputs)
+    else:
+        outputs = module.plc_logic(*[to_program(bits, counts[field], plc_io) for bits, field in zip(inputs, INPUT_FIELDS)])
+    names = ("switch positions", "light signals", "crossing signals", "clamps")
+    return tuple(from_program(output, plc_io, name, counts[field]) for output, name, field in zip(outputs, names, OUTPUT_FIELDS))
+
+
+def verify_patterns(patterns):
+    """
+    Runs the program on every state that follows from some previous patterns. This is what the pool's workers run.
+
+    :param patterns: Previous patterns from previous_patterns
+
+    :return: {"states": states checked, "counts": {kind: {block id: violations}}, "examples": {kind: [states]}}
+    """
+    territory = verifier_territory
+    exit_selections = [0] + [1 << i for i in range(len(territory.exit_blocks))]
+    counts = {}
+    examples = {}
+    states = 0
+    cache = {} # scans often repeat, e.g. when only a direction differs
+
+    def report(kind, where, state, occupied):
+        counts.setdefault(kind, {})
+        counts[kind][where] = counts[kind].get(where, 0) + 1
+        if len(examples.setdefault(kind, [])) < EXAMPLE_LIMIT: # the block names are only looked up for the examples kept
+            examples[kind].append({"at": where, **state, "occupied": territory.names(occupied)})
+
+    def cached_scan(inputs):
+        if inputs not in cache:
+            cache[inputs] = scan(inputs)
+        return cache[inputs]
+
+    for pattern in patterns:
+        previous = sum(1 << block for block, _ in pattern)
+        for exits in exit_selections:
+            state = {"previous": territory.names(previous),
+                     "exit": territory.block_ids[territory.exit_blocks[exits.bit_length() - 1]] if exits else None}
+            try:
+                outputs = (0, 0, 0, 0)
+                for _ in range(SETTLE_SCANS):
+                    settled = cached_scan((previous, outputs[0], outputs[1], outputs[2], previous, exits, outputs[3]))
+                    if settled == outputs:
+                        break
+                    outputs = settled
+            except Exception as e: # the program is the user's, anything can go wrong in it
+                report(PLC_ERROR, f"{type(e).__name__}: {e}", state, previous)
+                continue
+            switches, lights, crossings, clamps = outputs
+
+            # where each train can be this scan, clamped trains stay put
+            choices = []
+            for position in pattern:
+                choices.append([position])
+                if not clamps >> position[0] & 1:
+                    for switch_output, switch_state, next_position in territory.moves[position]:
+                        if switch_output == -1 or (switches >> switch_output & 1) == switch_state:
+                            choices[-1].append(next_position)
+            for moved in itertools.product(*choices):
+                staying = [position for position in moved if position is not None]
+                taken = {block for block, _ in staying}
+                if len(taken) != len(staying):
+                    continue # two trains moved into one block, the previous scan's clamps are what should have stopped that
+                entering = [entry for entry in territory.entries if entry[0] not in taken]
+                for count in range(min(verifier_trains - len(staying), len(entering)) + 1):
+                    for arrivals in itertools.combinations(entering, count):
+                        trains = staying + list(arrivals)
+                        if len({block for block, _ in arrivals}) != count:
+                            continue # both directions of a bidirectional entry
+                        occupied = sum(1 << block for block, _ in trains)
+                        states += 1
+                        try:
+                            new_switches, _, new_crossings, new_clamps = cached_scan((occupied, switches, lights, crossings, previous, exits, clamps))
+                        except Exception as e:
+                            report(PLC_ERROR, f"{type(e).__name__}: {e}", state, occupied)
+                            continue
+
+                        thrown = new_switches ^ switches
+                        for output, block in enumerate(territory.switch_blocks):
+                            if thrown >> output & 1 and occupied >> block & 1:
+                                report(SWITCH_THROWN, territory.block_ids[block], state, occupied)
+                        for output, section in enumerate(territory.crossing_sections):
+                            if occupied & section and not new_crossings >> output & 1:
+                                report(CROSSING_INACTIVE, territory.block_ids[territory.crossing_blocks[output]], state, occupied)
+                        for position in trains:
+                            if territory.ahead(position, new_switches) & occupied and not new_clamps >> position[0] & 1:
+                                report(MISSING_CLAMP, territory.block_ids[position[0]], state, occupied)
+    return {"states": states, "counts": counts, "examples": examples}
+
+
+def verify(line_name, territory, program_path=None, trains=3, workers=None, on_progress=None):
+    """
+    Checks a PLC program against every state up to trains trains can make in its territory
+
+    :param line_name: "Green" or "Red"
+
+    :param territory: The 1 based territory number
+
+    :param program_path: The program to check, the one the wayside loads at startup when None
+
+    :param trains: The most trains in the territory at once
+
+    :param workers: The number of processes, one per core when None
+
+    :param on_progress: Called with (patterns done, patterns) as the pool works through them
+
+    :return: The report, {"states": states checked, "violations": violations of each kind, "counts": {kind: {block id: violations}},
+             "examples": {kind: [states]}, ...}
+    """
+    import globals.track_data_class as track_data_class # lazy import, only the main process reads the layout
+    if program_path is None:
+        program_path = os.path.join("src", "Track", "WaysideController", "PLC", f"{line_name.lower()}_line_plc_{territory}.py")
+    track_data = track_data_class.TrackData(LAYOUTS[line_name])
+    if territory not in track_data.territory_counts:
+        raise ValueError(f"{line_name} has territories {sorted(track_data.territory_counts)}, not {territory}")
+    model = Territory(track_data, territory)
+
+    start = time.perf_counter()
+    patterns = list(previous_patterns(model, trains))
+    chunks = [patterns[i:i + CHUNK_SIZE] for i in range(0, len(patterns), CHUNK_SIZE)]
+    report = {"line": line_name, "territory": territory, "program": program_path, "trains": trains, "blocks": len(model.block_ids),
+              "previous_patterns": len(patterns), "states": 0, "counts": {}, "examples": {}}
+    done = 0
+    # Spawn instead of fork, the same as the other process pools
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=multiprocessing.get_context("spawn"),
+                             initializer=init_worker, initargs=(model, program_path, trains)) as executor:
+        futures = {executor.submit(verify_patterns, chunk): len(chunk) for chunk in chunks}
+        for future in as_completed(futures):
+            result = future.result()
+            report["states"] += result["states"]
+            for kind, blocks in result["counts"].items():
+                for block_id, count in blocks.items():
+                    report["counts"].setdefault(kind, {})
+                    report["counts"][kind][block_id] = report["counts"][kind].get(block_id, 0) + count
+            for kind, examples in result["examples"].items():
+                kept = report["examples"].setdefault(kind, [])
+                kept += examples[:EXAMPLE_LIMIT - len(kept)]
+            done += futures[future]
+            if on_progress:
+                on_progress(done, len(patterns))
+
+    report["violations"] = {kind: sum(blocks.values()) for kind, blocks in report["counts"].items()}
+    report["wall_time"] = time.perf_counter() - start
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check a wayside PLC program against every state a few trains can make in its territory")
+    parser.add_argument("line", choices=sorted(LAYOUTS), help="the line the territory is on")
+    parser.add_argument("territory", type=int, help="the 1 based territory number")
+    parser.add_argument("--program", default=None, help="path to the PLC program, the one loaded at startup by default")
+    parser.add_argument("--trains", type=int, default=3, help="most trains in the territory at once")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, one per core by default")
+    parser.add_argument("--output", default=None, help="file to write the report to as json")
+    args = parser.parse_args()
+
+    report = verify(args.line, args.territory, args.program, args.trains, args.workers,
+                    on_progress=lambda done, total: print(f"{done}/{total} previous patterns", flush=True))
+    print(f"{report['line']} territory {report['territory']}: {report['states']} states from {report['previous_patterns']} "
+          f"previous patterns in {report['wall_time']:.1f} s")
+    if not report["violations"]:
+        print("No violations")
+    for kind, blocks in report["counts"].items():
+        worst = sorted(blocks.items(), key=lambda item: -item[1])
+        print(f"{report['violations'][kind]} {kind}: " + ", ".join(f"{block_id} ({count})" for block_id, count in worst))
+        print("    e.g. " + json.dumps(report["examples"][kind][0]))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
@@ -0,0 +1,218 @@
+"""
+Date: 10-18-2026
+Description:
+    Monte Carlo runner for capacity planning. Passenger boarding and ticket sales are random, so a scenario is run headless once
+    per seed across a process pool, the KPIs of each run (throughput, headway, crashes, dwell overruns) are streamed back as
+    the runs finish and then aggregated into a report.
+
+    python src/scenario_runner.py scenario.json --runs 32 --output report.json
+
+    A scenario is a json file like:
+    {
+        "name": "rush hour",
+        "lines": ["Green"],
+        "duration": 3600,
+        "dispatches": [{"time": 0, "line": "Green", "destination": "Dormont-N"},
+                       {"time": 300, "line": "Green", "destination": "Poplar"}],
+        "failures": [{"time": 600, "line": "Green", "block": "K63", "failure": "POWER_FAILURE"}]
+    }
+"""
+import argparse
+import contextlib
+import io
+import json
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+SCENARIO_DEFAULTS = {
+    "name": "scenario",
+    "lines": ["Green"],
+    "duration": 3600.0,
+    "dt": 0.1,
+    "integrator": None,
+    "dispatches": [],
+    "failures": [],
+    "dwell_limit": 35.0, # seconds stopped at a station before it counts as a dwell overrun, the controller dwells for 30.5 s
+}
+STOPPED_SPEED = 0.01 # (m/s) trains slower than this count as stopped
+
+
+class KpiRecorder:
+    def __init__(self, simulation, dwell_limit):
+        """
+        Watches the trains after every step to collect the KPIs that the modules don't keep track of themselves
+
+        :param simulation: The Simulation to watch
+
+        :param dwell_limit: Seconds stopped at a station before it counts as a dwell overrun
+        """
+        self.simulation = simulation
+        self.dwell_limit = dwell_limit
+        self.last_index = {} # (line name, train id): index of the block the train was in at the last step
+        self.stopped_since = {} # (line name, train id): sim time the train stopped at a station
+        self.arrivals = {} # (line name, station block index): sim times trains entered the station block
+        self.dwells = [] # seconds each station stop lasted
+        self.dispatched = {line_name: 0 for line_name in simulation.line_names}
+
+    def observe(self):
+        """
+        Called after every step
+        """
+        now = self.simulation.sim_time
+        for line_name, track_model in self.simulation.track_models.items():
+            for train in track_model.trains:
+                key = (line_name, train.train_id)
+                if key not in self.last_index:
+                    self.dispatched[line_name] += 1
+                if self.last_index.get(key) != train.current_index:
+                    self.last_index[key] = train.current_index
+                    if train.current_block.station:
+                        self.arrivals.setdefault((line_name, train.current_index), []).append(now)
+
+                stopped = train.current_block.station and train.train_model.actual_speed < STOPPED_SPEED
+                if stopped and key not in self.stopped_since:
+                    self.stopped_since[key] = now
+                elif not stopped and key in self.stopped_since:
+                    self.dwells.append(now - self.stopped_since.pop(key))
+
+    def kpis(self):
+        """
+        :return: A dictionary of the KPIs for the run so far
+        """
+        # Only stops the train has left count as dwells, a train that reached its last stop stays there until the run ends
+        dwells = self.dwells
+        headways = []
+        for times in self.arrivals.values():
+            headways += [later - earlier for earlier, later in zip(times, times[1:])]
+
+        state = self.simulation.state()
+        return {
+            "throughput": sum(line.get("throughput", 0) for line in state["lines"].values()),
+            "line_throughput": {line_name: line.get("throughput", 0) for line_name, line in state["lines"].items()},
+            "trains_dispatched": sum(self.dispatched.values()),
+            "average_headway": sum(headways) / len(headways) if headways else None,
+            "crashes": sum(track_model.crash_count for track_model in self.simulation.track_models.values()),
+            "station_stops": len(dwells),
+            "average_dwell": sum(dwells) / len(dwells) if dwells else None,
+            "dwell_overruns": sum(dwell > self.dwell_limit for dwell in dwells),
+            "stopped_at_stations": len(self.stopped_since),
+        }
+
+
+def load_scenario(scenario):
+    """
+    :param scenario: A scenario dictionary or the path to a json file holding one
+
+    :return: The scenario with every missing field filled in from SCENARIO_DEFAULTS
+    """
+    if isinstance(scenario, str):
+        with open(scenario) as file:
+            scenario = json.load(file)
+    return {**SCENARIO_DEFAULTS, **scenario}
+
+
+def run_scenario(scenario, seed):
+    """
+    Runs a scenario once headless. This is what the process pool's workers run.
+
+    :param scenario: A scenario dictionary, see the top of this file
+
+    :param seed: The seed for this run
+
+    :return: The run's KPIs
+    """
+    from simulation import Simulation # lazy import, the kernel sets up the globals itself
+
+    scenario = load_scenario(scenario)
+    start = time.perf_counter()
+    # The modules print a lot while running, none of it is needed here
+    with contextlib.redirect_stdout(io.StringIO()):
+        simulation = Simulation(lines=scenario["lines"], dt=scenario["dt"], seed=seed, integrator=scenario["integrator"])
+        recorder = KpiRecorder(simulation, scenario["dwell_limit"])
+        events = sorted([(event["time"], "dispatch", event) for event in scenario["dispatches"]] +
+                        [(event["time"], "failure", event) for event in scenario["failures"]], key=lambda event: event[0])
+
+        end_time = scenario["duration"]
+        while simulation.sim_time + simulation.kernel.dt / 2 < end_time:
+            while events and events[0][0] <= simulation.sim_time:
+                _, kind, event = events.pop(0)
+                if kind == "dispatch":
+                    simulation.dispatch(event["line"], event["destination"], event.get("destination_type", "station"))
+                else:
+                    simulation.set_failure(event["line"], event["block"], event["failure"])
+            simulation.step()
+            recorder.observe()
+        kpis = recorder.kpis()
+
+    kpis["seed"] = seed
+    kpis["wall_time"] = time.perf_counter() - start
+    return kpis
+
+
+def aggregate(results):
+    """
+    :param results: The KPI dictionaries of every run
+
+    :return: For each numeric KPI the mean, standard deviation, min and max over the runs that have a value for it
+    """
+    report = {}
+    for name in ("throughput", "trains_dispatched", "average_headway", "crashes", "station_stops", "average_dwell", "dwell_overruns",
+                 "stopped_at_stations", "wall_time"):
+        values = [result[name] for result in results if result[name] is not None]
+        if not values:
+            report[name] = None
+            continue
+        mean = sum(values) / len(values)
+        std = math.sqrt(sum((value - mean) ** 2 for value in values) / (len(values) - 1)) if len(values) > 1 else 0.0
+        report[name] = {"mean": mean, "std": std, "min": min(values), "max": max(values), "runs": len(values)}
+    report["runs_with_crashes"] = sum(result["crashes"] > 0 for result in results)
+    return report
+
+
+def run_batch(scenario, seeds, workers=None, on_result=None):
+    """
+    Runs a scenario once per seed across a process pool
+
+    :param scenario: A scenario dictionary or the path to a json file holding one
+
+    :param seeds: The seeds to run, one run each
+
+    :param workers: The number of processes, one per core when None
+
+    :param on_result: Called with each run's KPIs as soon as that run finishes
+
+    :return: {"scenario": the scenario, "runs": every run's KPIs in seed order, "report": the aggregate}
+    """
+    scenario = load_scenario(scenario)
+    seeds = list(seeds)
+    results = []
+    # Spawn instead of fork so each worker starts without the parent's Qt state
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [executor.submit(run_scenario, scenario, seed) for seed in seeds]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if on_result:
+                on_result(result)
+    results.sort(key=lambda result: seeds.index(result["seed"]))
+    return {"scenario": scenario, "runs": results, "report": aggregate(results)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a scenario many times with different seeds and aggregate the KPIs")
+    parser.add_argument("scenario", help="path to the scenario json file")
+    parser.add_argument("--runs", type=int, default=8, help="number of runs")
+    parser.add_argument("--first-seed", type=int, default=0, help="runs use the seeds first-seed, first-seed + 1, ...")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, one per core by default")
+    parser.add_argument("--output", default=None, help="file to write the runs and report to as json")
+    args = parser.parse_args()
+
+    batch = run_batch(args.scenario, range(args.first_seed, args.first_seed + args.runs), args.workers,
+                      on_result=lambda result: print(json.dumps(result), flush=True))
+    print(json.dumps(batch["report"], indent=2))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(batch, file, indent=2)
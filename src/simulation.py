@@ -0,0 +1,150 @@
+"""
+Date: 10-18-2026
+Description:
+    An API for embedding the simulation in other python programs and scripts, such as capacity studies. It builds the chosen
+    modules without showing any windows, and allows dispatching trains, injecting track failures, stepping simulated time
+    and reading back the state of the lines. pittsburgh.py --headless is built on top of it.
+"""
+import time
+
+from simulation_kernel import SimulationKernel
+from Track.TrackModel.track_model_enums import Failures
+
+
+class Simulation:
+    def __init__(self, lines=("Green", "Red"), ctc=True, wayside=True, dt=0.1, seed=0, integrator=None, substep=None):
+        """
+        :param lines: The names of the lines to simulate
+
+        :param ctc: Whether to build the CTC, without it trains are dispatched straight onto the track
+
+        :param wayside: Whether to build the wayside controllers
+
+        :param dt: The fixed simulated time step in seconds
+
+        :param seed: Seed for the random number generator so that runs are repeatable
+
+        :param integrator: The train integrator, see TrainFleet.INTEGRATORS
+
+        :param substep: The longest step the trains are updated with
+        """
+        self.kernel = SimulationKernel(dt=dt, seed=seed, lines=lines, integrator=integrator, substep=substep, ctc=ctc, wayside=wayside)
+        self.track_models = self.kernel.track_models
+        self.line_names = tuple(lines)
+
+    @property
+    def sim_time(self):
+        """Simulated seconds since the start of the run"""
+        return self.kernel.sim_time
+
+    def dispatch(self, line_name, destination, destination_type="station"):
+        """
+        Dispatches a new train
+
+        :param line_name: The line to dispatch on
+
+        :param destination: A station name, block number or route name
+
+        :param destination_type: Either "station", "block" or "route"
+        """
+        self.kernel.dispatch(line_name, destination, destination_type)
+
+    def set_failure(self, line_name, block_id, failure):
+        """
+        Injects a failure into a block, the same as the track model's failure buttons
+
+        :param line_name: The line the block is on
+
+        :param block_id: The id of the block, e.g. "K63"
+
+        :param failure: A Failures value or its name, e.g. "POWER_FAILURE"
+        """
+        if isinstance(failure, str):
+            failure = Failures[failure]
+        self.track_models[line_name].dynamic_track.set_failure(block_id, failure)
+
+    def clear_failure(self, line_name, block_id):
+        """
+        Removes the failure from a block
+
+        :param line_name: The line the block is on
+
+        :param block_id: The id of the block
+        """
+        self.set_failure(line_name, block_id, Failures.NONE)
+
+    def step(self):
+        """
+        Advances the simulation by one time step
+        """
+        self.kernel.step()
+
+    def run(self, duration, speed=None):
+        """
+        Steps the simulation until an amount of simulated time has passed
+
+        :param duration: Simulated seconds to run for
+
+        :param speed: How many simulated seconds to run per wall second, as fast as possible when None or 0
+
+        :return: The wall clock seconds it took
+        """
+        start = time.perf_counter()
+        start_time = self.sim_time
+        end_time = start_time + duration
+        while self.sim_time + self.kernel.dt / 2 < end_time:
+            self.step()
+            if speed:
+                # Wait until the wall clock catches up with the simulated time
+                ahead = (self.sim_time - start_time) / speed - (time.perf_counter() - start)
+                if ahead > 0:
+                    time.sleep(ahead)
+        return time.perf_counter() - start
+
+    def trains(self, line_name):
+        """
+        :param line_name: The line to read
+
+        :return: A list with a dictionary describing each train on the line, the position is in meters from where it spawned,
+                 the speed in m/s and the authority in yards
+        """
+        return [{
+            "train_id": train.train_id,
+            "block": train.current_block.id,
+            "position": train.train_model.position,
+            "speed": train.train_model.actual_speed,
+            "authority": train.train_model.wayside_authority,
+            "passengers": train.passenger_count,
+        } for train in self.track_models[line_name].trains]
+
+    def occupied_blocks(self, line_name):
+        """
+        :param line_name: The line to read
+
+        :return: The ids of the blocks the track model reports as not unoccupied
+        """
+        dynamic_track = self.track_models[line_name].dynamic_track
+        return [block.id for index, block in enumerate(dynamic_track.track_data.blocks) if dynamic_track.occupancies[index]]
+
+    def failures(self, line_name):
+        """
+        :param line_name: The line to read
+
+        :return: A dictionary of block id -> failure name for every failed block
+        """
+        return {block_id: failure.name for block_id, failure in self.track_models[line_name].dynamic_track.get_failed_blocks()}
+
+    def state(self):
+        """
+        :return: A snapshot of every line that can be saved as json
+        """
+        lines = {}
+        for line_name in self.line_names:
+            lines[line_name] = {
+                "trains": self.trains(line_name),
+                "occupied_blocks": self.occupied_blocks(line_name),
+                "failures": self.failures(line_name),
+            }
+            if self.kernel.ctc:
+                lines[line_name]["throughput"] = self.kernel.ctc.lines[line_name].throughput
+        return {"sim_time": self.sim_time, "lines": lines}
@@ -0,0 +1,170 @@
+"""
+Date: 10-18-2026
+Description:
+    A headless, fixed step scheduler that drives every module of the simulation in a set order (CTC -> Wayside -> Track -> Train)
+    on simulated time. No Qt event loop is needed, the simulation runs as fast as the CPU allows and two runs with the same
+    inputs and seed give the same result.
+"""
+import math
+import os
+import sys
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # no windows are needed when running headless
+from PyQt5.QtWidgets import QApplication
+
+import globals.global_clock as global_clock
+import globals.track_data_class as track_data
+import globals.signals as signals
+import globals.rng as rng
+
+
+class SimulationKernel:
+    GREEN_LAYOUT = os.path.join("src", "Track", "TrackModel", "GreenLine_Layout.xlsx")
+    RED_LAYOUT = os.path.join("src", "Track", "TrackModel", "redline_layout.xlsx")
+    HEATER_PERIOD = 2.0 # seconds between track heater steps
+    # Longest step the modules are updated with, a train was checked to still make its station stops with 5 second steps.
+    # The trains sub-step on their own but the ctc and wayside only see them once a step, so over longer steps a train can
+    # run past the block it was meant to stop in. Longer steps are split up.
+    MAX_STEP = 5.0
+
+    def __init__(self, dt=0.1, seed=0, lines=("Green", "Red"), integrator=None, substep=None, ctc=True, wayside=True):
+        """
+        Builds the globals and every module so that they are driven by this kernel instead of their own timers.
+
+        :param dt: The fixed simulated time step in seconds
+
+        :param seed: Seed for the random number generator so that runs are repeatable
+
+        :param lines: The names of the lines that get a track model, wayside controllers and trains
+
+        :param integrator: The train integrator for this run, one of TrainFleet.INTEGRATORS, settings.TRAIN_INTEGRATOR when None
+
+        :param substep: The longest step the trains are updated with in this run, settings.TRAIN_SUBSTEP when None
+
+        :param ctc: Whether to build the CTC, without it trains are dispatched straight onto the track and get no authority
+
+        :param wayside: Whether the track models get wayside controllers
+        """
+        # The backends are still Qt objects so an application has to exist, but its event loop is never started
+        self.app = QApplication.instance() or QApplication(sys.argv)
+
+        self.dt = dt
+        self.seed = seed
+        rng.init(seed)
+
+        global_clock.init(start_timer=False)
+        self.clock = global_clock.clock
+        self.clock.kernel_driven = True
+
+        # The CTC always builds both lines so both layouts are needed
+        track_data.init(self.GREEN_LAYOUT)
+        red_line = track_data.TrackData(self.RED_LAYOUT)
+        track_data.lines[red_line.line_name] = red_line
+        signals.init()
+        signals.communication_ctc["Red"] = signals.SignalsCtc()
+
+        # Lazy imports, these modules grab the globals when they are imported
+        from CTC.centralized_traffic_controller_backend import CtcBackEnd
+        from Track.TrackModel.track_model_backend import TrackModel
+        self.ctc = CtcBackEnd() if ctc else None
+        self.track_models = {line_name: TrackModel(line_name, wayside_integrated=wayside) for line_name in lines}
+        for track_model in self.track_models.values():
+            train_collection = track_model.train_collection
+            if integrator is not None:
+                if integrator not in train_collection.fleet.INTEGRATORS:
+                    raise ValueError(f"Unknown integrator {integrator}, expected one of {train_collection.fleet.INTEGRATORS}")
+                train_collection.fleet.integrator = integrator
+            if substep is not None:
+                train_collection.max_substep = substep
+
+        self.step_count = 0
+        self.next_heater_time = self.HEATER_PERIOD
+
+    @property
+    def sim_time(self):
+        """Simulated seconds since the start of the run"""
+        return self.clock.elapsed_seconds
+
+    def step(self):
+        """
+        Advances the whole simulation by one fixed time step, split into equal parts of at most MAX_STEP
+        """
+        parts = max(1, math.ceil(self.dt / self.MAX_STEP - 1e-9))
+        for _ in range(parts):
+            self.update(self.dt / parts)
+        self.step_count += 1
+
+    def update(self, dt):
+        """
+        Updates every module once, in order
+
+        :param dt: Simulated seconds to advance by
+        """
+        self.clock.advance(dt)
+
+        if self.ctc:
+            self.ctc.backend_update()
+
+        for track_model in self.track_models.values():
+            if track_model.wayside_integrated:
+                track_model.wayside_collection.start_scans()
+        for track_model in self.track_models.values():
+            if track_model.wayside_integrated:
+                for controller in track_model.wayside_collection.controllers:
+                    controller.update()
+
+        for track_model in self.track_models.values():
+            track_model.update()
+            if self.sim_time >= self.next_heater_time:
+                track_model.heater_step_up()
+
+        for track_model in self.track_models.values():
+            track_model.train_collection.update(dt)
+
+        if self.sim_time >= self.next_heater_time:
+            self.next_heater_time += self.HEATER_PERIOD
+
+    def run(self, duration):
+        """
+        Steps the simulation until an amount of simulated time has passed
+
+        :param duration: Simulated seconds to run for
+
+        :return: The wall clock seconds it took
+        """
+        start = time.perf_counter()
+        end_time = self.sim_time + duration
+        while self.sim_time + self.dt / 2 < end_time:
+            self.step()
+        return time.perf_counter() - start
+
+    def dispatch(self, line_name, destination, destination_type="station"):
+        """
+        Dispatches a new train through the CTC the same way the dispatch screen does
+
+        :param line_name: The line to dispatch on
+
+        :param destination: A station name, block number or route name
+
+        :param destination_type: Either "station", "block" or "route"
+        """
+        if self.ctc is None:
+            # No CTC to route the train, put it on the track the same way the wayside would
+            track_model = self.track_models[line_name]
+            if track_model.wayside_integrated:
+                track_model.wayside_collection.handle_dispatch()
+            else:
+                track_model.initialize_train()
+            return
+        self.ctc.active_line = self.ctc.lines[line_name]
+        self.ctc.dispatch_handler(destination, destination_type)
+
+
+if __name__ == "__main__":
+    kernel = SimulationKernel(lines=("Green",))
+    kernel.dispatch("Green", "Dormont-N")
+    wall_time = kernel.run(600)
+    for train in kernel.track_models["Green"].trains:
+        print(train)
+    print(f"Simulated {kernel.sim_time:.1f} s in {wall_time:.2f} s of wall time")